@@ -8,20 +8,51 @@ colado nos Secrets do Streamlit Cloud.
 Uso:
     python gerar_secrets.py
 
+Os CSVs são emitidos como roster compacto: "<versão>:<sha256>:<base64>",
+em que o base64 contém o JSON {"colunas": [...], "linhas": [[...], ...]}
+comprimido com zlib e o sha256 é calculado sobre o JSON descomprimido.
+O app decodifica esse blob uma única vez (ver decodificar_roster_compacto
+em src/app.py).
+
 IMPORTANTE: Não commite este script com dados reais em produção!
 """
 
+import base64
+import hashlib
+import json
+import zlib
+
 import pandas as pd
 from pathlib import Path
 
-def ler_csv_como_string(caminho):
-    """Lê um arquivo CSV e retorna como string."""
+# Deve acompanhar VERSAO_ROSTER_COMPACTO em src/app.py
+VERSAO_ROSTER_COMPACTO = 1
+
+def codificar_roster_compacto(caminho):
+    """
+    Lê um CSV e o codifica como roster compacto.
+
+    Todos os valores são mantidos como texto, exatamente como no arquivo.
+
+    Args:
+        caminho: Caminho do arquivo CSV
+
+    Returns:
+        str: Roster compacto ou None se o arquivo não existir
+    """
     if not Path(caminho).exists():
         print(f"⚠️  Arquivo {caminho} não encontrado!")
         return None
-    
-    with open(caminho, 'r', encoding='utf-8') as f:
-        return f.read()
+
+    df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    payload = json.dumps(
+        {'colunas': df.columns.tolist(), 'linhas': df.values.tolist()},
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+    checksum = hashlib.sha256(payload).hexdigest()
+    dados = base64.b64encode(zlib.compress(payload, 9)).decode('ascii')
+    return f"{VERSAO_ROSTER_COMPACTO}:{checksum}:{dados}"
 
 def main():
     print("=" * 60)
@@ -29,9 +60,9 @@ def main():
     print("=" * 60)
     print()
     
-    # Lê os CSVs
-    eleitores_csv = ler_csv_como_string('eleitores.csv')
-    candidatos_csv = ler_csv_como_string('candidatos.csv')
+    # Lê e codifica os CSVs
+    eleitores_compacto = codificar_roster_compacto('eleitores.csv')
+    candidatos_compacto = codificar_roster_compacto('candidatos.csv')
     
     # Lê secrets.toml para pegar outras configurações
     secrets_config = {}
@@ -52,18 +83,15 @@ def main():
     print(f"MAX_SELECTIONS = {secrets_config.get('MAX_SELECTIONS', 3)}")
     print()
     
-    if eleitores_csv:
-        print("# CSV de Eleitores")
-        print("ELEITORES_CSV = \"\"\"")
-        print(eleitores_csv.rstrip())
-        print("\"\"\"")
+    if eleitores_compacto:
+        tamanho_csv = Path('eleitores.csv').stat().st_size
+        print(f"# Eleitores (roster compacto: {len(eleitores_compacto)} caracteres, CSV original: {tamanho_csv} bytes)")
+        print(f"ELEITORES_COMPACTO = \"{eleitores_compacto}\"")
         print()
     
-    if candidatos_csv:
-        print("# CSV de Candidatos")
-        print("CANDIDATOS_CSV = \"\"\"")
-        print(candidatos_csv.rstrip())
-        print("\"\"\"")
+    if candidatos_compacto:
+        print("# Candidatos (roster compacto)")
+        print(f"CANDIDATOS_COMPACTO = \"{candidatos_compacto}\"")
         print()
     
     print("-" * 60)
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+API HTTP de ingestão de votos para quiosques e portais externos.
+
+Servidor asyncio da biblioteca padrão (sem dependências além das do app) que
+usa as mesmas funções de src/app.py que a interface: validar_usuario para o
+login, registrar_votos (o UPSERT de registrar_voto, em lote) para gravar as
+cédulas e a apuração incremental para os totais. Cédulas seguem as mesmas regras da tela de votação: eleitor apto à
+eleição, votação aberta, ao menos um candidato, só candidatos da cédula, sem
+repetição e no máximo max_selections escolhas.
+
+Rotas (corpo e respostas em JSON, conexões keep-alive):
+    GET  /saude
+    POST /login                  {"email", "senha"}
+    GET  /candidatos?eleicao=ID
+    POST /votos                  {"email", "senha", "escolhas": [...], "eleicao": ID opcional}
+    GET  /apuracao?eleicao=ID    (somente admin, via HTTP Basic)
+
+O laço de eventos só faz o protocolo; as chamadas ao app (SQLite) rodam em um
+pool de threads, como as sessões do Streamlit, e as cédulas aceitas são
+gravadas em commits em grupo (GravadorEmLote).
+
+Uso (a partir da pasta com votos.db e os CSVs, como o `streamlit run`):
+    python -m src.api_votos --porta 8600
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+TAMANHO_MAXIMO_CORPO = 64 * 1024  # Bytes aceitos no corpo de uma requisição
+TEMPO_OCIOSO_S = 30  # Conexões keep-alive sem requisição são fechadas depois disso
+TAMANHO_MAXIMO_LOTE = 500  # Cédulas por commit no GravadorEmLote
+
+class ErroApi(Exception):
+    """Erro com status HTTP, devolvido ao cliente como {"erro": mensagem}."""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+def _carregar_app():
+    """Importa o app sem o ruído de avisos do Streamlit fora do `streamlit run`."""
+    from streamlit import logger
+
+    logger.set_log_level('error')
+    from src import app
+    return app
+
+class ServicoVotos:
+    """Regras das rotas, executadas nas threads do pool."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _eleitor(self, email, senha):
+        """
+        Valida as credenciais de um eleitor.
+
+        Returns:
+            tuple: (e-mail normalizado, nome, eleições em que está apto)
+        """
+        if not isinstance(email, str) or not isinstance(senha, str):
+            raise ErroApi(HTTPStatus.BAD_REQUEST, "Informe 'email' e 'senha' como texto.")
+        self._limitar(email)
+        valido, nome, is_admin = self.app.validar_usuario(email, senha)
+        if not valido or is_admin:
+            raise ErroApi(HTTPStatus.UNAUTHORIZED, "E-mail não encontrado ou senha (id_sbc) incorreta.")
+        # Mesma chave de cédula da tela de votação e da importação (ver registrar_votos)
+        return self.app.normalizar_email(email), nome, self.app.eleicoes_do_eleitor(email, senha)
+
+    def _limitar(self, email):
+        """Mesmo limite de tentativas do formulário de login (fora do Streamlit, só por e-mail)."""
+        espera = self.app.reservar_tentativa_login(email)
+        if espera:
+            raise ErroApi(
+                HTTPStatus.TOO_MANY_REQUESTS, f"Muitas tentativas de login. Tente novamente em {math.ceil(espera)} s."
+            )
+
+    def _eleicao_existente(self, eleicao):
+        if eleicao is None:
+            return self.app.ELEICAO_PRINCIPAL
+        if eleicao not in self.app.listar_eleicoes():
+            raise ErroApi(HTTPStatus.NOT_FOUND, f"Eleição '{eleicao}' não encontrada.")
+        return eleicao
+
+    def login(self, corpo):
+        _, nome, eleicoes = self._eleitor(corpo.get('email'), corpo.get('senha'))
+        situacao = self.app.status_das_eleicoes(eleicoes)
+        return HTTPStatus.OK, {
+            'nome': nome,
+            'eleicoes': [
+                {'id': eleicao, 'titulo': titulo, 'status': status}
+                for eleicao, (titulo, status) in situacao.items()
+            ],
+        }
+
+    def candidatos(self, eleicao):
+        with self.app.usar_eleicao(self._eleicao_existente(eleicao)):
+            self.app.inicializar_armazenamento()
+            fonte = self.app._fonte_candidatos()
+            if fonte is None:
+                raise ErroApi(HTTPStatus.SERVICE_UNAVAILABLE, "Arquivo de candidatos não encontrado.")
+            return HTTPStatus.OK, {
+                'titulo': self.app.get_titulo_votacao(),
+                'status': self.app.get_voting_status(),
+                'max_selecoes': self.app.get_max_selections(),
+                'candidatos': self.app.carregar_opcoes_candidatos(fonte),
+            }
+
+    def preparar_voto(self, corpo):
+        """
+        Valida uma cédula; a gravação fica com o GravadorEmLote.
+
+        Returns:
+            tuple: (eleição, e-mail, escolhas na ordem da cédula)
+        """
+        email, _, eleicoes = self._eleitor(corpo.get('email'), corpo.get('senha'))
+        eleicao = corpo.get('eleicao')
+        if eleicao is None:
+            if len(eleicoes) != 1:
+                raise ErroApi(HTTPStatus.BAD_REQUEST, "Eleitor apto a mais de uma eleição: informe 'eleicao'.")
+            eleicao = eleicoes[0]
+        if eleicao not in eleicoes:
+            raise ErroApi(HTTPStatus.FORBIDDEN, f"Eleitor não está apto a votar na eleição '{eleicao}'.")
+
+        escolhas = corpo.get('escolhas')
+        if not isinstance(escolhas, list) or not all(isinstance(escolha, str) for escolha in escolhas):
+            raise ErroApi(HTTPStatus.BAD_REQUEST, "Informe 'escolhas' como uma lista de candidatos.")
+
+        with self.app.usar_eleicao(eleicao):
+            if self.app.get_voting_status() != 'ABERTO':
+                raise ErroApi(HTTPStatus.CONFLICT, "A votação está encerrada.")
+            max_selections = self.app.get_max_selections()
+            if not escolhas:
+                raise ErroApi(HTTPStatus.UNPROCESSABLE_ENTITY, "Selecione ao menos um candidato.")
+            if len(escolhas) > max_selections:
+                raise ErroApi(
+                    HTTPStatus.UNPROCESSABLE_ENTITY,
+                    f"Foram selecionados {len(escolhas)} candidatos, mas o máximo permitido é {max_selections}."
+                )
+            if len(set(escolhas)) != len(escolhas):
+                raise ErroApi(HTTPStatus.UNPROCESSABLE_ENTITY, "Candidato repetido na cédula.")
+            fonte = self.app._fonte_candidatos()
+            opcoes = self.app.carregar_opcoes_candidatos(fonte) if fonte is not None else []
+            validas = set(opcoes)
+            invalidos = [escolha for escolha in escolhas if escolha not in validas]
+            if invalidos:
+                raise ErroApi(HTTPStatus.UNPROCESSABLE_ENTITY, f"Candidatos fora da cédula: {', '.join(invalidos)}")
+        # Mesma ordem da tela de votação (a da cédula)
+        escolhidas = set(escolhas)
+        return eleicao, email, [opcao for opcao in opcoes if opcao in escolhidas]
+
+    def gravar_lote(self, eleicao, cedulas):
+        with self.app.usar_eleicao(eleicao):
+            return self.app.registrar_votos(cedulas, exigir_aberta=True)
+
+    def apuracao(self, autorizacao, eleicao):
+        email, senha = _credenciais_basic(autorizacao)
+        self._limitar(email)
+        _, _, is_admin = self.app.validar_usuario(email, senha)
+        if not is_admin:
+            raise ErroApi(HTTPStatus.UNAUTHORIZED, "Apuração disponível apenas para o administrador.")
+        with self.app.usar_eleicao(self._eleicao_existente(eleicao)):
+            self.app.inicializar_armazenamento()
+            status = self.app.get_voting_status()
+            # Mesmo encerrada, apura pelo banco: o artefato congelado fica em memória
+            # e é gerado pelo processo do Streamlit, não por este
+            contagem, votantes = self.app.atualizar_apuracao()
+        return HTTPStatus.OK, {
+            'status': status,
+            'votantes': votantes,
+            'votos': dict(sorted(contagem.items(), key=lambda item: (-item[1], item[0]))),
+        }
+
+def _credenciais_basic(autorizacao):
+    """Extrai (e-mail, senha) de um cabeçalho Authorization: Basic."""
+    tipo, _, valor = (autorizacao or '').partition(' ')
+    if tipo.lower() != 'basic':
+        raise ErroApi(HTTPStatus.UNAUTHORIZED, "Use autenticação HTTP Basic.")
+    try:
+        email, _, senha = base64.b64decode(valor).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        raise ErroApi(HTTPStatus.UNAUTHORIZED, "Cabeçalho Authorization inválido.")
+    return email, senha
+
+class GravadorEmLote:
+    """
+    Commit em grupo das cédulas aceitas, uma fila por eleição.
+
+    Enquanto um lote está sendo gravado, as cédulas que chegam esperam e vão
+    todas no próximo commit: um fsync para muitas cédulas e sem threads
+    disputando o lock de escrita do SQLite (que espera em sleeps de ms).
+    """
+
+    def __init__(self, servico, executor):
+        self.servico = servico
+        self.executor = executor
+        self.pendentes = {}
+        self.gravando = set()
+
+    async def gravar(self, eleicao, email, escolhas):
+        """
+        Returns:
+            bool: False se a votação foi encerrada antes do commit
+        """
+        futuro = asyncio.get_running_loop().create_future()
+        self.pendentes.setdefault(eleicao, []).append((email, escolhas, futuro))
+        if eleicao not in self.gravando:
+            self.gravando.add(eleicao)
+            asyncio.ensure_future(self._descarregar(eleicao))
+        return await futuro
+
+    async def _descarregar(self, eleicao):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.pendentes.get(eleicao):
+                fila = self.pendentes[eleicao]
+                lote, self.pendentes[eleicao] = fila[:TAMANHO_MAXIMO_LOTE], fila[TAMANHO_MAXIMO_LOTE:]
+                cedulas = [(email, escolhas) for email, escolhas, _ in lote]
+                try:
+                    gravou = await loop.run_in_executor(self.executor, self.servico.gravar_lote, eleicao, cedulas)
+                except Exception as e:
+                    for *_, futuro in lote:
+                        futuro.set_exception(e)
+                else:
+                    for *_, futuro in lote:
+                        futuro.set_result(gravou)
+        finally:
+            self.gravando.discard(eleicao)
+            if not self.pendentes.get(eleicao):
+                self.pendentes.pop(eleicao, None)
+
+class ServidorHttp:
+    """HTTP/1.1 mínimo sobre asyncio.start_server (JSON, keep-alive, sem chunked)."""
+
+    def __init__(self, servico, threads):
+        self.servico = servico
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='ceie-api')
+        self.gravador = GravadorEmLote(servico, self.executor)
+        self.requisicoes = 0
+        self.inicio = time.monotonic()
+
+    async def _executar(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, funcao, *args)
+
+    async def rotear(self, metodo, caminho, cabecalhos, corpo):
+        url = urlsplit(caminho)
+        eleicao = parse_qs(url.query).get('eleicao', [None])[0]
+        rota = (metodo, url.path.rstrip('/') or '/')
+
+        if rota == ('GET', '/saude'):
+            return HTTPStatus.OK, {
+                'status': 'ok',
+                'requisicoes': self.requisicoes,
+                'segundos_no_ar': round(time.monotonic() - self.inicio, 1),
+            }
+        if rota == ('GET', '/candidatos'):
+            return await self._executar(self.servico.candidatos, eleicao)
+        if rota == ('GET', '/apuracao'):
+            return await self._executar(self.servico.apuracao, cabecalhos.get('authorization'), eleicao)
+        if rota in (('POST', '/login'), ('POST', '/votos')):
+            try:
+                dados = json.loads(corpo or b'{}')
+            except (ValueError, UnicodeDecodeError):
+                raise ErroApi(HTTPStatus.BAD_REQUEST, "Corpo JSON inválido.")
+            if not isinstance(dados, dict):
+                raise ErroApi(HTTPStatus.BAD_REQUEST, "O corpo deve ser um objeto JSON.")
+            if rota[1] == '/login':
+                return await self._executar(self.servico.login, dados)
+            eleicao, email, escolhas = await self._executar(self.servico.preparar_voto, dados)
+            if not await self.gravador.gravar(eleicao, email, escolhas):
+                raise ErroApi(HTTPStatus.CONFLICT, "A votação está encerrada.")
+            return HTTPStatus.CREATED, {'eleicao': eleicao, 'escolhas': len(escolhas)}
+        if url.path.rstrip('/') in ('/saude', '/candidatos', '/apuracao', '/login', '/votos'):
+            raise ErroApi(HTTPStatus.METHOD_NOT_ALLOWED, f"Método {metodo} não permitido.")
+        raise ErroApi(HTTPStatus.NOT_FOUND, "Rota não encontrada.")
+
+    async def atender(self, reader, writer):
+        """Atende as requisições de uma conexão até o cliente fechar ou pedir Connection: close."""
+        try:
+            while True:
+                try:
+                    cabecalho = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), TEMPO_OCIOSO_S)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ConnectionError):
+                    return
+                linhas = cabecalho.decode('latin-1').split('\r\n')
+                try:
+                    metodo, caminho, versao = linhas[0].split(' ', 2)
+                except ValueError:
+                    await self._responder(writer, HTTPStatus.BAD_REQUEST, {'erro': "Requisição inválida."}, False)
+                    return
+                cabecalhos = {}
+                for linha in linhas[1:]:
+                    nome, _, valor = linha.partition(':')
+                    if nome:
+                        cabecalhos[nome.strip().lower()] = valor.strip()
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao == 'keep-alive' if versao == 'HTTP/1.0' else conexao != 'close'
+
+                try:
+                    tamanho = int(cabecalhos.get('content-length', 0))
+                except ValueError:
+                    tamanho = -1
+                if not 0 <= tamanho <= TAMANHO_MAXIMO_CORPO:
+                    await self._responder(
+                        writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'erro': "Corpo ausente ou grande demais."}, False
+                    )
+                    return
+                try:
+                    corpo = await reader.readexactly(tamanho) if tamanho else b''
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+
+                self.requisicoes += 1
+                try:
+                    status, resposta = await self.rotear(metodo, caminho, cabecalhos, corpo)
+                except ErroApi as e:
+                    status, resposta = e.status, {'erro': e.mensagem}
+                except Exception as e:
+                    print(f"Erro ao atender {metodo} {caminho}: {e}")
+                    status, resposta = HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': "Erro interno."}
+                await self._responder(writer, status, resposta, manter)
+                if not manter:
+                    return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _responder(writer, status, resposta, manter):
+        dados = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        cabecalho = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n"
+            + ('WWW-Authenticate: Basic realm="ceie"\r\n' if status == HTTPStatus.UNAUTHORIZED else '')
+            + "\r\n"
+        )
+        writer.write(cabecalho.encode('latin-1') + dados)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+async def servir(host, porta, threads):
+    app = _carregar_app()
+    # Banco(s), índice de login e cédulas prontos antes da primeira requisição
+    estado = app.iniciar_aquecimento()
+    await asyncio.get_running_loop().run_in_executor(None, estado['aquecido'].wait)
+    if estado['erro_aquecimento']:
+        print(f"Aviso: aquecimento incompleto ({estado['erro_aquecimento']})")
+
+    servidor_http = ServidorHttp(ServicoVotos(app), threads)
+    servidor = await asyncio.start_server(servidor_http.atender, host, porta, backlog=1024)
+    enderecos = ", ".join(f"http://{s.getsockname()[0]}:{s.getsockname()[1]}" for s in servidor.sockets)
+    print(f"API de votos ouvindo em {enderecos}", flush=True)
+    async with servidor:
+        await servidor.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de ingestão de votos (asyncio).")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço (padrão: só local)")
+    parser.add_argument('--porta', type=int, default=8600, help="Porta HTTP")
+    parser.add_argument('--threads', type=int, default=8, help="Threads para as chamadas ao banco")
+    args = parser.parse_args()
+    try:
+        asyncio.run(servir(args.host, args.porta, args.threads))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,1214 @@
+# Módulos pesados (pandas, numpy, PIL e o SDK do Dropbox) são importados
+# dentro das funções que os usam, para que a tela de login de um app recém
+# acordado renderize sem pagar pelo import deles.
 import streamlit as st
-import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sqlite3
 from datetime import datetime, timedelta, timezone
 import os
-import shutil
+import threading
+import time
+import tempfile
 from pathlib import Path
 from io import StringIO, BytesIO
-from PIL import Image
-import numpy as np
-from collections import Counter
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+import csv
+import functools
 import json
-
-# Dropbox API imports
-try:
-    import dropbox
-    from dropbox.exceptions import ApiError, AuthError
-    DROPBOX_AVAILABLE = True
-except ImportError:
-    DROPBOX_AVAILABLE = False
+import re
+import base64
+import binascii
+import hashlib
+import math
+import unicodedata
+import zipfile
+import zlib
 
 # --- Configuração da Página ---
 st.set_page_config(page_title="Eleição CEIE", page_icon="🗳️", layout="centered")
 
+def _ler_secret(chave, padrao=None):
+    """Lê um secret, retornando o padrão quando não há secrets.toml (ex.: ferramentas de linha de comando)."""
+    try:
+        return st.secrets.get(chave, padrao)
+    except FileNotFoundError:
+        return padrao
+
 # --- Constantes e Configurações ---
 DB_FILE = 'votos.db'
 ARQUIVO_ELEITORES = 'eleitores.csv'
 ARQUIVO_CANDIDATOS = 'candidatos.csv'
-EMAIL_ADMIN = st.secrets.get("EMAIL_ADMIN", "admin@ceie.com")
-SENHA_ADMIN = st.secrets.get("PASSWORD_ADMIN", "admin123")
-MAX_SELECTIONS = int(st.secrets.get("MAX_SELECTIONS", 3))
+EMAIL_ADMIN = _ler_secret("EMAIL_ADMIN", "admin@ceie.com")
+SENHA_ADMIN = _ler_secret("PASSWORD_ADMIN", "admin123")
+MAX_SELECTIONS = int(_ler_secret("MAX_SELECTIONS", 3))
 LOGO_PATH = Path('logo')
+LARGURA_LOGO = 300  # px de CSS (max-width de .logo-container img)
+ESCALA_LOGO = 2  # Pixels por px de CSS no logo gerado (telas de alta densidade)
+QUALIDADE_LOGO_WEBP = 85
 
 # Dropbox Configuration
-DROPBOX_CONFIG = st.secrets.get("DROPBOX", {})
+DROPBOX_CONFIG = _ler_secret("DROPBOX", {})
 DROPBOX_ACCESS_TOKEN = DROPBOX_CONFIG.get("ACCESS_TOKEN", "")
 DROPBOX_FOLDER = DROPBOX_CONFIG.get("FOLDER", "/CEIE Votacao Backups")  # Pasta no Dropbox
 DROPBOX_FILE_NAME = "votos_ceie.db"  # Nome do arquivo
 # Caminho completo: pasta + arquivo
 DROPBOX_FILE_PATH = f"{DROPBOX_FOLDER.rstrip('/')}/{DROPBOX_FILE_NAME}"
+DROPBOX_REGISTRO_PATH = f"{DROPBOX_FOLDER.rstrip('/')}/eleicoes_ceie.db"  # Registro das eleições adicionais
 UPLOAD_INTERVAL_MINUTES = 15  # Intervalo para upload periódico
+INTERVALO_PAINEL_PADRAO = int(_ler_secret("INTERVALO_ATUALIZACAO_PAINEL", 5))  # Segundos entre atualizações dos resultados (0 = manual)
+TEMPO_MAXIMO_AQUECIMENTO = 60  # Segundos que uma sessão espera pelo aquecimento
+
+# Eleições adicionais (a principal usa DB_FILE, os CSVs/secrets acima e DROPBOX_FILE_PATH)
+ELEICAO_PRINCIPAL = 'principal'
+ARQUIVO_REGISTRO_ELEICOES = 'eleicoes.db'
+DIRETORIO_ELEICOES = Path('eleicoes')  # Um banco SQLite por eleição adicional
+MAX_ROSTERS_EM_CACHE = 16  # Versões de roster mantidas em cache (somando todas as eleições)
+INTERVALO_AJUSTES_ROSTER = 5  # Segundos entre buscas de ajustes do roster gravados por outros processos
+COLUNAS_ROSTER_TABELA = {
+    'eleitores': ('Email', 'Nome', 'id_sbc'),
+    'candidatos': ('Nome', 'Instituicao', 'Regiao'),
+}
+
+# Validação de CSVs enviados pelo admin
+TAMANHO_LOTE_VALIDACAO = 50_000  # Linhas processadas por vez
+MAX_LINHAS_RELATORIO = 10_000  # Limite de linhas guardadas no relatório de erros
+PADRAO_EMAIL = r'[^@\s]+@[^@\s]+\.[^@\s]+'
+SEPARADOR_ESCOLHAS_IMPORTACAO = ';'  # Entre as escolhas de uma cédula no CSV de importação
+ACOES_AJUSTE_ROSTER = ('incluir', 'alterar', 'remover')  # Coluna Acao do CSV de ajustes do roster
+
+# Exportação colunar (Parquet/Arrow) dos votos e da apuração
+TAMANHO_LOTE_EXPORTACAO = 20_000  # Votos por record batch (linhas lidas do SQLite por vez)
+FORMATOS_EXPORTACAO = {
+    'parquet': 'Parquet (zstd)',
+    'arrow': 'Arrow IPC (leitura zero-copy)',
+}
+DIRETORIO_EXPORTACOES = Path(tempfile.gettempdir()) / 'ceie_exportacoes'  # ZIPs gerados aguardando download
+VALIDADE_EXPORTACAO = 3600  # Segundos até um ZIP não baixado (ex.: sessão encerrada) ser apagado
+
+# Roster compacto gerado por gerar_secrets.py (ELEITORES_COMPACTO/CANDIDATOS_COMPACTO)
+VERSAO_ROSTER_COMPACTO = 1
+
+# Medição de desempenho
+TAMANHO_BUFFER_TEMPOS = 2000  # Amostras mantidas por (tela, fase)
+
+# Rastreamento de SQL (opcional, ativado pelo admin)
+ORCAMENTO_CONSULTAS_PADRAO = int(_ler_secret("ORCAMENTO_CONSULTAS", 10))  # Consultas por rerun
+PASSOS_PROGRESSO_SQL = 100  # Instruções da VM do SQLite entre chamadas do progress handler
+MAX_RERUNS_RASTREADOS = 200  # Reruns recentes guardados no histórico do rastreador
+
+# Métricas (OpenMetrics)
+METRICAS_CONFIG = _ler_secret("METRICAS", {})
+METRICAS_ARQUIVO = METRICAS_CONFIG.get("ARQUIVO", "metricas_ceie.prom")  # Vazio desliga o arquivo
+METRICAS_INTERVALO_SEGUNDOS = int(METRICAS_CONFIG.get("INTERVALO_SEGUNDOS", 15))
+METRICAS_PORTA = int(METRICAS_CONFIG.get("PORTA", 0))  # 0 = não serve via HTTP
+FAIXAS_METRICAS = 16  # Faixas (stripes) por métrica para reduzir contenção entre threads
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Limite de tentativas de login (token bucket por e-mail e por sessão)
+LIMITE_LOGIN_CONFIG = _ler_secret("LIMITE_LOGIN", {})
+LOGIN_RAJADA = int(LIMITE_LOGIN_CONFIG.get("RAJADA", 5))  # Tentativas seguidas antes de esperar
+LOGIN_POR_MINUTO = float(LIMITE_LOGIN_CONFIG.get("POR_MINUTO", 6))  # Tentativas repostas por minuto
+MAX_BALDES_LOGIN = int(LIMITE_LOGIN_CONFIG.get("MAX_BALDES", 50_000))  # Baldes em memória (LRU)
+
+def cache_do_processo(max_entries=None):
+    """
+    st.cache_resource para recursos consultados várias vezes por rerun ou
+    por requisição da API (estados do processo, índices do roster).
+
+    Cada chamada a uma função em cache do Streamlit custa dezenas de
+    microssegundos (hash dos argumentos e busca no cache). O recurso obtido
+    fica também em um dicionário do módulo: como o script é reexecutado a
+    cada rerun, ele vale pelo rerun atual no Streamlit e pela vida do
+    processo na API e nas ferramentas, que importam o módulo uma vez.
+    Os argumentos precisam ser hasheáveis.
+    """
+    def decorar(funcao):
+        em_cache = st.cache_resource(show_spinner=False, max_entries=max_entries)(funcao)
+        obtidos = {}
+
+        @functools.wraps(funcao)
+        def obter(*args):
+            try:
+                return obtidos[args]
+            except KeyError:
+                pass
+            recurso = em_cache(*args)
+            if max_entries is not None and len(obtidos) >= max_entries:
+                obtidos.clear()
+            obtidos[args] = recurso
+            return recurso
+
+        def limpar():
+            obtidos.clear()
+            em_cache.clear()
+        obter.clear = limpar
+        return obter
+    return decorar
+
+# --- Medição de Desempenho ---
+# Contexto do rerun em andamento (cada sessão roda o script em sua thread)
+_rerun_atual = threading.local()
+
+@cache_do_processo()
+def _registro_tempos():
+    """Buffers circulares de duração por (tela, fase), compartilhados pelo processo."""
+    return {'lock': threading.Lock(), 'amostras': {}}
+
+def _guardar_amostra(tela, fase, duracao):
+    registro = _registro_tempos()
+    amostras = registro['amostras'].get((tela, fase))
+    if amostras is None:
+        with registro['lock']:
+            amostras = registro['amostras'].setdefault(
+                (tela, fase), deque(maxlen=TAMANHO_BUFFER_TEMPOS)
+            )
+    amostras.append(duracao)
+
+@contextmanager
+def medir_fase(fase):
+    """
+    Mede a duração de uma fase do app (também pode ser usado como decorador).
+
+    Dentro de um rerun, a amostra é associada à tela exibida ao final dele;
+    fora (ex.: thread de aquecimento), fica na tela '-'.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        fases = getattr(_rerun_atual, 'fases', None)
+        if fases is None:
+            _guardar_amostra('-', fase, duracao)
+        else:
+            fases.append((fase, duracao))
+
+def definir_tela(tela):
+    """Marca a tela (login, cedula, admin...) exibida pelo rerun atual."""
+    _rerun_atual.tela = tela
+
+def executar_rerun():
+    """Executa main() medindo o rerun inteiro e as fases registradas nele."""
+    _rerun_atual.fases = []
+    _rerun_atual.tela = 'login'
+    _rerun_atual.consultas = [] if _rastreador_sql()['ativo'] else None
+    # Só cria um profiler se a captura estiver ligada (custo zero quando desligada)
+    perfil = _iniciar_perfil() if _perfilador()['ativo'] else None
+    inicio = time.perf_counter()
+    try:
+        main()
+    finally:
+        if perfil is not None:
+            _encerrar_perfil(perfil)
+        duracao = time.perf_counter() - inicio
+        tela = _rerun_atual.tela
+        for fase, duracao_fase in _rerun_atual.fases:
+            _guardar_amostra(tela, fase, duracao_fase)
+        _guardar_amostra(tela, 'rerun', duracao)
+        metricas()['rerun_duracao'].observar(duracao, tela=tela)
+        _rerun_atual.fases = None
+        _finalizar_rastreamento_rerun(tela)
+
+def _percentil(valores_ordenados, p):
+    """Percentil pelo método nearest-rank."""
+    indice = max(0, int(-(-p * len(valores_ordenados) // 100)) - 1)
+    return valores_ordenados[indice]
+
+def resumo_tempos():
+    """
+    Calcula p50/p95/p99 de cada (tela, fase) a partir dos buffers.
+
+    Returns:
+        list: Dicionários com Tela, Fase, Amostras e percentis em ms
+    """
+    registro = _registro_tempos()
+    with registro['lock']:
+        itens = list(registro['amostras'].items())
+    linhas = []
+    for (tela, fase), amostras in sorted(itens):
+        valores = sorted(amostras)
+        if not valores:
+            continue
+        linhas.append({
+            'Tela': tela,
+            'Fase': fase,
+            'Amostras': len(valores),
+            'p50 (ms)': round(_percentil(valores, 50) * 1000, 1),
+            'p95 (ms)': round(_percentil(valores, 95) * 1000, 1),
+            'p99 (ms)': round(_percentil(valores, 99) * 1000, 1),
+            'Máx (ms)': round(valores[-1] * 1000, 1),
+        })
+    return linhas
+
+def limpar_tempos():
+    """Descarta todas as amostras de desempenho."""
+    registro = _registro_tempos()
+    with registro['lock']:
+        registro['amostras'].clear()
+
+# --- Rastreamento de SQL ---
+@cache_do_processo()
+def _rastreador_sql():
+    """Estado do rastreador de SQL compartilhado pelo processo."""
+    return {
+        'lock': threading.Lock(),
+        'ativo': False,
+        'orcamento': ORCAMENTO_CONSULTAS_PADRAO,
+        # SQL normalizado -> [execuções, tempo total (s), tempo máximo (s), passos da VM]
+        'estatisticas': {},
+        'reruns': deque(maxlen=MAX_RERUNS_RASTREADOS),
+        'total_reruns': 0,
+        'reruns_acima': 0,
+    }
+
+# Por thread: (arquivo, rastreada) -> conexão devolvida com close(), pronta para reuso
+_conexoes_livres = threading.local()
+
+def _conexoes_livres_da_thread():
+    # Um processo filho (fork) não herda as conexões do pai
+    if getattr(_conexoes_livres, 'pid', None) != os.getpid():
+        _conexoes_livres.pid = os.getpid()
+        _conexoes_livres.conexoes = {}
+    return _conexoes_livres.conexoes
+
+def _identidade_arquivo(arquivo):
+    """(dispositivo, inode) do banco; muda se o arquivo for apagado ou substituído."""
+    try:
+        info = os.stat(arquivo)
+    except FileNotFoundError:
+        return None
+    return (info.st_dev, info.st_ino)
+
+class ConexaoReutilizavel(sqlite3.Connection):
+    """
+    Conexão que o close() devolve para a thread reaproveitar (ver conectar_db).
+    
+    O close() desfaz uma transação deixada aberta, como o fechamento faria. Só
+    fecha de fato se a thread já tiver outra conexão livre para o mesmo banco
+    (conexões abertas uma dentro da outra). Uma conexão nunca devolvida (ex.:
+    exceção antes do close) não fica guardada e é fechada pelo coletor, liberando
+    os locks como antes.
+    """
+    
+    chave = None  # (arquivo, rastreada), definida por conectar_db
+    identidade = None  # _identidade_arquivo na abertura
+    
+    def close(self):
+        livres = _conexoes_livres_da_thread()
+        if livres.get(self.chave) is self:
+            return  # close() repetido
+        if self.chave is None or self.chave in livres or self.identidade is None:
+            super().close()
+            return
+        if self.in_transaction:
+            self.rollback()
+        livres[self.chave] = self
+    
+    def fechar(self):
+        """Fecha de fato, sem devolver para reuso."""
+        super().close()
+
+def _normalizar_sql(sql):
+    """Troca literais por '?' e compacta espaços, para agrupar consultas iguais."""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    return " ".join(sql.split())
+
+class ConexaoRastreada(ConexaoReutilizavel):
+    """
+    Conexão que registra cada instrução executada.
+
+    O trace callback marca o início de cada instrução; ela é considerada
+    encerrada quando a próxima começa, ou no commit/close da conexão, de modo
+    que a duração inclui a leitura das linhas pelo app. O progress handler,
+    chamado a cada PASSOS_PROGRESSO_SQL instruções da VM, mede o trabalho
+    feito pelo SQLite em cada instrução.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._instrucao = None  # [sql, início, passos da VM]
+        self.set_trace_callback(self._ao_executar)
+        self.set_progress_handler(self._ao_progredir, PASSOS_PROGRESSO_SQL)
+
+    def _ao_executar(self, sql):
+        self._fechar_instrucao()
+        self._instrucao = [sql, time.perf_counter(), 0]
+
+    def _ao_progredir(self):
+        if self._instrucao is not None:
+            self._instrucao[2] += PASSOS_PROGRESSO_SQL
+        return 0  # 0 = continua a execução
+
+    def _fechar_instrucao(self):
+        if self._instrucao is None:
+            return
+        sql, inicio, passos = self._instrucao
+        self._instrucao = None
+        consulta = (_normalizar_sql(sql), time.perf_counter() - inicio, passos)
+        consultas = getattr(_rerun_atual, 'consultas', None)
+        if consultas is None:
+            _agregar_consultas([consulta])
+        else:
+            consultas.append(consulta)
+
+    def commit(self):
+        self._fechar_instrucao()
+        super().commit()
+
+    def close(self):
+        self._fechar_instrucao()
+        super().close()
+        # O ROLLBACK da devolução para reuso (ver ConexaoReutilizavel) não é uma consulta do app
+        self._instrucao = None
+
+def conectar_db():
+    """
+    Conexão com o banco da eleição atual, rastreada se o rastreador de SQL estiver ativo.
+    
+    Cada thread reaproveita a conexão que devolveu com close() ao mesmo banco
+    (um pool por eleição e por thread, ver ConexaoReutilizavel): uma conexão
+    nova custa a abertura do arquivo e a leitura do esquema na primeira
+    consulta, várias vezes o custo de uma consulta simples. Se o arquivo do
+    banco foi apagado ou substituído desde então, abre uma nova.
+    """
+    arquivo = arquivo_db()
+    rastreada = _rastreador_sql()['ativo']
+    chave = (arquivo, rastreada)
+    conn = _conexoes_livres_da_thread().pop(chave, None)
+    if conn is not None:
+        if conn.identidade == _identidade_arquivo(arquivo):
+            return conn
+        conn.fechar()
+    conn = sqlite3.connect(arquivo, factory=ConexaoRastreada if rastreada else ConexaoReutilizavel)
+    conn.chave = chave
+    conn.identidade = _identidade_arquivo(arquivo)
+    return conn
+
+def _agregar_consultas(consultas):
+    rastreador = _rastreador_sql()
+    with rastreador['lock']:
+        estatisticas = rastreador['estatisticas']
+        for sql, duracao, passos in consultas:
+            registro = estatisticas.setdefault(sql, [0, 0.0, 0.0, 0])
+            registro[0] += 1
+            registro[1] += duracao
+            registro[2] = max(registro[2], duracao)
+            registro[3] += passos
+
+def _finalizar_rastreamento_rerun(tela):
+    """Agrega as consultas do rerun e verifica o orçamento de consultas."""
+    consultas = getattr(_rerun_atual, 'consultas', None)
+    _rerun_atual.consultas = None
+    if consultas is None:
+        return
+    rastreador = _rastreador_sql()
+    _agregar_consultas(consultas)
+    excedeu = len(consultas) > rastreador['orcamento']
+    with rastreador['lock']:
+        rastreador['total_reruns'] += 1
+        if excedeu:
+            rastreador['reruns_acima'] += 1
+        rastreador['reruns'].append({
+            'Horário': datetime.now().strftime("%H:%M:%S"),
+            'Tela': tela,
+            'Consultas': len(consultas),
+            'Tempo SQL (ms)': round(sum(c[1] for c in consultas) * 1000, 2),
+            'Acima do orçamento': excedeu,
+        })
+    if excedeu:
+        print(f"⚠️ Rerun da tela '{tela}' executou {len(consultas)} consultas (orçamento: {rastreador['orcamento']}).")
+
+def ativar_rastreamento_sql(ativo, orcamento=None):
+    """Liga/desliga o rastreador; conexões abertas a partir daí seguem o novo estado."""
+    rastreador = _rastreador_sql()
+    with rastreador['lock']:
+        rastreador['ativo'] = ativo
+        if orcamento is not None:
+            rastreador['orcamento'] = int(orcamento)
+
+def limpar_rastreamento_sql():
+    rastreador = _rastreador_sql()
+    with rastreador['lock']:
+        rastreador['estatisticas'].clear()
+        rastreador['reruns'].clear()
+        rastreador['total_reruns'] = 0
+        rastreador['reruns_acima'] = 0
+
+def relatorio_sql():
+    """
+    Estatísticas agregadas das consultas, da maior para a menor em tempo total.
+
+    Returns:
+        list: Dicionários com SQL, Execuções, tempos (ms) e passos da VM
+    """
+    rastreador = _rastreador_sql()
+    with rastreador['lock']:
+        itens = [(sql, list(valores)) for sql, valores in rastreador['estatisticas'].items()]
+    itens.sort(key=lambda item: item[1][1], reverse=True)
+    return [
+        {
+            'SQL': sql,
+            'Execuções': execucoes,
+            'Tempo total (ms)': round(total * 1000, 3),
+            'Tempo médio (ms)': round(total * 1000 / execucoes, 3),
+            'Tempo máximo (ms)': round(maximo * 1000, 3),
+            'Passos da VM': passos,
+        }
+        for sql, (execucoes, total, maximo, passos) in itens
+    ]
+
+# --- Captura de Perfil (cProfile) ---
+@cache_do_processo()
+def _perfilador():
+    """Estado da captura de perfil sob demanda, compartilhado pelo processo."""
+    return {
+        'lock': threading.Lock(),
+        'ativo': False,
+        'reruns_restantes': 0,  # Modo "próximos N reruns"
+        'ate': None,  # Modo "janela de tempo" (time.time() limite)
+        'stats': None,  # pstats.Stats agregado de todas as sessões
+        'reruns_perfilados': 0,
+    }
+
+def iniciar_captura_perfil(reruns=None, minutos=None):
+    """
+    Liga a captura de perfil para os próximos N reruns (de qualquer sessão)
+    ou para todos os reruns durante uma janela de tempo.
+    """
+    perfilador = _perfilador()
+    with perfilador['lock']:
+        perfilador['reruns_restantes'] = int(reruns) if reruns else 0
+        perfilador['ate'] = time.time() + minutos * 60 if minutos else None
+        perfilador['ativo'] = True
+
+def parar_captura_perfil():
+    perfilador = _perfilador()
+    with perfilador['lock']:
+        perfilador['ativo'] = False
+        perfilador['reruns_restantes'] = 0
+        perfilador['ate'] = None
+
+def limpar_perfil():
+    perfilador = _perfilador()
+    with perfilador['lock']:
+        perfilador['stats'] = None
+        perfilador['reruns_perfilados'] = 0
+
+def _iniciar_perfil():
+    """Consome uma vaga da captura e liga o cProfile na thread do rerun atual."""
+    import cProfile
+
+    perfilador = _perfilador()
+    with perfilador['lock']:
+        if not perfilador['ativo']:
+            return None
+        if perfilador['ate'] is not None:
+            if time.time() > perfilador['ate']:
+                perfilador['ativo'] = False
+                return None
+        else:
+            perfilador['reruns_restantes'] -= 1
+            if perfilador['reruns_restantes'] <= 0:
+                perfilador['ativo'] = False
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        # Outro profiler já ativo no processo (Python 3.12+ permite só um)
+        return None
+    return perfil
+
+def _encerrar_perfil(perfil):
+    """Desliga o cProfile e soma as estatísticas ao agregado do processo."""
+    import pstats
+
+    perfil.disable()
+    perfilador = _perfilador()
+    with perfilador['lock']:
+        if perfilador['stats'] is None:
+            perfilador['stats'] = pstats.Stats(perfil)
+        else:
+            perfilador['stats'].add(perfil)
+        perfilador['reruns_perfilados'] += 1
+
+def exportar_perfil():
+    """Retorna o perfil agregado no formato .pstats (bytes) ou None."""
+    perfilador = _perfilador()
+    with perfilador['lock']:
+        if perfilador['stats'] is None:
+            return None
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, 'perfil.pstats')
+            perfilador['stats'].dump_stats(caminho)
+            with open(caminho, 'rb') as f:
+                return f.read()
+
+def funcoes_mais_custosas(limite=25):
+    """
+    Funções com maior tempo acumulado no perfil agregado.
+
+    Returns:
+        list: Dicionários com função, local, chamadas e tempos em ms
+    """
+    perfilador = _perfilador()
+    with perfilador['lock']:
+        if perfilador['stats'] is None:
+            return []
+        itens = list(perfilador['stats'].stats.items())
+    itens.sort(key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            'Função': funcao,
+            'Local': f"{os.path.basename(arquivo)}:{linha}",
+            'Chamadas': chamadas,
+            'Tempo próprio (ms)': round(proprio * 1000, 2),
+            'Tempo acumulado (ms)': round(acumulado * 1000, 2),
+        }
+        for (arquivo, linha, funcao), (_, chamadas, proprio, acumulado, _) in itens[:limite]
+    ]
+
+# --- Métricas (OpenMetrics) ---
+class _MetricaListrada:
+    """
+    Base das métricas: os valores ficam espalhados em FAIXAS_METRICAS faixas,
+    escolhidas pelo id da thread, cada uma com seu próprio lock. Threads
+    diferentes raramente disputam o mesmo lock; a leitura soma as faixas.
+    """
+
+    tipo = None
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._faixas = [(threading.Lock(), {}) for _ in range(FAIXAS_METRICAS)]
+
+    def _faixa(self):
+        return self._faixas[threading.get_ident() % FAIXAS_METRICAS]
+
+    @staticmethod
+    def _chave(rotulos):
+        return tuple(sorted(rotulos.items()))
+
+    @staticmethod
+    def _formatar_rotulos(chave, extra=()):
+        pares = list(chave) + list(extra)
+        if not pares:
+            return ''
+        return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in pares) + '}'
+
+class Contador(_MetricaListrada):
+    """Contador monotônico (exposto como <nome>_total)."""
+
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        lock, dados = self._faixa()
+        chave = self._chave(rotulos)
+        with lock:
+            dados[chave] = dados.get(chave, 0) + valor
+
+    def valores(self):
+        total = {}
+        for lock, dados in self._faixas:
+            with lock:
+                for chave, valor in dados.items():
+                    total[chave] = total.get(chave, 0) + valor
+        return total
+
+    def exposicao(self):
+        return [
+            f"{self.nome}_total{self._formatar_rotulos(chave)} {valor}"
+            for chave, valor in sorted(self.valores().items())
+        ]
+
+class Histograma(_MetricaListrada):
+    """Histograma com limites fixos (buckets cumulativos, _sum e _count)."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, limites=LIMITES_LATENCIA):
+        super().__init__(nome, ajuda)
+        self.limites = limites
+
+    def observar(self, valor, **rotulos):
+        lock, dados = self._faixa()
+        chave = self._chave(rotulos)
+        with lock:
+            registro = dados.get(chave)
+            if registro is None:
+                registro = dados[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    registro[0][i] += 1
+                    break
+            else:
+                registro[0][-1] += 1
+            registro[1] += valor
+            registro[2] += 1
+
+    def valores(self):
+        total = {}
+        for lock, dados in self._faixas:
+            with lock:
+                for chave, (contagens, soma, quantidade) in dados.items():
+                    acumulado = total.setdefault(chave, [[0] * (len(self.limites) + 1), 0.0, 0])
+                    acumulado[0] = [a + b for a, b in zip(acumulado[0], contagens)]
+                    acumulado[1] += soma
+                    acumulado[2] += quantidade
+        return total
+
+    def exposicao(self):
+        linhas = []
+        for chave, (contagens, soma, quantidade) in sorted(self.valores().items()):
+            cumulativo = 0
+            for limite, contagem in zip(list(self.limites) + ['+Inf'], contagens):
+                cumulativo += contagem
+                linhas.append(f"{self.nome}_bucket{self._formatar_rotulos(chave, [('le', limite)])} {cumulativo}")
+            linhas.append(f"{self.nome}_sum{self._formatar_rotulos(chave)} {soma}")
+            linhas.append(f"{self.nome}_count{self._formatar_rotulos(chave)} {quantidade}")
+        return linhas
+
+@cache_do_processo()
+def metricas():
+    """Registro de métricas do processo."""
+    return {
+        'login_tentativas': Contador('ceie_login_tentativas', "Tentativas de login (validar_usuario)"),
+        'logins': Contador('ceie_logins', "Logins por resultado (sucesso/falha) e tipo de usuário"),
+        'login_rejeitados': Contador('ceie_login_rejeitados', "Tentativas de login barradas pelo limite, por chave (email/sessao)"),
+        'votos': Contador('ceie_votos', "Votos registrados (novo) ou substituídos (alterado)"),
+        'dropbox_bytes': Contador('ceie_dropbox_bytes', "Bytes transferidos com o Dropbox por direção"),
+        'dropbox_latencia': Histograma('ceie_dropbox_latencia_segundos', "Latência das operações com o Dropbox"),
+        'restauracoes': Contador('ceie_restauracoes', "Restaurações do banco a partir do Dropbox"),
+        'rerun_duracao': Histograma('ceie_rerun_duracao_segundos', "Duração dos reruns do script por tela"),
+    }
+
+def gerar_openmetrics():
+    """Gera o texto de exposição OpenMetrics de todas as métricas."""
+    linhas = []
+    for metrica in metricas().values():
+        linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+        linhas.extend(metrica.exposicao())
+    linhas.append("# EOF")
+    return "\n".join(linhas) + "\n"
+
+def _gravar_metricas():
+    """Grava o arquivo de métricas de forma atômica (escreve e renomeia)."""
+    temporario = f"{METRICAS_ARQUIVO}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(gerar_openmetrics())
+    os.replace(temporario, METRICAS_ARQUIVO)
+
+def _loop_metricas():
+    while True:
+        try:
+            _gravar_metricas()
+        except OSError as e:
+            print(f"Erro ao gravar métricas: {e}")
+        time.sleep(METRICAS_INTERVALO_SEGUNDOS)
+
+def _servir_metricas():
+    """Serve /metrics em 127.0.0.1:METRICAS_PORTA."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            corpo = gerar_openmetrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        servidor = ThreadingHTTPServer(('127.0.0.1', METRICAS_PORTA), _Handler)
+    except OSError as e:
+        print(f"Erro ao abrir porta de métricas {METRICAS_PORTA}: {e}")
+        return
+    servidor.serve_forever()
+
+def iniciar_exportador_metricas():
+    """Inicia (uma vez por processo) a gravação periódica e o servidor HTTP de métricas."""
+    estado = _estado_processo()
+    if estado['exportador_metricas']:
+        return
+    with estado['lock']:
+        if estado['exportador_metricas']:
+            return
+        estado['exportador_metricas'] = True
+        if METRICAS_ARQUIVO:
+            threading.Thread(target=_loop_metricas, name='ceie-metricas', daemon=True).start()
+        if METRICAS_PORTA:
+            threading.Thread(target=_servir_metricas, name='ceie-metricas-http', daemon=True).start()
+
+# --- Registro de Eleições ---
+# Eleição fixada para a thread (ferramentas e threads em segundo plano)
+_eleicao_atual = threading.local()
+
+def eleicao_atual():
+    """
+    Eleição usada pelas funções de banco, roster e Dropbox.
+
+    Vale a fixada na thread por usar_eleicao; senão, a escolhida na sessão
+    (st.session_state.eleicao, que também vale nos reruns de fragmentos);
+    senão, a principal.
+
+    Returns:
+        str: Id da eleição
+    """
+    eleicao = getattr(_eleicao_atual, 'id', None)
+    if eleicao is None and get_script_run_ctx(suppress_warning=True) is not None:
+        eleicao = st.session_state.get('eleicao')
+    return eleicao or ELEICAO_PRINCIPAL
+
+@contextmanager
+def usar_eleicao(eleicao):
+    """Fixa a eleição das operações da thread dentro do bloco."""
+    anterior = getattr(_eleicao_atual, 'id', None)
+    _eleicao_atual.id = eleicao
+    try:
+        yield
+    finally:
+        _eleicao_atual.id = anterior
+
+@cache_do_processo()
+def _registro_eleicoes():
+    """Eleições adicionais em memória (lidas de ARQUIVO_REGISTRO_ELEICOES; ver _eleicoes_registradas)."""
+    return {'lock': threading.Lock(), 'eleicoes': None, 'assinatura': None, 'verificado_em': None}
+
+def _assinatura_registro():
+    """Muda sempre que outro processo grava no registro (mtime e tamanho do arquivo)."""
+    try:
+        info = os.stat(ARQUIVO_REGISTRO_ELEICOES)
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+def _conectar_registro():
+    conn = sqlite3.connect(ARQUIVO_REGISTRO_ELEICOES)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS eleicoes (
+            id TEXT PRIMARY KEY,
+            arquivo_db TEXT NOT NULL,
+            criada_em INTEGER,
+            versao_roster INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    return conn
+
+def _eleicoes_registradas():
+    """
+    Eleições adicionais do registro. Em um servidor novo, o registro é
+    restaurado do Dropbox antes da primeira leitura.
+    
+    Eleições criadas e rosters trocados por outros processos (ex.: a API
+    servindo enquanto o admin usa o app) aparecem em até
+    INTERVALO_AJUSTES_ROSTER segundos: nesse intervalo o arquivo é conferido
+    (_assinatura_registro) e relido só se tiver mudado.
+
+    Returns:
+        dict: Id -> {'arquivo_db', 'criada_em', 'versao_roster'}, em ordem de criação
+    """
+    estado = _registro_eleicoes()
+    if estado['eleicoes'] is None or time.monotonic() - estado['verificado_em'] >= INTERVALO_AJUSTES_ROSTER:
+        with estado['lock']:
+            if estado['eleicoes'] is None and not os.path.exists(ARQUIVO_REGISTRO_ELEICOES):
+                download_db_from_dropbox(DROPBOX_REGISTRO_PATH, ARQUIVO_REGISTRO_ELEICOES)
+            if estado['eleicoes'] is None or time.monotonic() - estado['verificado_em'] >= INTERVALO_AJUSTES_ROSTER:
+                # A assinatura vem antes da leitura: uma gravação no meio só adianta a próxima releitura
+                assinatura = _assinatura_registro()
+                if estado['eleicoes'] is None or assinatura != estado['assinatura']:
+                    conn = _conectar_registro()
+                    linhas = conn.execute(
+                        "SELECT id, arquivo_db, criada_em, versao_roster FROM eleicoes ORDER BY criada_em, id"
+                    ).fetchall()
+                    conn.close()
+                    estado['eleicoes'] = {
+                        eleicao: {'arquivo_db': arquivo, 'criada_em': criada_em, 'versao_roster': versao}
+                        for eleicao, arquivo, criada_em, versao in linhas
+                    }
+                    estado['assinatura'] = assinatura
+                estado['verificado_em'] = time.monotonic()
+    return estado['eleicoes']
+
+def listar_eleicoes():
+    """
+    Ids de todas as eleições, a principal primeiro.
+
+    Returns:
+        list: Ids das eleições
+    """
+    return [ELEICAO_PRINCIPAL, *_eleicoes_registradas()]
+
+def arquivo_db(eleicao=None):
+    """Arquivo SQLite da eleição (padrão: a atual)."""
+    eleicao = eleicao or eleicao_atual()
+    if eleicao == ELEICAO_PRINCIPAL:
+        return DB_FILE
+    return _eleicoes_registradas()[eleicao]['arquivo_db']
+
+def arquivo_resultado_final(eleicao=None):
+    """
+    Snapshot do banco tirado ao encerrar a votação (ver congelar_resultados).
+    
+    Fica ao lado do banco (votos.final.db, eleicoes/<id>.final.db), fora do
+    backup no Dropbox: no banco só vão os dados do resultado e o SHA-256 deste arquivo.
+    """
+    return Path(arquivo_db(eleicao)).with_suffix('.final.db')
+
+def _gravar_snapshot_final(snapshot):
+    """Grava o snapshot do resultado final de forma atômica (escreve e renomeia)."""
+    caminho = arquivo_resultado_final()
+    temporario = caminho.with_name(f"{caminho.name}.tmp")
+    temporario.write_bytes(snapshot)
+    os.replace(temporario, caminho)
+
+def caminho_dropbox_eleicao(eleicao=None):
+    """Caminho do backup da eleição no Dropbox (padrão: a atual); cada eleição tem o seu arquivo."""
+    eleicao = eleicao or eleicao_atual()
+    if eleicao == ELEICAO_PRINCIPAL:
+        return DROPBOX_FILE_PATH
+    return f"{DROPBOX_FOLDER.rstrip('/')}/eleicoes/{eleicao}.db"
+
+def _gerar_id_eleicao(titulo, existentes):
+    """Id legível e único a partir do título ("Conselho Fiscal" -> "conselho-fiscal")."""
+    base = unicodedata.normalize('NFKD', titulo).encode('ascii', 'ignore').decode('ascii')
+    base = re.sub(r'[^a-z0-9]+', '-', base.lower()).strip('-')[:40] or 'eleicao'
+    eleicao, n = base, 1
+    while eleicao in existentes or eleicao == ELEICAO_PRINCIPAL:
+        n += 1
+        eleicao = f"{base}-{n}"
+    return eleicao
+
+def criar_eleicao(titulo, max_selections, eleitores_csv, candidatos_csv):
+    """
+    Registra uma nova eleição com banco, roster, candidatos e configuração próprios.
+
+    Args:
+        titulo: Título da votação
+        max_selections: Número máximo de candidatos por cédula
+        eleitores_csv: Conteúdo (já validado) do CSV de eleitores
+        candidatos_csv: Conteúdo (já validado) do CSV de candidatos
+
+    Returns:
+        str: Id da eleição criada
+    """
+    estado = _registro_eleicoes()
+    _eleicoes_registradas()
+    with estado['lock']:
+        eleicao = _gerar_id_eleicao(titulo, estado['eleicoes'])
+        arquivo = str(DIRETORIO_ELEICOES / f"{eleicao}.db")
+        criada_em = int(time.time())
+        conn = _conectar_registro()
+        conn.execute(
+            "INSERT INTO eleicoes (id, arquivo_db, criada_em) VALUES (?, ?, ?)",
+            (eleicao, arquivo, criada_em)
+        )
+        conn.commit()
+        conn.close()
+        estado['eleicoes'] = {
+            **estado['eleicoes'],
+            eleicao: {'arquivo_db': arquivo, 'criada_em': criada_em, 'versao_roster': 0},
+        }
+
+    with usar_eleicao(eleicao):
+        inicializar_armazenamento()
+        set_titulo_votacao(titulo)
+        set_max_selections(max_selections)
+        salvar_rosters(eleitores_csv, candidatos_csv)
+    upload_registro_dropbox()
+    return eleicao
+
+def _incrementar_versao_roster(eleicao):
+    """Muda a assinatura do roster em tabela da eleição, invalidando os caches dele."""
+    estado = _registro_eleicoes()
+    _eleicoes_registradas()
+    with estado['lock']:
+        conn = _conectar_registro()
+        conn.execute("UPDATE eleicoes SET versao_roster = versao_roster + 1 WHERE id = ?", (eleicao,))
+        versao = conn.execute("SELECT versao_roster FROM eleicoes WHERE id = ?", (eleicao,)).fetchone()[0]
+        conn.commit()
+        conn.close()
+        # Troca o dicionário inteiro: leitores sem lock nunca veem um registro pela metade
+        estado['eleicoes'] = {
+            **estado['eleicoes'],
+            eleicao: {**estado['eleicoes'][eleicao], 'versao_roster': versao},
+        }
+
+def salvar_rosters(eleitores_csv, candidatos_csv):
+    """
+    Grava os rosters (já validados) da eleição atual: arquivos CSV locais na
+    principal e as tabelas eleitores/candidatos do banco nas demais.
+    """
+    eleicao = eleicao_atual()
+    # Um roster novo substitui os ajustes feitos sobre o anterior
+    conn = conectar_db()
+    conn.execute("DELETE FROM ajustes_eleitores")
+    conn.commit()
+    conn.close()
+    if eleicao == ELEICAO_PRINCIPAL:
+        Path(ARQUIVO_ELEITORES).write_bytes(eleitores_csv)
+        Path(ARQUIVO_CANDIDATOS).write_bytes(candidatos_csv)
+        return
+
+    conn = conectar_db()
+    for tabela, conteudo in (('eleitores', eleitores_csv), ('candidatos', candidatos_csv)):
+        texto = conteudo.decode('utf-8-sig') if isinstance(conteudo, bytes) else conteudo
+        linhas = [linha for linha in csv.reader(StringIO(texto)) if any(valor.strip() for valor in linha)]
+        colunas = [coluna.strip() for coluna in linhas[0]]
+        conn.execute(f"DELETE FROM {tabela}")
+        conn.executemany(
+            f"INSERT INTO {tabela} VALUES (?, ?, ?)",
+            _colunas_roster(colunas, linhas[1:], COLUNAS_ROSTER_TABELA[tabela])
+        )
+    conn.commit()
+    conn.close()
+    _incrementar_versao_roster(eleicao)
+    upload_db_to_dropbox()
+
+SQL_AJUSTAR_ELEITOR = '''
+    INSERT INTO ajustes_eleitores (email, nome, id_sbc, removido, seq)
+    VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM ajustes_eleitores))
+    ON CONFLICT(email) DO UPDATE SET
+        nome=excluded.nome,
+        id_sbc=excluded.id_sbc,
+        removido=excluded.removido,
+        seq=excluded.seq
+'''
+
+@medir_fase('ajustar_roster')
+def aplicar_ajustes_roster(conteudo):
+    """
+    Aplica um CSV de ajustes (já validado) ao roster de eleitores da eleição atual.
+    
+    Cada linha vira um UPSERT pela chave primária (e-mail) na tabela
+    ajustes_eleitores do banco da eleição, e o índice de login em memória é
+    atualizado no lugar, sem reler o roster. Votos, apuração e os demais
+    caches não mudam: quem foi removido e já votou continua com o voto gravado.
+    
+    Args:
+        conteudo: bytes ou str com o CSV (colunas Acao, Email, Nome, id_sbc)
+    
+    Returns:
+        dict: Eleitores incluídos, alterados e removidos, e remoções ignoradas
+              (e-mail que não estava no roster)
+    
+    Raises:
+        FileNotFoundError: Se a eleição não tiver roster de eleitores
+    """
+    indice = indice_eleitores()
+    if indice is None:
+        raise FileNotFoundError(ARQUIVO_ELEITORES)
+    texto = conteudo.decode('utf-8-sig') if isinstance(conteudo, bytes) else conteudo
+    ajustes = []
+    resumo = Counter()
+    for linha in csv.DictReader(StringIO(texto)):
+        email = normalizar_email(linha['Email'])
+        if linha['Acao'].strip().lower() == 'remover':
+            ajustes.append((email, None, None, 1))
+            resumo['removidos' if email in indice else 'ignorados'] += 1
+        else:
+            ajustes.append((email, linha['Nome'].strip(), linha['id_sbc'].strip(), 0))
+            resumo['alterados' if email in indice else 'incluidos'] += 1
+    
+    conn = conectar_db()
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    c.executemany(SQL_AJUSTAR_ELEITOR, ajustes)
+    conn.commit()
+    conn.close()
+    _sincronizar_ajustes(indice)
+    
+    upload_db_to_dropbox()
+    return {chave: resumo[chave] for chave in ('incluidos', 'alterados', 'removidos', 'ignorados')}
+
+def todas_encerradas():
+    """True se nenhuma eleição estiver aberta (tela de encerramento antes do login)."""
+    for eleicao in listar_eleicoes():
+        with usar_eleicao(eleicao):
+            inicializar_armazenamento()
+            if get_voting_status() != 'FECHADO':
+                return False
+    return True
+
+def status_das_eleicoes(eleicoes):
+    """
+    Título e status de cada eleição.
+
+    Returns:
+        dict: Id -> (título, status)
+    """
+    situacao = {}
+    for eleicao in eleicoes:
+        with usar_eleicao(eleicao):
+            inicializar_armazenamento()
+            situacao[eleicao] = (get_titulo_votacao(), get_voting_status())
+    return situacao
 
 # --- Funções Auxiliares para Leitura de CSVs ---
+def decodificar_roster_compacto(blob):
+    """
+    Decodifica um roster compacto gerado por gerar_secrets.py.
+
+    O formato é "<versão>:<sha256>:<base64(zlib(json))>", onde o JSON tem as
+    chaves "colunas" e "linhas" (todos os valores como texto) e o sha256 é
+    calculado sobre o JSON descomprimido.
+
+    Args:
+        blob: String do roster compacto
+
+    Returns:
+        tuple: (colunas, linhas)
+
+    Raises:
+        ValueError: Se a versão não for suportada ou o checksum não conferir
+    """
+    try:
+        versao, checksum, dados = blob.strip().split(':', 2)
+        versao = int(versao)
+    except ValueError:
+        raise ValueError("Roster compacto em formato inválido.")
+    if versao != VERSAO_ROSTER_COMPACTO:
+        raise ValueError(f"Versão {versao} do roster compacto não suportada.")
+
+    try:
+        bruto = zlib.decompress(base64.b64decode(dados))
+    except (binascii.Error, zlib.error) as e:
+        raise ValueError(f"Roster compacto corrompido: {e}")
+    if hashlib.sha256(bruto).hexdigest() != checksum:
+        raise ValueError("Checksum do roster compacto não confere.")
+
+    payload = json.loads(bruto)
+    return payload['colunas'], payload['linhas']
+
+@cache_do_processo(max_entries=4)
+def _roster_compacto_decodificado(chave, checksum):
+    """Decodifica o roster compacto dos secrets uma única vez por processo (por checksum)."""
+    return decodificar_roster_compacto(_ler_secret(chave))
+
+def _fonte_roster(arquivo, chave_compacto, chave_csv):
+    """
+    Identifica de onde o roster da eleição principal será lido, na ordem:
+    arquivo local, roster compacto dos secrets e CSV em texto dos secrets.
+
+    Returns:
+        tuple: Assinatura da fonte (muda quando o conteúdo muda) ou None
+    """
+    if os.path.exists(arquivo):
+        stat = os.stat(arquivo)
+        return ('arquivo', arquivo, stat.st_mtime_ns, stat.st_size)
+    compacto = _ler_secret(chave_compacto)
+    if compacto:
+        checksum = compacto.split(':', 2)[1] if compacto.count(':') >= 2 else ''
+        return ('compacto', chave_compacto, checksum)
+    texto_csv = _ler_secret(chave_csv)
+    if texto_csv:
+        return ('csv', chave_csv, hash(texto_csv))
+    return None
+
+def _ler_roster(fonte, como_texto=False):
+    """
+    Lê o roster indicado por _fonte_roster como DataFrame.
+
+    Args:
+        fonte: Assinatura retornada por _fonte_roster
+        como_texto: Se True, lê todas as colunas como texto
+
+    Returns:
+        DataFrame: Conteúdo do roster
+    """
+    import pandas as pd
+
+    tipo, origem = fonte[0], fonte[1]
+    opcoes = {'dtype': str, 'keep_default_na': False} if como_texto else {}
+    if tipo == 'arquivo':
+        return pd.read_csv(origem, **opcoes)
+    if tipo in ('compacto', 'tabela'):
+        # O roster compacto e as tabelas guardam todos os valores como texto
+        colunas, linhas = _ler_linhas_roster(fonte)
+        return pd.DataFrame(linhas, columns=colunas)
+    return pd.read_csv(StringIO(_ler_secret(origem)), **opcoes)
+
+def _ler_linhas_roster(fonte):
+    """
+    Lê o roster como listas de texto usando o módulo csv (sem pandas), para
+    que o caminho de login não precise importar o pandas.
+
+    Args:
+        fonte: Assinatura retornada por _fonte_roster
+
+    Returns:
+        tuple: (colunas, linhas)
+    """
+    tipo, origem = fonte[0], fonte[1]
+    if tipo == 'compacto':
+        return _roster_compacto_decodificado(origem, fonte[2])
+    if tipo == 'tabela':
+        conn = sqlite3.connect(origem)
+        cursor = conn.execute(f"SELECT * FROM {fonte[2]} ORDER BY rowid")
+        colunas = [descricao[0] for descricao in cursor.description]
+        linhas = cursor.fetchall()
+        conn.close()
+        return colunas, linhas
+    if tipo == 'arquivo':
+        with open(origem, newline='', encoding='utf-8-sig') as f:
+            linhas = list(csv.reader(f))
+    else:
+        linhas = list(csv.reader(StringIO(_ler_secret(origem))))
+    # Ignora linhas em branco, como o pd.read_csv
+    linhas = [linha for linha in linhas if any(valor.strip() for valor in linha)]
+    if not linhas:
+        return [], []
+    return linhas[0], linhas[1:]
+
+def _colunas_roster(colunas, linhas, nomes):
+    """
+    Extrai as colunas pedidas de linhas lidas por _ler_linhas_roster.
+
+    Raises:
+        ValueError: Se alguma coluna obrigatória não existir
+    """
+    indices = []
+    for nome in nomes:
+        if nome not in colunas:
+            raise ValueError(f"Coluna obrigatória '{nome}' não encontrada.")
+        indices.append(colunas.index(nome))
+    for linha in linhas:
+        yield tuple(linha[i] if i < len(linha) else '' for i in indices)
+
+def _fonte_tabela(tabela):
+    """Assinatura do roster de uma eleição adicional, guardado em tabela do próprio banco."""
+    registro = _eleicoes_registradas()[eleicao_atual()]
+    return ('tabela', registro['arquivo_db'], tabela, registro['versao_roster'])
+
+def _fonte_eleitores():
+    if eleicao_atual() != ELEICAO_PRINCIPAL:
+        return _fonte_tabela('eleitores')
+    return _fonte_roster(ARQUIVO_ELEITORES, 'ELEITORES_COMPACTO', 'ELEITORES_CSV')
+
+def _fonte_candidatos():
+    if eleicao_atual() != ELEICAO_PRINCIPAL:
+        return _fonte_tabela('candidatos')
+    return _fonte_roster(ARQUIVO_CANDIDATOS, 'CANDIDATOS_COMPACTO', 'CANDIDATOS_CSV')
+
 def ler_csv_eleitores():
     """Lê o CSV de eleitores do arquivo ou dos secrets."""
     try:
-        # Tenta ler do arquivo primeiro
-        if os.path.exists(ARQUIVO_ELEITORES):
-            return pd.read_csv(ARQUIVO_ELEITORES)
-        # Se não existir, tenta ler dos secrets
-        elif 'ELEITORES_CSV' in st.secrets:
-            return pd.read_csv(StringIO(st.secrets['ELEITORES_CSV']))
-        else:
+        fonte = _fonte_eleitores()
+        if fonte is None:
             raise FileNotFoundError(
                 f"Arquivo '{ARQUIVO_ELEITORES}' não encontrado e "
-                "secret 'ELEITORES_CSV' não configurado."
+                "secrets 'ELEITORES_COMPACTO'/'ELEITORES_CSV' não configurados."
             )
+        return _ler_roster(fonte)
     except Exception as e:
         st.error(f"Erro ao carregar eleitores: {e}")
         raise
@@ -62,36 +1216,202 @@ def ler_csv_eleitores():
 def ler_csv_candidatos():
     """Lê o CSV de candidatos do arquivo ou dos secrets."""
     try:
-        # Tenta ler do arquivo primeiro
-        if os.path.exists(ARQUIVO_CANDIDATOS):
-            return pd.read_csv(ARQUIVO_CANDIDATOS)
-        # Se não existir, tenta ler dos secrets
-        elif 'CANDIDATOS_CSV' in st.secrets:
-            return pd.read_csv(StringIO(st.secrets['CANDIDATOS_CSV']))
-        else:
+        fonte = _fonte_candidatos()
+        if fonte is None:
             raise FileNotFoundError(
                 f"Arquivo '{ARQUIVO_CANDIDATOS}' não encontrado e "
-                "secret 'CANDIDATOS_CSV' não configurado."
+                "secrets 'CANDIDATOS_COMPACTO'/'CANDIDATOS_CSV' não configurados."
             )
+        return _ler_roster(fonte)
     except Exception as e:
         st.error(f"Erro ao carregar candidatos: {e}")
         raise
 
+def normalizar_email(email):
+    """
+    Forma única do e-mail em todo o app (sem espaços nas pontas, minúsculo): login,
+    roster, chave das cédulas em votos e resultado congelado.
+    """
+    return email.strip().lower()
+
+def _normalizar_id_sbc(valor):
+    """Converte o id_sbc lido como texto para a forma comparada no login ('1001.0' -> '1001')."""
+    valor = str(valor).strip()
+    try:
+        return str(int(valor))
+    except ValueError:
+        try:
+            return str(int(float(valor)))
+        except ValueError:
+            return None
+
+class IndiceEleitores(dict):
+    """Índice de login com os ajustes do roster aplicados até seq_ajustes (ver indice_eleitores)."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.seq_ajustes = 0
+        self.verificado_em = None
+        self.lock = threading.Lock()
+
+@cache_do_processo(max_entries=MAX_ROSTERS_EM_CACHE)
+def carregar_indice_eleitores(fonte):
+    """
+    Monta o índice de login compartilhado por todas as sessões.
+
+    O roster é lido uma única vez por versão da fonte (arquivo ou secret) e
+    vira um dicionário e-mail -> (nome, id_sbc), tornando o login uma busca O(1).
+
+    Args:
+        fonte: Assinatura retornada por _fonte_eleitores
+
+    Returns:
+        IndiceEleitores: E-mail normalizado -> (nome, id_sbc normalizado ou None),
+            ainda sem os ajustes do roster
+    """
+    colunas, linhas = _ler_linhas_roster(fonte)
+    indice = IndiceEleitores()
+    for email, nome, id_sbc in _colunas_roster(colunas, linhas, ('Email', 'Nome', 'id_sbc')):
+        email = normalizar_email(email)
+        # Mantém a primeira ocorrência, como a busca original por e-mail
+        if email not in indice:
+            indice[email] = (nome, _normalizar_id_sbc(id_sbc))
+    return indice
+
+def _sincronizar_ajustes(indice):
+    """Aplica ao índice, no lugar, os ajustes do roster gravados depois do último já aplicado."""
+    with indice.lock:
+        conn = conectar_db()
+        linhas = conn.execute(
+            "SELECT email, nome, id_sbc, removido, seq FROM ajustes_eleitores WHERE seq > ? ORDER BY seq",
+            (indice.seq_ajustes,)
+        ).fetchall()
+        conn.close()
+        for email, nome, id_sbc, removido, seq in linhas:
+            if removido:
+                indice.pop(email, None)
+            else:
+                indice[email] = (nome, _normalizar_id_sbc(id_sbc))
+            indice.seq_ajustes = seq
+        indice.verificado_em = time.monotonic()
+
+def indice_eleitores():
+    """
+    Índice de login da eleição atual: o roster da fonte mais os ajustes do roster.
+    
+    O índice montado por carregar_indice_eleitores é atualizado no lugar: os
+    ajustes gravados neste processo entram na hora (aplicar_ajustes_roster) e
+    os de outros processos (ex.: a API) são buscados a cada
+    INTERVALO_AJUSTES_ROSTER segundos, lendo só as linhas novas pelo seq.
+    
+    Returns:
+        IndiceEleitores ou None: None se a eleição não tiver roster de eleitores
+    """
+    # Os ajustes ficam no banco da eleição (no-op depois da primeira vez no processo)
+    inicializar_armazenamento()
+    fonte = _fonte_eleitores()
+    if fonte is None:
+        return None
+    indice = carregar_indice_eleitores(fonte)
+    if indice.verificado_em is None or time.monotonic() - indice.verificado_em >= INTERVALO_AJUSTES_ROSTER:
+        _sincronizar_ajustes(indice)
+    return indice
+
+@cache_do_processo(max_entries=MAX_ROSTERS_EM_CACHE)
+def carregar_opcoes_candidatos(fonte):
+    """
+    Monta a lista ordenada de opções da cédula, "Nome (Instituição - Região)".
+
+    Args:
+        fonte: Assinatura retornada por _fonte_candidatos
+
+    Returns:
+        list: Rótulos dos candidatos em ordem alfabética
+    """
+    colunas, linhas = _ler_linhas_roster(fonte)
+    return sorted(
+        f"{nome} ({instituicao} - {regiao})"
+        for nome, instituicao, regiao in _colunas_roster(colunas, linhas, ('Nome', 'Instituicao', 'Regiao'))
+    )
+
+@cache_do_processo(max_entries=MAX_ROSTERS_EM_CACHE)
+def carregar_atributos_candidatos(fonte):
+    """
+    Mapeia cada opção da cédula para o nome, a instituição e a região do candidato.
+    
+    Args:
+        fonte: Assinatura retornada por _fonte_candidatos
+    
+    Returns:
+        dict: "Nome (Instituição - Região)" -> (nome, instituição, região)
+    """
+    colunas, linhas = _ler_linhas_roster(fonte)
+    return {
+        f"{nome} ({instituicao} - {regiao})": (nome, instituicao, regiao)
+        for nome, instituicao, regiao in _colunas_roster(colunas, linhas, ('Nome', 'Instituicao', 'Regiao'))
+    }
+
 # --- Funções de Banco de Dados (SQLite) ---
+@medir_fase('init_db')
 def init_db():
     """Inicializa o banco de dados e tabela de configuração se não existirem."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = conectar_db()
     c = conn.cursor()
+    # Criação e migrações em uma única transação com o lock de escrita: um
+    # processo iniciando ao mesmo tempo (ex.: app e API) espera e já encontra
+    # o esquema migrado, e uma falha no meio não deixa a migração pela metade
+    c.execute("BEGIN IMMEDIATE")
     
-    # Tabela de Votos (user_id é Chave Primária para permitir atualização de voto)
+    # Tabela de Votos (user_id é Chave Primária para permitir atualização de voto).
+    # seq cresce a cada gravação e permite ler só os votos novos; horários em
+    # epoch (segundos, inteiro) para agregações pelo índice: criado_em = primeiro
+    # voto do eleitor, atualizado_em = última alteração
     c.execute('''
         CREATE TABLE IF NOT EXISTS votos (
             user_id TEXT PRIMARY KEY,
             escolhas TEXT,
-            timestamp DATETIME
+            timestamp DATETIME,
+            seq INTEGER,
+            criado_em INTEGER,
+            atualizado_em INTEGER
         )
     ''')
     
+    # Migração de bancos criados antes dessas colunas (conferidas uma a uma, já com o lock)
+    colunas_votos = {coluna[1] for coluna in c.execute("PRAGMA table_info(votos)")}
+    if 'seq' not in colunas_votos:
+        c.execute("ALTER TABLE votos ADD COLUMN seq INTEGER")
+        c.execute("UPDATE votos SET seq = rowid")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_votos_seq ON votos (seq)")
+    
+    horarios = [coluna for coluna in ('criado_em', 'atualizado_em') if coluna not in colunas_votos]
+    for coluna in horarios:
+        c.execute(f"ALTER TABLE votos ADD COLUMN {coluna} INTEGER")
+    if horarios:
+        # timestamp está no horário local; 'utc' converte para epoch UTC
+        c.execute('''
+            UPDATE votos SET
+                criado_em = COALESCE(criado_em, CAST(strftime('%s', timestamp, 'utc') AS INTEGER)),
+                atualizado_em = COALESCE(atualizado_em, CAST(strftime('%s', timestamp, 'utc') AS INTEGER))
+        ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_votos_criado_em ON votos (criado_em)")
+    
+    # Cédulas gravadas antes de o user_id ser normalizado: o mesmo eleitor pode ter
+    # uma linha por grafia do e-mail (ex.: tela e importação). Fica a mais recente
+    conn.create_function('normalizar_email', 1, normalizar_email, deterministic=True)
+    if c.execute("SELECT 1 FROM votos WHERE user_id != normalizar_email(user_id) LIMIT 1").fetchone():
+        c.execute('''
+            DELETE FROM votos WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (
+                        PARTITION BY normalizar_email(user_id) ORDER BY seq DESC, rowid DESC
+                    ) AS ordem
+                    FROM votos
+                ) WHERE ordem > 1
+            )
+        ''')
+        c.execute("UPDATE votos SET user_id = normalizar_email(user_id) WHERE user_id != normalizar_email(user_id)")
+    
     # Tabela de Configuração (Estado da Votação)
     c.execute('''
         CREATE TABLE IF NOT EXISTS config (
@@ -100,40 +1420,102 @@ def init_db():
         )
     ''')
     
+    # Resultado final congelado ao encerrar a votação (no máximo uma linha)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS resultado_final (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            gerado_em INTEGER,
+            dados TEXT,
+            hash_snapshot TEXT
+        )
+    ''')
+    
+    # Migração: versões anteriores guardavam aqui o snapshot e o CSV de auditoria,
+    # multiplicando o tamanho do banco e de cada upload. O snapshot vai para
+    # arquivo_resultado_final(); o CSV é refeito a partir dele quando pedido
+    colunas_final = {coluna[1] for coluna in c.execute("PRAGMA table_info(resultado_final)")}
+    compactar = False
+    if 'snapshot' in colunas_final:
+        row = c.execute("SELECT snapshot FROM resultado_final WHERE id = 1").fetchone()
+        if row and row[0] and not arquivo_resultado_final().exists():
+            _gravar_snapshot_final(row[0])
+        c.execute("ALTER TABLE resultado_final DROP COLUMN snapshot")
+        compactar = True
+    if 'csv_auditoria' in colunas_final:
+        c.execute("ALTER TABLE resultado_final DROP COLUMN csv_auditoria")
+        compactar = True
+    
+    # Roster e candidatos das eleições adicionais (a principal usa os CSVs/secrets)
+    for tabela, colunas in COLUNAS_ROSTER_TABELA.items():
+        definicao = ", ".join(f'"{coluna}" TEXT' for coluna in colunas)
+        c.execute(f"CREATE TABLE IF NOT EXISTS {tabela} ({definicao})")
+    
+    # Ajustes do roster de eleitores (inclusões, alterações e remoções) sobre a
+    # fonte do roster; seq cresce a cada gravação, como em votos
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ajustes_eleitores (
+            email TEXT PRIMARY KEY,
+            nome TEXT,
+            id_sbc TEXT,
+            removido INTEGER NOT NULL DEFAULT 0,
+            seq INTEGER NOT NULL
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ajustes_eleitores_seq ON ajustes_eleitores (seq)")
+    
     # Define estado inicial como ABERTO se não existir
     c.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('status', 'ABERTO')")
     
     # Inicializa campo de último upload do Dropbox (se não existir)
     c.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('ultimo_upload_dropbox', '')")
     
+    # Identifica o conjunto de votos atual (muda quando a votação é resetada)
+    c.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('geracao_votos', ?)", (datetime.now().isoformat(),))
+    
     # Inicializa título da votação com valor padrão
     c.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('titulo_votacao', 'Eleição CEIE')")
     
     # Inicializa número máximo de seleções com valor padrão de secrets
-    max_selections_default = str(int(st.secrets.get("MAX_SELECTIONS", 3)))
+    max_selections_default = str(MAX_SELECTIONS)
     c.execute("INSERT OR IGNORE INTO config (chave, valor) VALUES ('max_selections', ?)", (max_selections_default,))
     
     conn.commit()
+    if compactar:
+        # Devolve o espaço das colunas removidas (VACUUM não roda dentro de transação)
+        conn.execute("VACUUM")
     conn.close()
 
 def get_voting_status():
-    conn = sqlite3.connect(DB_FILE)
+    # Com o resultado congelado em memória a votação está encerrada: não precisa ler o banco
+    if _resultados_congelados(eleicao_atual())['artefato'] is not None:
+        return 'FECHADO'
+    conn = conectar_db()
     status = conn.cursor().execute("SELECT valor FROM config WHERE chave='status'").fetchone()[0]
     conn.close()
     return status
 
 def set_voting_status(new_status):
-    conn = sqlite3.connect(DB_FILE)
-    conn.cursor().execute("UPDATE config SET valor = ? WHERE chave='status'", (new_status,))
+    conn = conectar_db()
+    c = conn.cursor()
+    c.execute("UPDATE config SET valor = ? WHERE chave='status'", (new_status,))
+    if new_status != 'FECHADO':
+        # Reabrir invalida o resultado congelado (na mesma transação)
+        c.execute("DELETE FROM resultado_final")
     conn.commit()
     conn.close()
     
+    estado = _resultados_congelados(eleicao_atual())
+    with estado['lock']:
+        estado['artefato'] = congelar_resultados() if new_status == 'FECHADO' else None
+        if new_status != 'FECHADO':
+            arquivo_resultado_final().unlink(missing_ok=True)
+    
     # Upload imediato para Dropbox ao mudar status
     upload_db_to_dropbox()
 
 def get_titulo_votacao():
     """Lê título da votação da tabela config, retorna 'Eleição CEIE' como padrão se não existir."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = conectar_db()
     c = conn.cursor()
     result = c.execute("SELECT valor FROM config WHERE chave='titulo_votacao'").fetchone()
     conn.close()
@@ -143,7 +1525,7 @@ def get_titulo_votacao():
 
 def set_titulo_votacao(titulo):
     """Salva título da votação na tabela config."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = conectar_db()
     c = conn.cursor()
     c.execute("INSERT OR REPLACE INTO config (chave, valor) VALUES (?, ?)", ('titulo_votacao', titulo))
     conn.commit()
@@ -151,7 +1533,7 @@ def set_titulo_votacao(titulo):
 
 def get_max_selections():
     """Lê número máximo de seleções da tabela config, retorna valor de st.secrets como fallback."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = conectar_db()
     c = conn.cursor()
     result = c.execute("SELECT valor FROM config WHERE chave='max_selections'").fetchone()
     conn.close()
@@ -161,50 +1543,400 @@ def get_max_selections():
         except (ValueError, TypeError):
             pass
     # Fallback para secrets
-    return int(st.secrets.get("MAX_SELECTIONS", 3))
+    return MAX_SELECTIONS
 
 def set_max_selections(max_selections):
     """Salva número máximo de seleções na tabela config."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = conectar_db()
     c = conn.cursor()
     c.execute("INSERT OR REPLACE INTO config (chave, valor) VALUES (?, ?)", ('max_selections', str(max_selections)))
     conn.commit()
     conn.close()
 
-def registrar_voto(user_id, escolhas_lista):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    escolhas_str = ", ".join(escolhas_lista)
-    data_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# UPSERT: Insere ou Atualiza se o ID já existir (Permite mudar o voto)
+# seq = maior seq + 1 (busca no índice); a gravação é serializada pelo SQLite
+SQL_GRAVAR_VOTO = '''
+    INSERT INTO votos (user_id, escolhas, timestamp, seq, criado_em, atualizado_em) 
+    VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM votos), ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        escolhas=excluded.escolhas,
+        timestamp=excluded.timestamp,
+        seq=excluded.seq,
+        atualizado_em=excluded.atualizado_em
+'''
+
+@medir_fase('registrar_voto')
+def registrar_voto(user_id, escolhas_lista):
+    """Grava o voto do eleitor; False se a votação já estava encerrada (nada é gravado)."""
+    # O status é conferido dentro da transação: um voto confirmado enquanto o admin
+    # encerra não entra no banco depois do snapshot do resultado congelado
+    return registrar_votos([(user_id, escolhas_lista)], exigir_aberta=True)
+
+def registrar_votos(cedulas, exigir_aberta=False, upload_periodico=True):
+    """
+    Grava várias cédulas em uma única transação (um commit para o lote todo).
+    
+    Cada cédula recebe seu próprio seq, na ordem da lista; se um eleitor aparece
+    mais de uma vez, a última cédula prevalece, como em votos sucessivos. O
+    user_id é gravado normalizado (normalizar_email): a cédula da tela, da API e
+    da importação de cédulas em papel de um mesmo eleitor é uma só.
+    
+    Args:
+        cedulas: Lista de (user_id, lista de escolhas)
+        exigir_aberta: Se True, confere o status dentro da transação e não grava
+            nada se a votação estiver encerrada
+        upload_periodico: Se False, não verifica o upload periódico (quem chama sincroniza)
+    
+    Returns:
+        bool: False se exigir_aberta e a votação estava encerrada; True caso contrário
+    """
+    agora = datetime.now()
+    data_hora = agora.strftime("%Y-%m-%d %H:%M:%S")
+    epoch = int(agora.timestamp())
+    conn = conectar_db()
+    c = conn.cursor()
+    # Lock de escrita desde o início: status e votos lidos abaixo não mudam até o commit
+    c.execute("BEGIN IMMEDIATE")
+    if exigir_aberta:
+        status = c.execute("SELECT valor FROM config WHERE chave='status'").fetchone()
+        if not status or status[0] != 'ABERTO':
+            conn.rollback()
+            conn.close()
+            return False
+    
+    # Para as métricas, voto novo x alterado: só o ramo INSERT do UPSERT cria
+    # linhas, sempre com rowid acima do maior existente (o UPDATE mantém o rowid)
+    ultimo_rowid = c.execute("SELECT COALESCE(MAX(rowid), 0) FROM votos").fetchone()[0]
+    c.executemany(SQL_GRAVAR_VOTO, [
+        (normalizar_email(user_id), ", ".join(escolhas_lista), data_hora, epoch, epoch)
+        for user_id, escolhas_lista in cedulas
+    ])
+    novos = c.execute("SELECT COUNT(*) FROM votos WHERE rowid > ?", (ultimo_rowid,)).fetchone()[0]
+    
+    conn.commit()
+    conn.close()
+    if novos:
+        metricas()['votos'].inc(novos, tipo='novo')
+    if len(cedulas) > novos:
+        metricas()['votos'].inc(len(cedulas) - novos, tipo='alterado')
+    
+    # Verifica se precisa fazer upload periódico para Dropbox
+    if upload_periodico:
+        verificar_upload_periodico()
+    return True
+
+def carregar_voto_existente(user_id):
+    conn = conectar_db()
+    row = conn.cursor().execute(
+        "SELECT escolhas FROM votos WHERE user_id = ?", (normalizar_email(user_id),)
+    ).fetchone()
+    conn.close()
+    if row:
+        return row[0].split(", ")
+    return []
+
+def get_resultados_df():
+    import pandas as pd
+
+    conn = conectar_db()
+    df = pd.read_sql_query("SELECT user_id, escolhas, timestamp FROM votos", conn)
+    conn.close()
+    return df
+
+def ler_snapshot_db(arquivo=None):
+    """
+    Copia o banco para um snapshot consistente em memória (API de backup do SQLite).
+    
+    Ler votos.db com open() durante gravações pode pegar uma cópia pela metade e,
+    ao fechar o arquivo, libera os locks POSIX das outras conexões do processo,
+    o que leva a erros de I/O e votos perdidos sob concorrência.
+    
+    Args:
+        arquivo: Banco a copiar (padrão: o da eleição atual)
+    
+    Returns:
+        bytes: Conteúdo do banco no formato de arquivo do SQLite
+    """
+    origem = sqlite3.connect(arquivo or arquivo_db())
+    destino = sqlite3.connect(':memory:')
+    try:
+        origem.backup(destino)
+        return destino.serialize()
+    finally:
+        origem.close()
+        destino.close()
+
+# --- Apuração Incremental ---
+@cache_do_processo()
+def _apuracao(eleicao):
+    """Contagem em memória da eleição, compartilhada pelas sessões de admin do processo."""
+    return {
+        'lock': threading.Lock(), 'geracao': None, 'ultimo_seq': 0,
+        'cedulas': {}, 'contagem': Counter(), 'linha_tempo': Counter(),
+    }
+
+def atualizar_apuracao():
+    """
+    Atualiza a contagem em memória lendo só as cédulas gravadas desde a última leitura.
+    
+    Cada gravação de registrar_voto recebe um seq maior que todos os anteriores,
+    então basta buscar seq > último visto: o custo é proporcional aos votos novos,
+    não ao total. Voto alterado tem as escolhas antigas descontadas. Se a votação
+    foi resetada (geracao_votos mudou) ou o banco voltou para um estado anterior,
+    a contagem recomeça do zero.
+    
+    Também mantém a linha do tempo de comparecimento (novos votantes por minuto):
+    ao recomeçar, ela vem de um GROUP BY sobre o índice de criado_em; depois,
+    cada eleitor novo lido por seq soma um na sua faixa.
+    
+    Returns:
+        tuple: (Counter candidato -> votos, total de votantes)
+    """
+    estado = _apuracao(eleicao_atual())
+    with estado['lock']:
+        conn = conectar_db()
+        c = conn.cursor()
+        # Transação de leitura: todas as consultas abaixo veem o mesmo estado do banco
+        c.execute("BEGIN")
+        geracao = c.execute("SELECT valor FROM config WHERE chave='geracao_votos'").fetchone()
+        geracao = geracao[0] if geracao else ''
+        maior_seq = c.execute("SELECT MAX(seq) FROM votos").fetchone()[0] or 0
+        recomecou = geracao != estado['geracao'] or maior_seq < estado['ultimo_seq']
+        if recomecou:
+            linha_tempo = c.execute(
+                "SELECT criado_em / 60 * 60, COUNT(*) FROM votos WHERE criado_em IS NOT NULL GROUP BY 1"
+            ).fetchall()
+            estado.update(
+                geracao=geracao, ultimo_seq=0, cedulas={}, contagem=Counter(),
+                linha_tempo=Counter(dict(linha_tempo)),
+            )
+        
+        novas = c.execute(
+            "SELECT user_id, escolhas, seq, criado_em FROM votos WHERE seq > ? ORDER BY seq",
+            (estado['ultimo_seq'],)
+        ).fetchall()
+        conn.close()
+        
+        cedulas, contagem = estado['cedulas'], estado['contagem']
+        for user_id, escolhas, seq, criado_em in novas:
+            anterior = cedulas.get(user_id)
+            if anterior:
+                contagem.subtract(anterior)
+            elif anterior is None and not recomecou and criado_em is not None:
+                # Eleitor novo desde a última leitura (já contado se a linha do tempo veio do GROUP BY)
+                estado['linha_tempo'][criado_em // 60 * 60] += 1
+            atual = escolhas.split(", ") if escolhas else []
+            contagem.update(atual)
+            cedulas[user_id] = atual
+            estado['ultimo_seq'] = seq
+        
+        # Cópia sem candidatos zerados (votos alterados podem deixar zeros)
+        return +contagem, len(cedulas)
+
+def linha_do_tempo_apuracao():
+    """
+    Novos votantes por minuto, como mantidos por atualizar_apuracao.
+    
+    Returns:
+        dict: Início do minuto (epoch em segundos) -> eleitores que votaram pela primeira vez
+    """
+    estado = _apuracao(eleicao_atual())
+    with estado['lock']:
+        return dict(estado['linha_tempo'])
+
+# --- Resultado Congelado (votação encerrada) ---
+@cache_do_processo()
+def _resultados_congelados(eleicao):
+    """Resultado final da eleição encerrada em memória (None enquanto aberta)."""
+    return {'lock': threading.Lock(), 'artefato': None}
+
+def congelar_resultados():
+    """
+    Calcula e grava o resultado final da votação em uma única passada.
+    
+    Tudo sai do mesmo snapshot do banco: contagem por candidato, cédula de cada
+    eleitor (para a tela do eleitor), linha do tempo, CSV de auditoria e o
+    SHA-256 do snapshot. Enquanto a votação estiver encerrada, a área do admin
+    e os downloads são servidos daqui.
+    
+    No banco ficam só os dados do resultado e o SHA-256; o snapshot vai para
+    arquivo_resultado_final() e o CSV fica em memória (ver arquivos_resultado_final).
+    
+    Returns:
+        dict: Artefato com o resultado congelado
+    """
+    import pandas as pd
+
+    snapshot = ler_snapshot_db()
+    copia = sqlite3.connect(':memory:')
+    copia.deserialize(snapshot)
+    linhas = copia.execute(
+        "SELECT user_id, escolhas, timestamp, criado_em FROM votos ORDER BY rowid"
+    ).fetchall()
+    copia.close()
+    
+    cedulas = {}
+    contagem = Counter()
+    linha_tempo = Counter()
+    for user_id, escolhas, _, criado_em in linhas:
+        cedulas[user_id] = escolhas.split(", ") if escolhas else []
+        contagem.update(cedulas[user_id])
+        if criado_em is not None:
+            linha_tempo[criado_em // 60 * 60] += 1
+    
+    df_votos = pd.DataFrame([linha[:3] for linha in linhas], columns=['user_id', 'escolhas', 'timestamp'])
+    artefato = {
+        'gerado_em': int(time.time()),
+        'total_votantes': len(cedulas),
+        'contagem': dict(contagem),
+        'cedulas': cedulas,
+        'linha_tempo': dict(linha_tempo),
+        'csv_auditoria': gerar_csv_votos_formatado(df_votos).to_csv(index=False).encode('utf-8'),
+        'hash_snapshot': hashlib.sha256(snapshot).hexdigest(),
+    }
+    _gravar_snapshot_final(snapshot)
+    
+    dados = {chave: artefato[chave] for chave in ('total_votantes', 'contagem', 'cedulas', 'linha_tempo')}
+    conn = conectar_db()
+    conn.execute(
+        "INSERT OR REPLACE INTO resultado_final (id, gerado_em, dados, hash_snapshot) VALUES (1, ?, ?, ?)",
+        (artefato['gerado_em'], json.dumps(dados), artefato['hash_snapshot'])
+    )
+    conn.commit()
+    conn.close()
+    return artefato
+
+def obter_resultados_congelados():
+    """
+    Resultado congelado da votação encerrada: da memória, do banco ou, se o
+    banco foi encerrado por uma versão anterior do app, calculado agora.
+    
+    Returns:
+        dict: Artefato no formato de congelar_resultados
+    """
+    estado = _resultados_congelados(eleicao_atual())
+    if estado['artefato'] is not None:
+        return estado['artefato']
+    with estado['lock']:
+        if estado['artefato'] is None:
+            conn = conectar_db()
+            row = conn.cursor().execute(
+                "SELECT gerado_em, dados, hash_snapshot FROM resultado_final WHERE id = 1"
+            ).fetchone()
+            conn.close()
+            if row is None:
+                estado['artefato'] = congelar_resultados()
+            else:
+                gerado_em, dados, hash_snapshot = row
+                dados = json.loads(dados)
+                # Chaves JSON são texto; a linha do tempo usa epoch inteiro
+                dados['linha_tempo'] = {int(faixa): n for faixa, n in dados['linha_tempo'].items()}
+                # Resultados congelados antes de o user_id ser normalizado na gravação
+                dados['cedulas'] = {normalizar_email(user_id): escolhas for user_id, escolhas in dados['cedulas'].items()}
+                # O CSV de auditoria é refeito do snapshot no primeiro download
+                estado['artefato'] = {
+                    'gerado_em': gerado_em, **dados, 'csv_auditoria': None, 'hash_snapshot': hash_snapshot,
+                }
+        return estado['artefato']
+
+def arquivos_resultado_final():
+    """
+    CSV de auditoria e snapshot do resultado congelado, para os downloads.
+    
+    O snapshot é lido de arquivo_resultado_final(). Se o arquivo não estiver
+    neste servidor (ex.: banco restaurado do Dropbox em outra instância), o
+    backup oferecido é uma cópia atual do banco: os votos são os mesmos, pois
+    nada é gravado com a votação encerrada, mas o SHA-256 não confere.
+    
+    Returns:
+        tuple: (CSV de auditoria em bytes, snapshot em bytes)
+    """
+    import pandas as pd
+
+    artefato = obter_resultados_congelados()
+    caminho = arquivo_resultado_final()
+    snapshot = caminho.read_bytes() if caminho.exists() else ler_snapshot_db()
+    if artefato['csv_auditoria'] is None:
+        copia = sqlite3.connect(':memory:')
+        copia.deserialize(snapshot)
+        df_votos = pd.read_sql_query("SELECT user_id, escolhas, timestamp FROM votos ORDER BY rowid", copia)
+        copia.close()
+        artefato['csv_auditoria'] = gerar_csv_votos_formatado(df_votos).to_csv(index=False).encode('utf-8')
+    return artefato['csv_auditoria'], snapshot
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def montar_ranking(contagem, total_votantes):
+    """
+    Monta o ranking em uma única tabela, já ordenada, para o gráfico e a lista.
     
-    # UPSERT: Insere ou Atualiza se o ID já existir (Permite mudar o voto)
-    c.execute('''
-        INSERT INTO votos (user_id, escolhas, timestamp) 
-        VALUES (?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            escolhas=excluded.escolhas,
-            timestamp=excluded.timestamp
-    ''', (user_id, escolhas_str, data_hora))
+    Candidatos empatados recebem a mesma posição (1º, 2º, 2º, 4º...).
     
-    conn.commit()
-    conn.close()
+    Args:
+        contagem: Tupla de pares (candidato, votos), como em atualizar_apuracao
+        total_votantes: Número de eleitores que votaram
     
-    # Verifica se precisa fazer upload periódico para Dropbox
-    verificar_upload_periodico()
+    Returns:
+        DataFrame: Colunas Posição, Candidato, Votos, % dos votos e % dos votantes
+    """
+    import pandas as pd
 
-def carregar_voto_existente(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    row = conn.cursor().execute("SELECT escolhas FROM votos WHERE user_id = ?", (user_id,)).fetchone()
-    conn.close()
-    if row:
-        return row[0].split(", ")
-    return []
+    df_ranking = pd.DataFrame(list(contagem), columns=['Candidato', 'Votos'])
+    # Desempate estável pelo nome, para a ordem não mudar entre atualizações
+    df_ranking = df_ranking.sort_values(['Votos', 'Candidato'], ascending=[False, True], ignore_index=True)
+    df_ranking.insert(0, 'Posição', df_ranking['Votos'].rank(method='min', ascending=False).astype('int64'))
+    total_escolhas = df_ranking['Votos'].sum()
+    df_ranking['% dos votos'] = df_ranking['Votos'] / total_escolhas * 100 if total_escolhas else 0.0
+    df_ranking['% dos votantes'] = df_ranking['Votos'] / total_votantes * 100 if total_votantes else 0.0
+    return df_ranking
 
-def get_resultados_df():
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("SELECT * FROM votos", conn)
-    conn.close()
-    return df
+@st.cache_data(show_spinner=False, max_entries=8)
+def montar_cubo_resultados(contagem, fonte_candidatos):
+    """
+    Cruza a contagem com os atributos dos candidatos (candidato × instituição × região).
+    
+    Os atributos vêm do CSV de candidatos, sem reinterpretar os rótulos das
+    cédulas; opções que não estão mais no CSV ficam como "(desconhecida)".
+    
+    Args:
+        contagem: Tupla de pares (candidato, votos), como em montar_ranking
+        fonte_candidatos: Assinatura retornada por _fonte_candidatos
+    
+    Returns:
+        dict: DataFrames 'candidatos' (Regiao, Instituicao, Candidato, Votos),
+              'regioes' e 'instituicoes' (totais de votos e % dos votos)
+    """
+    import pandas as pd
+
+    atributos = carregar_atributos_candidatos(fonte_candidatos)
+    votos = dict(contagem)
+    desconhecida = "(desconhecida)"
+    linhas = [
+        (regiao, instituicao, rotulo, votos.get(rotulo, 0))
+        for rotulo, (_, instituicao, regiao) in atributos.items()
+    ]
+    linhas += [
+        (desconhecida, desconhecida, rotulo, n)
+        for rotulo, n in votos.items() if rotulo not in atributos
+    ]
+    df_candidatos = pd.DataFrame(linhas, columns=['Regiao', 'Instituicao', 'Candidato', 'Votos'])
+    df_candidatos = df_candidatos.sort_values(
+        ['Regiao', 'Instituicao', 'Votos', 'Candidato'], ascending=[True, True, False, True], ignore_index=True
+    )
+    total = df_candidatos['Votos'].sum()
+    
+    def totais(por):
+        df_totais = (
+            df_candidatos.groupby(por, as_index=False)['Votos'].sum()
+            .sort_values(['Votos', por[-1]], ascending=[False, True], ignore_index=True)
+        )
+        df_totais['% dos votos'] = df_totais['Votos'] / total * 100 if total else 0.0
+        return df_totais
+    
+    return {
+        'candidatos': df_candidatos,
+        'regioes': totais(['Regiao']),
+        'instituicoes': totais(['Regiao', 'Instituicao']),
+    }
 
 def extrair_nome_candidato(candidato_completo):
     """
@@ -220,6 +1952,7 @@ def extrair_nome_candidato(candidato_completo):
         return candidato_completo.split('(')[0].strip()
     return candidato_completo.strip()
 
+@medir_fase('gerar_csv_votos')
 def gerar_csv_votos_formatado(df_votos):
     """
     Converte DataFrame de votos para formato com colunas por candidato.
@@ -230,6 +1963,8 @@ def gerar_csv_votos_formatado(df_votos):
     Returns:
         DataFrame: DataFrame formatado com colunas por candidato (1/0) e linha TOTAL
     """
+    import pandas as pd
+
     try:
         # Lê lista completa de candidatos primeiro (necessário mesmo sem votos)
         df_candidatos = ler_csv_candidatos()
@@ -342,6 +2077,125 @@ def gerar_csv_votos_formatado(df_votos):
             st.error(f"Erro ao formatar CSV de votos: {e}")
         return df_votos
 
+@medir_fase('exportar_colunar')
+def exportar_colunar(formato='parquet'):
+    """
+    Exporta cédulas, candidatos e apuração da eleição atual em arquivos colunares.
+    
+    Os votos são lidos do SQLite em lotes de TAMANHO_LOTE_EXPORTACAO e cada lote
+    vira um record batch gravado na hora (um row group no Parquet), então a
+    memória não cresce com o número de votos. Tudo é lido em uma única
+    transação: cédulas e apuração correspondem ao mesmo estado do banco. O ZIP
+    é gravado em disco (DIRETORIO_EXPORTACOES), sem cópias dele em memória.
+    
+      - votos: user_id, candidatos (lista de ids), seq, timestamp
+      - candidatos: id, rotulo, nome, instituicao, regiao, na_cedula
+      - apuracao: candidato_id, rotulo, votos, percentual_votantes
+    
+    Args:
+        formato: 'parquet' (comprimido com zstd) ou 'arrow' (IPC sem compressão,
+                 que pode ser aberto com memory map e lido sem cópia)
+    
+    Returns:
+        str: Caminho do ZIP com votos, candidatos e apuracao no formato escolhido;
+            quem chama apaga o arquivo depois de servi-lo
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    
+    def abrir(destino, esquema):
+        if formato == 'parquet':
+            return pq.ParquetWriter(destino, esquema, compression='zstd')
+        return ipc.new_file(destino, esquema)
+    
+    fonte = _fonte_candidatos()
+    atributos = carregar_atributos_candidatos(fonte) if fonte is not None else {}
+    # Ids na ordem da cédula; escolhas fora da cédula atual recebem ids novos
+    ids = {rotulo: i for i, rotulo in enumerate(carregar_opcoes_candidatos(fonte) if fonte is not None else [])}
+    contagem = Counter()
+    total_votantes = 0
+    
+    esquema_votos = pa.schema([
+        ('user_id', pa.string()),
+        ('candidatos', pa.list_(pa.int32())),
+        ('seq', pa.int64()),
+        ('timestamp', pa.timestamp('s')),
+    ])
+    DIRETORIO_EXPORTACOES.mkdir(exist_ok=True)
+    saida = tempfile.NamedTemporaryFile(
+        dir=DIRETORIO_EXPORTACOES, prefix=f"{eleicao_atual()}_", suffix='.zip', delete=False
+    )
+    try:
+        # Sem compressão no ZIP: o Parquet já é comprimido e o Arrow precisa dos bytes intactos para o memory map.
+        # Cada escritor grava direto na sua entrada do ZIP, em disco
+        with saida, zipfile.ZipFile(saida, 'w', zipfile.ZIP_STORED) as zf:
+            conn = conectar_db()
+            try:
+                c = conn.cursor()
+                c.execute("BEGIN")
+                c.execute("SELECT user_id, escolhas, seq, timestamp FROM votos ORDER BY seq")
+                with zf.open(f"votos.{formato}", 'w', force_zip64=True) as destino, \
+                        abrir(destino, esquema_votos) as escritor:
+                    while True:
+                        linhas = c.fetchmany(TAMANHO_LOTE_EXPORTACAO)
+                        if not linhas:
+                            break
+                        user_ids, escolhas, seqs, timestamps = zip(*linhas)
+                        offsets = [0]
+                        valores = []
+                        for texto in escolhas:
+                            if texto:
+                                valores.extend(ids.setdefault(rotulo, len(ids)) for rotulo in texto.split(", "))
+                            offsets.append(len(valores))
+                        contagem.update(valores)
+                        total_votantes += len(linhas)
+                        escritor.write_batch(pa.record_batch([
+                            pa.array(user_ids, pa.string()),
+                            pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), pa.array(valores, pa.int32())),
+                            pa.array(seqs, pa.int64()),
+                            pc.strptime(
+                                pa.array(timestamps, pa.string()), format='%Y-%m-%d %H:%M:%S', unit='s',
+                                error_is_null=True
+                            ),
+                        ], schema=esquema_votos))
+                conn.rollback()  # Fim da transação de leitura
+            finally:
+                conn.close()
+            
+            rotulos = sorted(ids, key=ids.get)
+            cadastros = [atributos.get(rotulo, (None, None, None)) for rotulo in rotulos]
+            candidatos = pa.table({
+                'id': pa.array(range(len(rotulos)), pa.int32()),
+                'rotulo': pa.array(rotulos, pa.string()),
+                'nome': pa.array([cadastro[0] for cadastro in cadastros], pa.string()),
+                'instituicao': pa.array([cadastro[1] for cadastro in cadastros], pa.string()),
+                'regiao': pa.array([cadastro[2] for cadastro in cadastros], pa.string()),
+                'na_cedula': pa.array([rotulo in atributos for rotulo in rotulos], pa.bool_()),
+            })
+            ordem = sorted(range(len(rotulos)), key=lambda i: (-contagem[i], rotulos[i]))
+            apuracao = pa.table({
+                'candidato_id': pa.array(ordem, pa.int32()),
+                'rotulo': pa.array([rotulos[i] for i in ordem], pa.string()),
+                'votos': pa.array([contagem[i] for i in ordem], pa.int64()),
+                'percentual_votantes': pa.array(
+                    [contagem[i] / total_votantes * 100 if total_votantes else 0.0 for i in ordem], pa.float64()
+                ),
+            }).replace_schema_metadata({
+                'eleicao': eleicao_atual(),
+                'titulo': get_titulo_votacao(),
+                'total_votantes': str(total_votantes),
+                'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            })
+            for nome, tabela in (('candidatos', candidatos), ('apuracao', apuracao)):
+                with zf.open(f"{nome}.{formato}", 'w') as destino, abrir(destino, tabela.schema) as escritor:
+                    escritor.write_table(tabela)
+    except BaseException:
+        os.unlink(saida.name)
+        raise
+    return saida.name
+
 def fazer_backup_votacao():
     """Faz backup do CSV de votos e banco de dados com timestamp."""
     try:
@@ -351,17 +2205,20 @@ def fazer_backup_votacao():
         
         # Gera timestamp no formato YYYYMMDD_HHMMSS
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Backups das eleições adicionais levam o id da eleição no nome
+        eleicao = eleicao_atual()
+        prefixo = 'backup_votos' if eleicao == ELEICAO_PRINCIPAL else f'backup_votos_{eleicao}'
         
         # Backup do CSV de votos (sempre salva, mesmo se vazio)
         df_votos = get_resultados_df()
         df_votos_formatado = gerar_csv_votos_formatado(df_votos)
-        backup_csv_path = backup_dir / f'backup_votos_{timestamp}.csv'
+        backup_csv_path = backup_dir / f'{prefixo}_{timestamp}.csv'
         df_votos_formatado.to_csv(backup_csv_path, index=False, encoding='utf-8')
         
         # Backup do banco de dados
-        if os.path.exists(DB_FILE):
-            backup_db_path = backup_dir / f'backup_votos_{timestamp}.db'
-            shutil.copy2(DB_FILE, backup_db_path)
+        if os.path.exists(arquivo_db()):
+            backup_db_path = backup_dir / f'{prefixo}_{timestamp}.db'
+            backup_db_path.write_bytes(ler_snapshot_db())
         
         return timestamp
     except Exception as e:
@@ -380,9 +2237,13 @@ def resetar_votacao():
             return False
         
         # Deleta todos os votos
-        conn = sqlite3.connect(DB_FILE)
+        conn = conectar_db()
         c = conn.cursor()
         c.execute("DELETE FROM votos")
+        c.execute(
+            "INSERT OR REPLACE INTO config (chave, valor) VALUES ('geracao_votos', ?)",
+            (datetime.now().isoformat(),)
+        )
         conn.commit()
         conn.close()
         
@@ -398,6 +2259,21 @@ def resetar_votacao():
         return False
 
 # --- Funções de Integração com Dropbox ---
+@st.cache_resource(show_spinner=False)
+def _conectar_dropbox(access_token):
+    """
+    Cria e testa o cliente do Dropbox uma única vez por processo.
+
+    Falhas (exceções) não ficam em cache, então a próxima chamada tenta de novo.
+    """
+    import dropbox
+
+    # Usa oauth2_access_token explicitamente para evitar tentativas de refresh
+    client = dropbox.Dropbox(oauth2_access_token=access_token)
+    # Testa a conexão
+    client.users_get_current_account()
+    return client
+
 def init_dropbox_client():
     """
     Inicializa cliente do Dropbox usando Access Token.
@@ -405,18 +2281,17 @@ def init_dropbox_client():
     Returns:
         dropbox.Dropbox: Cliente do Dropbox ou None se não configurado
     """
-    if not DROPBOX_AVAILABLE:
+    if not DROPBOX_ACCESS_TOKEN:
         return None
     
-    if not DROPBOX_ACCESS_TOKEN:
+    # SDK importado só quando há token configurado
+    try:
+        from dropbox.exceptions import AuthError
+    except ImportError:
         return None
     
     try:
-        # Usa oauth2_access_token explicitamente para evitar tentativas de refresh
-        client = dropbox.Dropbox(oauth2_access_token=DROPBOX_ACCESS_TOKEN)
-        # Testa a conexão
-        client.users_get_current_account()
-        return client
+        return _conectar_dropbox(DROPBOX_ACCESS_TOKEN)
     except AuthError as e:
         # Verifica se é erro de token expirado
         error_msg = str(e)
@@ -438,38 +2313,44 @@ def init_dropbox_client():
             print(f"Erro ao inicializar Dropbox: {e}")
         return None
 
+@medir_fase('upload_dropbox')
 def upload_db_to_dropbox():
     """
-    Faz upload do banco de dados para Dropbox.
+    Faz upload do banco de dados da eleição atual para Dropbox.
     Cria a pasta se não existir, atualiza arquivo existente ou cria novo.
     Salva timestamp do upload na tabela config.
     
     Returns:
         bool: True se upload foi bem-sucedido, False caso contrário
     """
-    if not os.path.exists(DB_FILE):
+    if not os.path.exists(arquivo_db()):
         return False
     
     client = init_dropbox_client()
     if not client:
         return False
     
+    import dropbox
+    from dropbox.exceptions import ApiError, AuthError
+    
     try:
-        # Lê o arquivo
-        with open(DB_FILE, 'rb') as f:
-            file_data = f.read()
+        # Snapshot consistente, sem abrir o arquivo do banco diretamente
+        file_data = ler_snapshot_db()
         
         # Faz upload (sobrescreve se já existir)
         # Nota: A pasta deve existir no Dropbox ou o app precisa ter permissão para criar pastas
+        inicio = time.perf_counter()
         client.files_upload(
             file_data,
-            DROPBOX_FILE_PATH,
+            caminho_dropbox_eleicao(),
             mode=dropbox.files.WriteMode.overwrite
         )
+        metricas()['dropbox_latencia'].observar(time.perf_counter() - inicio, operacao='upload')
+        metricas()['dropbox_bytes'].inc(len(file_data), direcao='upload')
         
         # Salva timestamp do upload na tabela config
         timestamp = datetime.now().isoformat()
-        conn = sqlite3.connect(DB_FILE)
+        conn = conectar_db()
         c = conn.cursor()
         c.execute(
             "INSERT OR REPLACE INTO config (chave, valor) VALUES (?, ?)",
@@ -510,11 +2391,42 @@ def upload_db_to_dropbox():
             traceback.print_exc()
         return False
 
-def download_db_from_dropbox():
+def upload_registro_dropbox():
+    """
+    Envia o registro de eleições ao Dropbox, para restaurá-lo em um servidor novo.
+    
+    Returns:
+        bool: True se upload foi bem-sucedido, False caso contrário
+    """
+    client = init_dropbox_client()
+    if not client:
+        return False
+    
+    import dropbox
+    
+    try:
+        client.files_upload(
+            ler_snapshot_db(ARQUIVO_REGISTRO_ELEICOES),
+            DROPBOX_REGISTRO_PATH,
+            mode=dropbox.files.WriteMode.overwrite
+        )
+        return True
+    except Exception as e:
+        if 'st.error' in dir():
+            st.error(f"Erro ao enviar registro de eleições para Dropbox: {e}")
+        else:
+            print(f"Erro ao enviar registro de eleições para Dropbox: {e}")
+        return False
+
+def download_db_from_dropbox(caminho_dropbox=None, destino=None):
     """
     Baixa banco de dados do Dropbox.
     Substitui arquivo local se download for bem-sucedido.
     
+    Args:
+        caminho_dropbox: Arquivo no Dropbox (padrão: o da eleição atual)
+        destino: Arquivo local (padrão: o banco da eleição atual)
+    
     Returns:
         bool: True se download foi bem-sucedido, False caso contrário
     """
@@ -522,13 +2434,19 @@ def download_db_from_dropbox():
     if not client:
         return False
     
+    from dropbox.exceptions import ApiError
+    
     try:
         # Tenta baixar o arquivo
-        metadata, response = client.files_download(DROPBOX_FILE_PATH)
+        inicio = time.perf_counter()
+        metadata, response = client.files_download(caminho_dropbox or caminho_dropbox_eleicao())
+        conteudo = response.content
+        metricas()['dropbox_latencia'].observar(time.perf_counter() - inicio, operacao='download')
+        metricas()['dropbox_bytes'].inc(len(conteudo), direcao='download')
         
         # Salva arquivo localmente
-        with open(DB_FILE, 'wb') as f:
-            f.write(response.content)
+        with open(destino or arquivo_db(), 'wb') as f:
+            f.write(conteudo)
         
         return True
     except ApiError as e:
@@ -543,6 +2461,7 @@ def download_db_from_dropbox():
             st.error(f"Erro ao baixar do Dropbox: {e}")
         return False
 
+@medir_fase('verificar_e_restaurar_db')
 def verificar_e_restaurar_db():
     """
     Verifica se precisa restaurar banco do Dropbox na inicialização.
@@ -552,14 +2471,16 @@ def verificar_e_restaurar_db():
     if not client:
         return False
     
+    from dropbox.exceptions import ApiError
+    
     try:
         # Verifica se banco local existe e tem dados
-        banco_local_existe = os.path.exists(DB_FILE)
+        banco_local_existe = os.path.exists(arquivo_db())
         banco_local_tem_dados = False
         timestamp_local = None
         
         if banco_local_existe:
-            conn = sqlite3.connect(DB_FILE)
+            conn = conectar_db()
             c = conn.cursor()
             c.execute("SELECT COUNT(*) FROM votos")
             count = c.fetchone()[0]
@@ -584,7 +2505,7 @@ def verificar_e_restaurar_db():
         # Verifica se arquivo existe no Dropbox e compara timestamps
         try:
             # Obtém metadata do arquivo no Dropbox
-            metadata = client.files_get_metadata(DROPBOX_FILE_PATH)
+            metadata = client.files_get_metadata(caminho_dropbox_eleicao())
             timestamp_dropbox = None
             
             # Tenta obter timestamp do arquivo no Dropbox
@@ -634,6 +2555,7 @@ def verificar_e_restaurar_db():
             st.error(f"Erro ao verificar/restaurar banco: {e}")
         return False
 
+@medir_fase('verificar_upload_periodico')
 def verificar_upload_periodico():
     """
     Verifica se precisa fazer upload periódico (a cada 15 minutos).
@@ -648,7 +2570,7 @@ def verificar_upload_periodico():
     
     try:
         # Verifica se há votos
-        conn = sqlite3.connect(DB_FILE)
+        conn = conectar_db()
         c = conn.cursor()
         c.execute("SELECT COUNT(*) FROM votos")
         count_votos = c.fetchone()[0]
@@ -683,9 +2605,111 @@ def verificar_upload_periodico():
         # Se houver erro, não interrompe a aplicação
         return False
 
+@cache_do_processo()
+def _estado_processo():
+    """Estado compartilhado por todas as sessões do processo (o script é reexecutado a cada rerun)."""
+    return {
+        'lock': threading.Lock(),
+        'aquecido': threading.Event(),
+        'thread_aquecimento': None,
+        'duracao_aquecimento': None,
+        'erro_aquecimento': None,
+        'exportador_metricas': False,
+    }
+
+@cache_do_processo()
+def _estado_armazenamento(eleicao):
+    """Preparo do banco de uma eleição (lock próprio: eleições não esperam umas pelas outras)."""
+    return {'lock': threading.Lock(), 'pronto': False}
+
+def inicializar_armazenamento():
+    """
+    Prepara o banco da eleição atual uma única vez por processo: cria as tabelas
+    e, se preciso, restaura do Dropbox. Reruns seguintes não tocam o disco nem a rede aqui.
+    """
+    estado = _estado_armazenamento(eleicao_atual())
+    if estado['pronto']:
+        return
+    with estado['lock']:
+        if estado['pronto']:
+            return
+        Path(arquivo_db()).parent.mkdir(parents=True, exist_ok=True)
+        init_db()
+        if verificar_e_restaurar_db():
+            metricas()['restauracoes'].inc()
+            # Banco baixado pode ter sido criado por uma versão anterior do app
+            init_db()
+        estado['pronto'] = True
+
+def _aquecer_caches():
+    """
+    Executa, uma vez por processo, o trabalho que o primeiro acesso pagaria:
+    restauração/criação do banco, índice de login e opções da cédula de cada
+    eleição, paleta e CSS do logo. Roda em uma thread em segundo plano.
+    """
+    estado = _estado_processo()
+    inicio = datetime.now()
+    try:
+        for eleicao in listar_eleicoes():
+            with usar_eleicao(eleicao):
+                inicializar_armazenamento()
+
+                # Abre o banco e lê as páginas usadas em todo rerun
+                conn = conectar_db()
+                conn.execute("SELECT valor FROM config").fetchall()
+                conn.execute("SELECT COUNT(*) FROM votos").fetchone()
+                conn.close()
+
+                indice_eleitores()
+                fonte_candidatos = _fonte_candidatos()
+                if fonte_candidatos is not None:
+                    carregar_opcoes_candidatos(fonte_candidatos)
+
+        logo_path = encontrar_logo()
+        cores = carregar_paleta_logo(logo_path) if logo_path else ['#1f77b4', '#ff7f0e']
+        gerar_css_ceie(tuple(cores))
+        if logo_path:
+            carregar_logo_web(logo_path)
+    except Exception as e:
+        # Falhas não bloqueiam o app: cada etapa é refeita sob demanda no rerun
+        estado['erro_aquecimento'] = str(e)
+        print(f"Erro no aquecimento dos caches: {e}")
+    finally:
+        estado['duracao_aquecimento'] = (datetime.now() - inicio).total_seconds()
+        estado['aquecido'].set()
+
+def iniciar_aquecimento():
+    """Dispara o aquecimento dos caches na primeira execução do processo."""
+    estado = _estado_processo()
+    if estado['thread_aquecimento'] is None:
+        with estado['lock']:
+            if estado['thread_aquecimento'] is None:
+                thread = threading.Thread(
+                    target=_aquecer_caches,
+                    name='ceie-aquecimento',
+                    daemon=True
+                )
+                estado['thread_aquecimento'] = thread
+                thread.start()
+    return estado
+
+def aguardar_aquecimento():
+    """
+    Enquanto o aquecimento não termina, mostra uma tela leve de "preparando"
+    e aguarda, em vez de cada sessão refazer o mesmo trabalho em paralelo.
+    """
+    estado = iniciar_aquecimento()
+    if estado['aquecido'].is_set():
+        return
+    aviso = st.empty()
+    aviso.info("⏳ Preparando a votação, aguarde alguns segundos...")
+    estado['aquecido'].wait(timeout=TEMPO_MAXIMO_AQUECIMENTO)
+    aviso.empty()
+
 # --- Funções de Estilo e Logo ---
+@cache_do_processo()
 def encontrar_logo():
-    """Encontra o arquivo de logo disponível."""
+    """Encontra o arquivo de logo disponível (procurado uma vez por processo)."""
     possiveis_logos = [
         LOGO_PATH / 'ceie-logo-com-nome.png',  # Logo com nome (prioridade)
         LOGO_PATH / 'ceie-logo.png',  # Apenas logo
@@ -699,6 +2723,9 @@ def encontrar_logo():
 def extrair_cores_principais(imagem_path, num_cores=5):
     """Extrai as cores principais de uma imagem."""
     try:
+        from PIL import Image
+        import numpy as np
+
         img = Image.open(imagem_path)
         # Redimensiona para processamento mais rápido
         img = img.resize((150, 150))
@@ -743,6 +2770,50 @@ def extrair_cores_principais(imagem_path, num_cores=5):
         # Retorna cores padrão em caso de erro
         return ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
 
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _paleta_logo(caminho, mtime_ns):
+    """Extrai a paleta do logo uma única vez por versão do arquivo."""
+    return extrair_cores_principais(caminho)
+
+@medir_fase('paleta_logo')
+def carregar_paleta_logo(logo_path):
+    """Retorna as cores principais do logo, calculadas uma vez por processo."""
+    return _paleta_logo(str(logo_path), os.stat(logo_path).st_mtime_ns)
+
+@cache_do_processo(max_entries=4)
+def _sha256_logo(caminho, mtime_ns):
+    """SHA-256 do logo, lido do disco uma vez por versão do arquivo."""
+    with open(caminho, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+@cache_do_processo(max_entries=4)
+def _logo_web(sha256, caminho):
+    """
+    Redimensiona o logo para a largura exibida e o codifica em WebP, uma vez por conteúdo.
+    
+    Args:
+        sha256: Hash do arquivo (chave do cache)
+        caminho: Caminho do arquivo
+    
+    Returns:
+        str: URI data: da imagem, pronta para o src de um <img>
+    """
+    from PIL import Image
+    
+    with Image.open(caminho) as imagem:
+        imagem = imagem.convert('RGBA' if 'A' in imagem.getbands() or 'transparency' in imagem.info else 'RGB')
+    largura = min(imagem.width, LARGURA_LOGO * ESCALA_LOGO)
+    altura = round(imagem.height * largura / imagem.width)
+    buffer = BytesIO()
+    imagem.resize((largura, altura), Image.LANCZOS).save(buffer, 'WEBP', quality=QUALIDADE_LOGO_WEBP, method=6)
+    return f"data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+@medir_fase('logo')
+def carregar_logo_web(logo_path):
+    """Retorna o logo pré-codificado (ver _logo_web); por chamada, só um stat do arquivo."""
+    caminho = str(logo_path)
+    return _logo_web(_sha256_logo(caminho, os.stat(caminho).st_mtime_ns), caminho)
+
 def hex_to_rgba(hex_color, alpha=1.0):
     """Converte cor hex para rgba."""
     hex_color = hex_color.lstrip('#')
@@ -787,6 +2858,11 @@ def identificar_cor_azul(cores):
 
 def aplicar_estilo_ceie(cores):
     """Aplica CSS customizado com as cores do logo."""
+    st.markdown(gerar_css_ceie(tuple(cores or ())), unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def gerar_css_ceie(cores):
+    """Gera (uma vez por paleta) o CSS customizado com as cores do logo."""
     if not cores:
         cores = ['#1f77b4', '#ff7f0e']
     
@@ -903,60 +2979,625 @@ def aplicar_estilo_ceie(cores):
         }}
     </style>
     """
-    st.markdown(css, unsafe_allow_html=True)
+    return css
+
+def exibir_logo(mostrar_titulo=False, cor_primaria='#1f77b4'):
+    """Exibe o logo da CEIE no topo da página."""
+    logo_path = encontrar_logo()
+    if logo_path:
+        try:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col2:
+                titulo_html = ''
+                if mostrar_titulo:
+                    titulo = get_titulo_votacao()
+                    titulo_html = f'<h1 style="text-align: center; margin-bottom: 1rem; color: {cor_primaria};">{titulo}</h1>'
+                # Imagem já redimensionada e codificada: o rerun não passa pelo PIL nem pelo st.image
+                st.markdown(
+                    f'<div class="logo-container">{titulo_html}'
+                    f'<img src="{carregar_logo_web(logo_path)}" alt="CEIE" style="width: 100%;"></div>',
+                    unsafe_allow_html=True
+                )
+            return logo_path
+        except Exception as e:
+            st.warning(f"Erro ao carregar logo: {e}")
+            return None
+    return None
+
+# --- Funções de Validação de CSVs ---
+def validar_csv_eleitores(df):
+    """Valida se o DataFrame de eleitores tem as colunas obrigatórias."""
+    colunas_obrigatorias = ['Email', 'Nome', 'id_sbc']
+    colunas_presentes = df.columns.tolist()
+    
+    for coluna in colunas_obrigatorias:
+        if coluna not in colunas_presentes:
+            return False, f"Coluna obrigatória '{coluna}' não encontrada no CSV de eleitores."
+    
+    # Valida se há dados
+    if df.empty:
+        return False, "CSV de eleitores está vazio."
+    
+    return True, None
+
+def validar_csv_candidatos(df):
+    """Valida se o DataFrame de candidatos tem as colunas obrigatórias."""
+    colunas_obrigatorias = ['Nome', 'Instituicao', 'Regiao']
+    colunas_presentes = df.columns.tolist()
+    
+    for coluna in colunas_obrigatorias:
+        if coluna not in colunas_presentes:
+            return False, f"Coluna obrigatória '{coluna}' não encontrada no CSV de candidatos."
+    
+    # Valida se há dados
+    if df.empty:
+        return False, "CSV de candidatos está vazio."
+
+    return True, None
+
+def _ler_csv_em_lotes(conteudo):
+    """
+    Abre o conteúdo de um CSV como iterador de lotes de texto.
+
+    Todas as colunas são lidas como texto (sem inferência de tipos), para que
+    valores como id_sbc sejam validados exatamente como foram digitados.
+
+    Linhas com mais campos que o cabeçalho viram ParserError. O pandas só
+    acusa isso a partir da segunda linha de dados; se for a primeira, ele usa a
+    coluna extra como índice, o que é conferido aqui.
+
+    Args:
+        conteudo: bytes ou str com o conteúdo do CSV
+
+    Yields:
+        DataFrame: Lotes com até TAMANHO_LOTE_VALIDACAO linhas
+    """
+    import pandas as pd
+
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode('utf-8')
+    leitor = pd.read_csv(
+        BytesIO(conteudo),
+        dtype=str,
+        keep_default_na=False,
+        chunksize=TAMANHO_LOTE_VALIDACAO
+    )
+    for lote in leitor:
+        if not isinstance(lote.index, pd.RangeIndex):
+            raise pd.errors.ParserError(
+                f"a linha 2 tem {len(lote.columns) + lote.index.nlevels} campos, "
+                f"mas o cabeçalho tem {len(lote.columns)}"
+            )
+        yield lote
+
+def _coletar_erros(partes, mascara, lote, coluna, mensagem):
+    """
+    Acrescenta ao relatório as linhas do lote marcadas pela máscara.
+
+    O relatório guarda no máximo MAX_LINHAS_RELATORIO linhas para manter a
+    memória limitada; as demais são apenas contadas.
+
+    Args:
+        partes: Lista de DataFrames parciais do relatório (modificada no local)
+        mascara: Series booleana alinhada ao lote
+        lote: DataFrame do lote atual
+        coluna: Nome da coluna validada
+        mensagem: Descrição do erro
+
+    Returns:
+        int: Número de linhas com erro encontradas no lote
+    """
+    import pandas as pd
+
+    total = int(mascara.sum())
+    if total == 0:
+        return 0
+
+    ja_coletadas = sum(len(parte) for parte in partes)
+    restante = MAX_LINHAS_RELATORIO - ja_coletadas
+    if restante > 0:
+        selecionadas = lote.loc[mascara, coluna].head(restante)
+        partes.append(pd.DataFrame({
+            'Linha': selecionadas.index + 2,  # +1 cabeçalho, +1 base 1
+            'Coluna': coluna,
+            'Valor': selecionadas.values,
+            'Erro': mensagem
+        }))
+    return total
+
+def _montar_relatorio(partes):
+    """Concatena as partes do relatório em um único DataFrame ordenado por linha."""
+    import pandas as pd
+
+    colunas = ['Linha', 'Coluna', 'Valor', 'Erro']
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+    relatorio = pd.concat(partes, ignore_index=True)
+    return relatorio.sort_values('Linha', kind='stable').reset_index(drop=True)
+
+def _relatorio_erro_geral(mensagem):
+    """Cria um relatório de uma linha para erros que invalidam o arquivo inteiro."""
+    import pandas as pd
+
+    return pd.DataFrame([{'Linha': 1, 'Coluna': '', 'Valor': '', 'Erro': mensagem}])
+
+def _rotulo_candidato(lote):
+    """Monta o rótulo "Nome (Instituição - Região)" exibido na cédula para cada linha do lote."""
+    return lote['Nome'] + ' (' + lote['Instituicao'] + ' - ' + lote['Regiao'] + ')'
+
+def _coletar_duplicados(partes, conteudo, hashes, linhas, extrair, coluna, mensagem):
+    """
+    Marca chaves repetidas no arquivo inteiro, mantendo a primeira ocorrência.
+
+    Durante a primeira passada só o hash de 64 bits de cada chave é guardado,
+    o que limita a memória mesmo para rosters grandes. Havendo duplicatas, uma
+    segunda passada em lotes recupera os valores originais para o relatório.
+
+    Args:
+        partes: Lista de DataFrames parciais do relatório (modificada no local)
+        conteudo: Conteúdo do CSV (para a segunda passada)
+        hashes: Lista de arrays uint64 com o hash das chaves não vazias de cada lote
+        linhas: Lista de arrays com o número da linha de cada hash
+        extrair: Função que recebe um lote e devolve a Series com a chave
+        coluna: Nome da coluna exibida no relatório
+        mensagem: Descrição do erro
+
+    Returns:
+        int: Número de linhas duplicadas
+    """
+    import numpy as np
+    import pandas as pd
+
+    if not hashes:
+        return 0
+    todas_linhas = np.concatenate(linhas)
+    duplicadas = pd.Series(np.concatenate(hashes)).duplicated(keep='first').to_numpy()
+    linhas_duplicadas = set(todas_linhas[duplicadas].tolist())
+    if not linhas_duplicadas:
+        return 0
+
+    for lote in _ler_csv_em_lotes(conteudo):
+        mascara = pd.Series((lote.index + 2).isin(linhas_duplicadas), index=lote.index)
+        if mascara.any():
+            _coletar_erros(partes, mascara, lote.assign(**{coluna: extrair(lote)}), coluna, mensagem)
+    return len(linhas_duplicadas)
+
+def _acumular_hashes(hashes, linhas, chaves):
+    """Guarda o hash e o número da linha das chaves não vazias de um lote."""
+    import pandas as pd
+
+    preenchidas = (chaves != '').to_numpy()
+    hashes.append(pd.util.hash_array(chaves.to_numpy()[preenchidas]))
+    linhas.append(chaves.index.to_numpy()[preenchidas] + 2)
+
+def _email_normalizado(lote):
+    """Normaliza e-mails como validar_usuario faz (sem espaços, minúsculo)."""
+    return lote['Email'].str.strip().str.lower()
+
+def _id_sbc_numerico(id_sbc):
+    """
+    Máscara dos id_sbc que o login aceita (ver _normalizar_id_sbc): números
+    inteiros, inclusive na forma exportada por planilhas ('1001.0').
+    """
+    import pandas as pd
+
+    numeros = pd.to_numeric(id_sbc, errors='coerce')
+    # NaN e infinito dão NaN no resto, e a comparação com 0 é falsa
+    return numeros % 1 == 0
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def validar_roster_eleitores(conteudo):
+    """
+    Valida o CSV de eleitores linha a linha, em lotes e com checagens vetorizadas.
+
+    Verifica colunas obrigatórias, e-mails vazios, malformados ou duplicados,
+    nomes vazios e id_sbc vazio ou que não seja um número inteiro (que faria o login falhar).
+
+    Args:
+        conteudo: bytes ou str com o conteúdo do CSV
+
+    Returns:
+        tuple: (valido, total_linhas, total_erros, df_erros)
+    """
+    import pandas as pd
+
+    partes = []
+    total_linhas = 0
+    total_erros = 0
+    hashes = []
+    linhas = []
+
+    try:
+        for numero_lote, lote in enumerate(_ler_csv_em_lotes(conteudo)):
+            if numero_lote == 0:
+                valido, erro = validar_csv_eleitores(lote)
+                if not valido:
+                    return False, 0, 1, _relatorio_erro_geral(erro)
+
+            total_linhas += len(lote)
+            email = _email_normalizado(lote)
+            nome = lote['Nome'].str.strip()
+            id_sbc = lote['id_sbc'].str.strip()
+
+            email_vazio = email == ''
+            total_erros += _coletar_erros(partes, email_vazio, lote, 'Email', "E-mail vazio")
+            total_erros += _coletar_erros(
+                partes,
+                ~email_vazio & ~email.str.fullmatch(PADRAO_EMAIL),
+                lote, 'Email', "E-mail em formato inválido"
+            )
+            total_erros += _coletar_erros(partes, nome == '', lote, 'Nome', "Nome vazio")
+
+            id_vazio = id_sbc == ''
+            total_erros += _coletar_erros(partes, id_vazio, lote, 'id_sbc', "id_sbc vazio")
+            total_erros += _coletar_erros(
+                partes,
+                ~id_vazio & ~_id_sbc_numerico(id_sbc),
+                lote, 'id_sbc', "id_sbc não é um número inteiro"
+            )
+
+            _acumular_hashes(hashes, linhas, email)
+
+        total_erros += _coletar_duplicados(
+            partes, conteudo, hashes, linhas,
+            _email_normalizado, 'Email', "E-mail duplicado"
+        )
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        return False, total_linhas, 1, _relatorio_erro_geral(f"Não foi possível ler o CSV: {e}")
+
+    return total_erros == 0, total_linhas, total_erros, _montar_relatorio(partes)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def validar_roster_candidatos(conteudo):
+    """
+    Valida o CSV de candidatos linha a linha, em lotes e com checagens vetorizadas.
+
+    Além de campos vazios, rejeita rótulos que contenham ", " (o separador
+    usado para gravar as escolhas no banco), rótulos duplicados e nomes
+    duplicados (que colidiriam nas colunas do CSV de auditoria).
+
+    Args:
+        conteudo: bytes ou str com o conteúdo do CSV
+
+    Returns:
+        tuple: (valido, total_linhas, total_erros, df_erros)
+    """
+    import pandas as pd
+
+    partes = []
+    total_linhas = 0
+    total_erros = 0
+    hashes_rotulos, linhas_rotulos = [], []
+    hashes_nomes, linhas_nomes = [], []
+
+    try:
+        for numero_lote, lote in enumerate(_ler_csv_em_lotes(conteudo)):
+            if numero_lote == 0:
+                valido, erro = validar_csv_candidatos(lote)
+                if not valido:
+                    return False, 0, 1, _relatorio_erro_geral(erro)
+
+            total_linhas += len(lote)
+            nome = lote['Nome'].str.strip()
+            rotulo = _rotulo_candidato(lote)
+
+            total_erros += _coletar_erros(partes, nome == '', lote, 'Nome', "Nome vazio")
+            total_erros += _coletar_erros(
+                partes, lote['Instituicao'].str.strip() == '', lote, 'Instituicao', "Instituição vazia"
+            )
+            total_erros += _coletar_erros(
+                partes, lote['Regiao'].str.strip() == '', lote, 'Regiao', "Região vazia"
+            )
+            total_erros += _coletar_erros(
+                partes,
+                rotulo.str.contains(', ', regex=False),
+                lote.assign(Rotulo=rotulo), 'Rotulo',
+                "Rótulo contém ', ' (separador das escolhas no banco)"
+            )
+
+            _acumular_hashes(hashes_rotulos, linhas_rotulos, rotulo)
+            _acumular_hashes(hashes_nomes, linhas_nomes, nome)
+
+        total_erros += _coletar_duplicados(
+            partes, conteudo, hashes_rotulos, linhas_rotulos,
+            _rotulo_candidato, 'Rotulo', "Candidato duplicado"
+        )
+        total_erros += _coletar_duplicados(
+            partes, conteudo, hashes_nomes, linhas_nomes,
+            lambda lote: lote['Nome'].str.strip(), 'Nome', "Nome de candidato duplicado"
+        )
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        return False, total_linhas, 1, _relatorio_erro_geral(f"Não foi possível ler o CSV: {e}")
+
+    return total_erros == 0, total_linhas, total_erros, _montar_relatorio(partes)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def validar_ajustes_eleitores(conteudo):
+    """
+    Valida o CSV de ajustes do roster (colunas Acao, Email, Nome, id_sbc).
+
+    Acao é incluir, alterar ou remover; incluir e alterar seguem as regras do
+    roster de eleitores (Nome e id_sbc numérico), remover só precisa do e-mail.
+    Um e-mail só pode aparecer uma vez no arquivo.
+
+    Args:
+        conteudo: bytes ou str com o conteúdo do CSV
+
+    Returns:
+        tuple: (valido, total_linhas, total_erros, df_erros)
+    """
+    import pandas as pd
 
-def exibir_logo(mostrar_titulo=False, cor_primaria='#1f77b4'):
-    """Exibe o logo da CEIE no topo da página."""
-    logo_path = encontrar_logo()
-    if logo_path:
-        try:
-            img = Image.open(logo_path)
-            col1, col2, col3 = st.columns([1, 2, 1])
-            with col2:
-                st.markdown('<div class="logo-container">', unsafe_allow_html=True)
-                if mostrar_titulo:
-                    titulo = get_titulo_votacao()
-                    st.markdown(f'<h1 style="text-align: center; margin-bottom: 1rem; color: {cor_primaria};">{titulo}</h1>', unsafe_allow_html=True)
-                st.image(img, width='stretch')
-                st.markdown('</div>', unsafe_allow_html=True)
-            return logo_path
-        except Exception as e:
-            st.warning(f"Erro ao carregar logo: {e}")
-            return None
-    return None
+    partes = []
+    total_linhas = 0
+    total_erros = 0
+    hashes = []
+    linhas = []
 
-# --- Funções de Validação de CSVs ---
-def validar_csv_eleitores(df):
-    """Valida se o DataFrame de eleitores tem as colunas obrigatórias."""
-    colunas_obrigatorias = ['Email', 'Nome', 'id_sbc']
-    colunas_presentes = df.columns.tolist()
+    try:
+        for numero_lote, lote in enumerate(_ler_csv_em_lotes(conteudo)):
+            if numero_lote == 0:
+                valido, erro = validar_csv_eleitores(lote)
+                if valido and 'Acao' not in lote.columns:
+                    valido, erro = False, "Coluna obrigatória 'Acao' não encontrada no CSV de ajustes."
+                if not valido:
+                    return False, 0, 1, _relatorio_erro_geral(erro)
+
+            total_linhas += len(lote)
+            acao = lote['Acao'].str.strip().str.lower()
+            email = _email_normalizado(lote)
+            id_sbc = lote['id_sbc'].str.strip()
+            cadastro = acao.isin(['incluir', 'alterar'])
+
+            total_erros += _coletar_erros(
+                partes, ~acao.isin(ACOES_AJUSTE_ROSTER), lote, 'Acao',
+                f"Ação inválida (use {', '.join(ACOES_AJUSTE_ROSTER)})"
+            )
+            email_vazio = email == ''
+            total_erros += _coletar_erros(partes, email_vazio, lote, 'Email', "E-mail vazio")
+            total_erros += _coletar_erros(
+                partes,
+                ~email_vazio & ~email.str.fullmatch(PADRAO_EMAIL),
+                lote, 'Email', "E-mail em formato inválido"
+            )
+            total_erros += _coletar_erros(
+                partes, cadastro & (lote['Nome'].str.strip() == ''), lote, 'Nome', "Nome vazio"
+            )
+
+            id_vazio = id_sbc == ''
+            total_erros += _coletar_erros(partes, cadastro & id_vazio, lote, 'id_sbc', "id_sbc vazio")
+            total_erros += _coletar_erros(
+                partes,
+                cadastro & ~id_vazio & ~_id_sbc_numerico(id_sbc),
+                lote, 'id_sbc', "id_sbc não é um número inteiro"
+            )
+
+            _acumular_hashes(hashes, linhas, email)
+
+        total_erros += _coletar_duplicados(
+            partes, conteudo, hashes, linhas,
+            _email_normalizado, 'Email', "E-mail duplicado"
+        )
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        return False, total_linhas, 1, _relatorio_erro_geral(f"Não foi possível ler o CSV: {e}")
+
+    return total_erros == 0, total_linhas, total_erros, _montar_relatorio(partes)
+
+def validar_importacao_cedulas(conteudo):
+    """
+    Valida um CSV de cédulas em papel contra o roster e a cédula da eleição atual.
     
-    for coluna in colunas_obrigatorias:
-        if coluna not in colunas_presentes:
-            return False, f"Coluna obrigatória '{coluna}' não encontrada no CSV de eleitores."
+    O CSV tem as colunas Email e Escolhas; as escolhas vêm separadas por ";" e
+    podem ser o rótulo da cédula ("Nome (Instituição - Região)") ou só o nome
+    do candidato. Todas as linhas são checadas de uma vez (explode das escolhas
+    e máscaras vetorizadas), com as mesmas regras da tela de votação.
     
-    # Valida se há dados
+    Args:
+        conteudo: bytes ou str com o conteúdo do CSV
+    
+    Returns:
+        tuple: (relatório com uma linha por linha do CSV, cédulas válidas como
+                lista de (e-mail, escolhas na ordem da cédula))
+    
+    Raises:
+        ValueError: Se o arquivo não puder ser lido ou faltar coluna, roster ou cédula
+    """
+    import numpy as np
+    import pandas as pd
+    
+    try:
+        df = pd.concat(list(_ler_csv_em_lotes(conteudo)))
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ValueError(f"Não foi possível ler o CSV: {e}")
+    for coluna in ('Email', 'Escolhas'):
+        if coluna not in df.columns:
+            raise ValueError(f"Coluna obrigatória '{coluna}' não encontrada no CSV de cédulas.")
     if df.empty:
-        return False, "CSV de eleitores está vazio."
+        raise ValueError("CSV de cédulas está vazio.")
     
-    return True, None
+    indice = indice_eleitores()
+    fonte_candidatos = _fonte_candidatos()
+    if indice is None or fonte_candidatos is None:
+        raise ValueError("Roster de eleitores ou de candidatos não encontrado.")
+    opcoes = carregar_opcoes_candidatos(fonte_candidatos)
+    # Nome ou rótulo -> rótulo (nomes são únicos em um roster de candidatos válido)
+    rotulo_por_texto = {nome: rotulo for rotulo, (nome, _, _) in carregar_atributos_candidatos(fonte_candidatos).items()}
+    rotulo_por_texto.update({rotulo: rotulo for rotulo in opcoes})
+    max_selections = get_max_selections()
+    
+    email = _email_normalizado(df)
+    # Uma linha por escolha, mantendo como índice o da linha do CSV
+    escolhas = df['Escolhas'].str.split(SEPARADOR_ESCOLHAS_IMPORTACAO).explode().str.strip()
+    escolhas = escolhas[escolhas != '']
+    rotulos = escolhas.map(rotulo_por_texto)
+    validos = rotulos.dropna()
+    
+    n_escolhas = escolhas.groupby(level=0).size().reindex(df.index, fill_value=0)
+    fora_da_cedula = escolhas[rotulos.isna()].groupby(level=0).agg(', '.join).reindex(df.index)
+    repetidas = (validos.groupby(level=0).nunique() < validos.groupby(level=0).size()).reindex(df.index, fill_value=False)
+    
+    # Vale o primeiro erro de cada linha
+    detalhe = pd.Series(np.select(
+        [
+            email == '',
+            ~email.isin(indice.keys()),
+            email.duplicated(keep=False),
+            fora_da_cedula.notna(),
+            n_escolhas == 0,
+            n_escolhas > max_selections,
+            repetidas,
+        ],
+        [
+            "E-mail vazio",
+            "E-mail fora do roster de eleitores",
+            "E-mail repetido no arquivo",
+            "Candidatos fora da cédula: " + fora_da_cedula.fillna(''),
+            "Nenhum candidato selecionado",
+            "Foram selecionados " + n_escolhas.astype(str) + f" candidatos, mas o máximo permitido é {max_selections}",
+            "Candidato repetido na cédula",
+        ],
+        default='',
+    ), index=df.index)
+    aceitas = detalhe == ''
+    
+    # Escolhas na ordem da cédula, como a tela de votação grava
+    posicao = {rotulo: i for i, rotulo in enumerate(opcoes)}
+    selecionadas = validos[validos.index.isin(df.index[aceitas])]
+    selecionadas = selecionadas.iloc[np.lexsort((selecionadas.map(posicao).to_numpy(), selecionadas.index.to_numpy()))]
+    por_linha = selecionadas.groupby(level=0).agg(list)
+    cedulas = list(zip(email[aceitas], por_linha.reindex(df.index[aceitas])))
+    
+    relatorio = pd.DataFrame({
+        'Linha': df.index + 2,  # +1 cabeçalho, +1 base 1
+        'Email': df['Email'],
+        'Escolhas': df['Escolhas'],
+        'Situação': np.where(aceitas, 'Válida', 'Rejeitada'),
+        'Detalhe': detalhe,
+    }).reset_index(drop=True)
+    return relatorio, cedulas
 
-def validar_csv_candidatos(df):
-    """Valida se o DataFrame de candidatos tem as colunas obrigatórias."""
-    colunas_obrigatorias = ['Nome', 'Instituicao', 'Regiao']
-    colunas_presentes = df.columns.tolist()
+@medir_fase('importar_cedulas')
+def importar_cedulas(conteudo):
+    """
+    Importa as cédulas válidas de um CSV (ver validar_importacao_cedulas).
     
-    for coluna in colunas_obrigatorias:
-        if coluna not in colunas_presentes:
-            return False, f"Coluna obrigatória '{coluna}' não encontrada no CSV de candidatos."
+    Todas são gravadas em uma única transação, com o mesmo UPSERT de
+    registrar_voto (a cédula importada substitui um voto anterior do eleitor),
+    e o banco é enviado ao Dropbox uma vez ao final.
     
-    # Valida se há dados
-    if df.empty:
-        return False, "CSV de candidatos está vazio."
+    Args:
+        conteudo: bytes ou str com o conteúdo do CSV
     
-    return True, None
+    Returns:
+        tuple: (relatório por linha, cédulas importadas, upload feito)
+    
+    Raises:
+        ValueError: Se o CSV for inválido ou a votação estiver encerrada
+    """
+    relatorio, cedulas = validar_importacao_cedulas(conteudo)
+    if not cedulas:
+        return relatorio, 0, False
+    if not registrar_votos(cedulas, exigir_aberta=True, upload_periodico=False):
+        raise ValueError("A votação está encerrada.")
+    relatorio.loc[relatorio['Situação'] == 'Válida', 'Situação'] = 'Importada'
+    return relatorio, len(cedulas), upload_db_to_dropbox()
+
+def exibir_resultado_validacao(tipo, resultado, chave=''):
+    """
+    Exibe o resumo da validação de um CSV e oferece o relatório de erros para download.
+
+    Args:
+        tipo: 'eleitores', 'candidatos' ou 'ajustes'
+        resultado: Tupla retornada por validar_roster_eleitores, validar_roster_candidatos
+            ou validar_ajustes_eleitores
+        chave: Sufixo da chave do botão de download (mais de uma validação na mesma tela)
+    """
+    valido, total_linhas, total_erros, df_erros = resultado
+    if valido:
+        st.success(f"✅ CSV de {tipo} carregado: {total_linhas} {tipo}")
+        return
+
+    st.error(
+        f"❌ CSV de {tipo} com **{total_erros}** erro(s) em {total_linhas} linha(s). "
+        "Corrija o arquivo antes de continuar."
+    )
+    if total_erros > len(df_erros):
+        st.caption(f"O relatório lista as primeiras {len(df_erros)} ocorrências.")
+    st.dataframe(df_erros.head(20), hide_index=True)
+    st.download_button(
+        label=f"📥 Baixar relatório de erros ({tipo})",
+        data=df_erros.to_csv(index=False).encode('utf-8'),
+        file_name=f'erros_{tipo}.csv',
+        mime='text/csv',
+        key=f"download_erros_{tipo}{chave}"
+    )
+
+# --- Limite de Tentativas de Login ---
+@cache_do_processo()
+def _limitador_login():
+    """Baldes do processo: (tipo, chave) -> (tentativas disponíveis, instante da última atualização)."""
+    return {'lock': threading.Lock(), 'baldes': OrderedDict()}
+
+def reservar_tentativa_login(email, sessao=None):
+    """
+    Consome uma tentativa de login do balde do e-mail e do balde da sessão.
+    
+    Cada balde (token bucket) comporta LOGIN_RAJADA tentativas e repõe
+    LOGIN_POR_MINUTO por minuto. A checagem só usa o dicionário em memória,
+    então uma tentativa barrada não chega ao roster nem ao banco. Baldes
+    ociosos saem por LRU quando passam de MAX_BALDES_LOGIN.
+    
+    Args:
+        email: E-mail digitado
+        sessao: Chave da sessão (padrão: a sessão do Streamlit, se houver)
+    
+    Returns:
+        float: 0 se a tentativa foi aceita; senão, segundos até a próxima
+    """
+    if sessao is None:
+        ctx = get_script_run_ctx(suppress_warning=True)
+        sessao = ctx.session_id if ctx is not None else None
+    chaves = [('email', (email or '').strip().lower())]
+    if sessao:
+        chaves.append(('sessao', sessao))
+    por_segundo = LOGIN_POR_MINUTO / 60
+    agora = time.monotonic()
+    
+    limitador = _limitador_login()
+    baldes = limitador['baldes']
+    with limitador['lock']:
+        disponiveis = []
+        for chave in chaves:
+            tentativas, instante = baldes.get(chave, (LOGIN_RAJADA, agora))
+            disponiveis.append(min(LOGIN_RAJADA, tentativas + (agora - instante) * por_segundo))
+        bloqueadas = [(chave, d) for chave, d in zip(chaves, disponiveis) if d < 1]
+        # Tentativa barrada não consome: só o tempo repõe o balde
+        for chave, d in zip(chaves, disponiveis):
+            baldes[chave] = (d if bloqueadas else d - 1, agora)
+            baldes.move_to_end(chave)
+        while len(baldes) > MAX_BALDES_LOGIN:
+            baldes.popitem(last=False)
+    
+    if not bloqueadas:
+        return 0.0
+    for (tipo, _), _ in bloqueadas:
+        metricas()['login_rejeitados'].inc(chave=tipo)
+    return max((1 - d) / por_segundo for _, d in bloqueadas)
+
+def resumo_limite_login():
+    """
+    Returns:
+        dict: Tentativas barradas por tipo de chave e baldes em memória
+    """
+    rejeitadas = {dict(chave).get('chave'): n for chave, n in metricas()['login_rejeitados'].valores().items()}
+    return {
+        'email': rejeitadas.get('email', 0),
+        'sessao': rejeitadas.get('sessao', 0),
+        'baldes': len(_limitador_login()['baldes']),
+    }
 
 # --- Funções de Validação ---
+@medir_fase('validar_usuario')
 def validar_usuario(email, senha=None):
     """
     Valida usuário (eleitor ou admin).
@@ -970,10 +3611,21 @@ def validar_usuario(email, senha=None):
     Returns:
         tuple: (valido, nome, is_admin)
     """
+    registro = metricas()
+    registro['login_tentativas'].inc()
+    valido, nome, is_admin = _validar_credenciais(email, senha)
+    registro['logins'].inc(
+        resultado='sucesso' if valido else 'falha',
+        tipo='admin' if email and email.strip().lower() == EMAIL_ADMIN.lower() else 'eleitor'
+    )
+    return valido, nome, is_admin
+
+def _validar_credenciais(email, senha):
+    """Confere e-mail e senha contra o admin e o índice de eleitores (ver validar_usuario)."""
     if not email:
         return False, None, False
     
-    email = email.strip().lower()
+    email = normalizar_email(email)
     senha = senha.strip() if senha and senha.strip() else ""
     
     # Verifica se é admin
@@ -982,22 +3634,14 @@ def validar_usuario(email, senha=None):
             return True, "Administrador", True
         return False, None, False
     
-    # Verifica se é eleitor (precisa de senha = id_sbc)
+    # Verifica se é eleitor de alguma eleição (precisa de senha = id_sbc)
     try:
-        df = ler_csv_eleitores()
-        df['Email'] = df['Email'].astype(str).str.strip().str.lower()
-        
-        usuario = df[df['Email'] == email]
-        if not usuario.empty:
-            # Verifica se a senha (id_sbc) foi fornecida e está correta
-            if not senha:
-                return False, None, False
-            
-            # Converte id_sbc para string para comparação
-            id_sbc_cadastrado = str(int(usuario.iloc[0]['id_sbc']))
-            if senha.strip() == id_sbc_cadastrado:
-                return True, usuario.iloc[0]['Nome'], False
+        # Verifica se a senha (id_sbc) foi fornecida e está correta
+        if not senha:
             return False, None, False
+        for nome, id_sbc_cadastrado in _cadastros_eleitor(email).values():
+            if id_sbc_cadastrado is not None and senha == id_sbc_cadastrado:
+                return True, nome, False
         return False, None, False
     except FileNotFoundError:
         st.error(f"Erro: Arquivo '{ARQUIVO_ELEITORES}' não encontrado.")
@@ -1006,22 +3650,594 @@ def validar_usuario(email, senha=None):
         st.error(f"Erro ao validar eleitor: {e}")
         return False, None, False
 
+def _cadastros_eleitor(email):
+    """
+    Cadastro do e-mail (já normalizado) no roster de cada eleição.
+    
+    Returns:
+        dict: Eleição -> (nome, id_sbc normalizado ou None)
+    
+    Raises:
+        FileNotFoundError: Se nenhuma eleição tiver roster de eleitores
+    """
+    cadastros = {}
+    algum_roster = False
+    for eleicao in listar_eleicoes():
+        with usar_eleicao(eleicao):
+            if eleicao != ELEICAO_PRINCIPAL:
+                # O roster das eleições adicionais fica no banco delas
+                inicializar_armazenamento()
+            indice = indice_eleitores()
+        if indice is None:
+            continue
+        algum_roster = True
+        cadastro = indice.get(email)
+        if cadastro is not None:
+            cadastros[eleicao] = cadastro
+    if not algum_roster:
+        raise FileNotFoundError(ARQUIVO_ELEITORES)
+    return cadastros
+
+def eleicoes_do_eleitor(email, senha):
+    """
+    Eleições em que o eleitor está apto a votar (e-mail no roster com o mesmo id_sbc).
+    
+    Returns:
+        list: Ids das eleições, na ordem de listar_eleicoes
+    """
+    email = normalizar_email(email)
+    senha = senha.strip() if senha else ""
+    return [
+        eleicao for eleicao, (_, id_sbc) in _cadastros_eleitor(email).items()
+        if senha and id_sbc == senha
+    ]
+
 def validar_eleitor(identificador):
     """Mantida para compatibilidade."""
     valido, nome, _ = validar_usuario(identificador)
     return valido, nome
 
 # --- Interface do Usuário (Front-end) ---
+def exibir_resultados_ao_vivo():
+    """Resultados a partir da apuração incremental (roda como fragmento)."""
+    contagem, total_votos = atualizar_apuracao()
+    exibir_resultados(contagem, total_votos, linha_do_tempo_apuracao())
+
+def exibir_resultados_congelados():
+    """Resultado final da votação encerrada, servido do artefato congelado."""
+    artefato = obter_resultados_congelados()
+    gerado_em = datetime.fromtimestamp(artefato['gerado_em']).strftime("%d/%m/%Y %H:%M:%S")
+    st.caption(
+        f"🔒 Resultado final congelado em {gerado_em}. "
+        f"SHA-256 do backup do banco: `{artefato['hash_snapshot']}`"
+    )
+    exibir_resultados(Counter(artefato['contagem']), artefato['total_votantes'], artefato['linha_tempo'])
+    if artefato['total_votantes'] > 0:
+        if not arquivo_resultado_final().exists():
+            st.caption(
+                "O snapshot do encerramento não está neste servidor: o backup do banco "
+                "oferecido é uma cópia atual (mesmos votos, SHA-256 diferente)."
+            )
+        exibir_downloads(arquivos_resultado_final, 'final')
+        exibir_exportacao_colunar()
+
+def _apagar_exportacoes_antigas():
+    """Apaga ZIPs de exportação nunca baixados (sessões que terminaram antes do download)."""
+    limite = time.time() - VALIDADE_EXPORTACAO
+    for arquivo in DIRETORIO_EXPORTACOES.glob('*.zip'):
+        try:
+            if arquivo.stat().st_mtime < limite:
+                arquivo.unlink()
+        except FileNotFoundError:
+            pass
+
+def _descartar_exportacao(chave):
+    """on_click do download da exportação: tira da sessão e apaga o ZIP já servido."""
+    gerada = st.session_state.pop(chave, None)
+    if gerada:
+        Path(gerada[1]).unlink(missing_ok=True)
+
+def exibir_exportacao_colunar():
+    """
+    Gera sob demanda a exportação colunar (ver exportar_colunar) e oferece o download.
+    
+    A sessão guarda só o caminho do ZIP em disco; o arquivo é apagado assim que
+    é baixado ou quando outro é gerado no lugar.
+    """
+    eleicao = eleicao_atual()
+    chave = f"exportacao_colunar_{eleicao}"
+    col1, col2 = st.columns(2)
+    with col1:
+        formato = st.selectbox(
+            "Exportação colunar:", list(FORMATOS_EXPORTACAO),
+            format_func=FORMATOS_EXPORTACAO.get, key=f"formato_colunar_{eleicao}"
+        )
+    with col2:
+        if st.button("🧱 Gerar Exportação Colunar", key=f"gerar_colunar_{eleicao}"):
+            _descartar_exportacao(chave)
+            _apagar_exportacoes_antigas()
+            with st.spinner("Exportando votos..."):
+                st.session_state[chave] = (formato, exportar_colunar(formato))
+        gerada = st.session_state.get(chave)
+        if gerada and not os.path.exists(gerada[1]):
+            st.session_state.pop(chave)
+            gerada = None
+        if gerada:
+            formato_gerado, caminho = gerada
+            st.download_button(
+                label=f"📥 Baixar {FORMATOS_EXPORTACAO[formato_gerado]}",
+                data=Path(caminho).read_bytes(),
+                file_name=f"votos_ceie_{formato_gerado}.zip",
+                mime="application/zip",
+                key=f"download_colunar_{eleicao}",
+                on_click=_descartar_exportacao,
+                args=(chave,),
+            )
+
+def gerar_downloads_auditoria():
+    """CSV de auditoria e backup do banco da eleição atual, como estão agora."""
+    df_votos = get_resultados_df()
+    return gerar_csv_votos_formatado(df_votos).to_csv(index=False).encode('utf-8'), ler_snapshot_db()
+
+def _descartar_download(chave, arquivo):
+    """on_click dos downloads: tira da sessão o arquivo já servido."""
+    arquivos = st.session_state.get(chave, {})
+    arquivos.pop(arquivo, None)
+    if 'csv' not in arquivos and 'banco' not in arquivos:
+        st.session_state.pop(chave, None)
+
+def exibir_downloads(gerar, origem):
+    """
+    Botões de download do CSV de auditoria e do backup do banco.
+    
+    Os dois arquivos custam proporcionalmente ao número de votos, então só são
+    gerados quando o admin pede, e não a cada rerun da página; cada um fica na
+    sessão até ser baixado.
+    
+    Args:
+        gerar: Função sem argumentos que devolve (CSV de auditoria, backup do banco) em bytes
+        origem: 'ao_vivo' ou 'final'; arquivos gerados com a votação aberta não
+            são oferecidos depois do encerramento (e vice-versa)
+    """
+    eleicao = eleicao_atual()
+    chave = f"downloads_auditoria_{eleicao}"
+    if st.button("📦 Gerar CSV de Votos e Backup do Banco", key=f"gerar_downloads_{eleicao}"):
+        with st.spinner("Gerando arquivos..."):
+            csv_auditoria, snapshot = gerar()
+        st.session_state[chave] = {
+            'origem': origem, 'gerado_em': datetime.now().strftime("%H:%M:%S"),
+            'csv': csv_auditoria, 'banco': snapshot,
+        }
+    arquivos = st.session_state.get(chave)
+    if arquivos and arquivos['origem'] != origem:
+        st.session_state.pop(chave)
+        arquivos = None
+    if not arquivos:
+        return
+    
+    if origem == 'ao_vivo':
+        st.caption(f"Arquivos gerados às {arquivos['gerado_em']}; gere de novo para incluir votos posteriores.")
+    col_dl1, col_dl2 = st.columns(2)
+    with col_dl1:
+        if 'csv' in arquivos:
+            st.download_button(
+                label="📥 Baixar CSV de Votos",
+                data=arquivos['csv'],
+                file_name='auditoria_votos_ceie.csv',
+                mime='text/csv',
+                on_click=_descartar_download,
+                args=(chave, 'csv'),
+            )
+    
+    with col_dl2:
+        if 'banco' in arquivos:
+            st.download_button(
+                label="💾 Baixar Backup Banco (SQLite)",
+                data=arquivos['banco'],
+                file_name="backup_votos.db",
+                mime="application/octet-stream",
+                on_click=_descartar_download,
+                args=(chave, 'banco'),
+            )
+
+def exibir_resultados(contagem, total_votos, faixas):
+    """
+    Comparecimento, gráfico, ranking e linha do tempo.
+    
+    Args:
+        contagem: Counter candidato -> votos
+        total_votos: Número de eleitores que votaram
+        faixas: Novos votantes por minuto (epoch -> quantidade)
+    """
+    indice = indice_eleitores()
+    total_aptos = len(indice) if indice is not None else 0
+    col_votantes, col_aptos, col_comparecimento = st.columns(3)
+    col_votantes.metric("Total de votantes", total_votos)
+    col_aptos.metric("Eleitores aptos", total_aptos if total_aptos else "-")
+    col_comparecimento.metric(
+        "Comparecimento",
+        f"{total_votos / total_aptos:.1%}" if total_aptos else "-"
+    )
+    
+    if total_votos == 0:
+        st.info("Ainda não há votos registrados.")
+        return
+    
+    df_ranking = montar_ranking(tuple(sorted(contagem.items())), total_votos)
+    
+    st.markdown("### 📈 Resultados por Candidato")
+    st.bar_chart(df_ranking, x='Candidato', y='Votos', sort='-Votos')
+    
+    # Ranking em um único elemento (empates com a mesma posição)
+    st.markdown("### 📊 Ranking de Candidatos")
+    st.dataframe(
+        df_ranking,
+        hide_index=True,
+        column_config={
+            'Posição': st.column_config.NumberColumn(format="%dº"),
+            '% dos votos': st.column_config.NumberColumn(format="%.1f%%"),
+            '% dos votantes': st.column_config.ProgressColumn(format="%.1f%%", min_value=0, max_value=100),
+        },
+    )
+    
+    exibir_cubo_resultados(contagem)
+    exibir_linha_do_tempo(faixas, total_aptos)
+
+def exibir_cubo_resultados(contagem):
+    """Totais por região e instituição, com detalhamento até o candidato."""
+    fonte = _fonte_candidatos()
+    if fonte is None:
+        return
+    cubo = montar_cubo_resultados(tuple(sorted(contagem.items())), fonte)
+    df_candidatos = cubo['candidatos']
+    formato_percentual = {'% dos votos': st.column_config.NumberColumn(format="%.1f%%")}
+    
+    st.markdown("### 🗺️ Resultados por Região e Instituição")
+    aba_regiao, aba_instituicao = st.tabs(["Por Região", "Por Instituição"])
+    
+    with aba_regiao:
+        st.bar_chart(cubo['regioes'], x='Regiao', y='Votos', sort='-Votos')
+        regiao = st.selectbox(
+            "Detalhar região:", cubo['regioes']['Regiao'], key=f'detalhe_regiao_{eleicao_atual()}'
+        )
+        st.dataframe(
+            df_candidatos.loc[df_candidatos['Regiao'] == regiao, ['Instituicao', 'Candidato', 'Votos']],
+            hide_index=True,
+        )
+    
+    with aba_instituicao:
+        st.dataframe(cubo['instituicoes'], hide_index=True, column_config=formato_percentual)
+        instituicao = st.selectbox(
+            "Detalhar instituição:", sorted(cubo['instituicoes']['Instituicao'].unique()),
+            key=f'detalhe_instituicao_{eleicao_atual()}'
+        )
+        st.dataframe(
+            df_candidatos.loc[df_candidatos['Instituicao'] == instituicao, ['Regiao', 'Candidato', 'Votos']],
+            hide_index=True,
+        )
+
+def exibir_linha_do_tempo(faixas, total_aptos):
+    """Novos votantes por minuto/hora e comparecimento acumulado em relação ao roster."""
+    import pandas as pd
+
+    if not faixas:
+        return
+    
+    st.markdown("### ⏱️ Comparecimento ao Longo do Tempo")
+    granularidade = st.radio(
+        "Agrupar por", ["Minuto", "Hora"], horizontal=True, key='granularidade_linha_tempo'
+    )
+    
+    serie = pd.Series(faixas).sort_index()
+    # Epoch UTC -> horário local do servidor, o mesmo da coluna timestamp
+    serie.index = (
+        pd.to_datetime(serie.index, unit='s', utc=True)
+        .tz_convert(datetime.now().astimezone().tzinfo)
+        .tz_localize(None)
+    )
+    serie = serie.resample('h' if granularidade == "Hora" else 'min').sum()
+    
+    df_tempo = pd.DataFrame({'Novos votantes': serie, 'Votantes acumulados': serie.cumsum()})
+    st.bar_chart(df_tempo['Novos votantes'])
+    if total_aptos:
+        df_tempo['Comparecimento acumulado (%)'] = df_tempo['Votantes acumulados'] / total_aptos * 100
+        st.line_chart(df_tempo['Comparecimento acumulado (%)'])
+    else:
+        st.line_chart(df_tempo['Votantes acumulados'])
+
+def exibir_escolha_eleicao(eleicoes_eleitor):
+    """Tela em que o eleitor apto a várias eleições escolhe a cédula."""
+    st.write(f"Olá, **{st.session_state.nome_usuario}**!")
+    st.subheader("Escolha a eleição")
+    situacao = status_das_eleicoes(eleicoes_eleitor)
+    for eleicao in eleicoes_eleitor:
+        titulo, status = situacao[eleicao]
+        rotulo = f"🗳️ {titulo}" if status == 'ABERTO' else f"🔒 {titulo} (encerrada)"
+        if st.button(rotulo, key=f"escolher_eleicao_{eleicao}", width='stretch'):
+            st.session_state.eleicao = eleicao
+            st.rerun()
+    
+    st.markdown("---")
+    if st.button("Sair", key="btn_sair_eleicoes"):
+        st.session_state.usuario_validado = None
+        st.session_state.nome_usuario = None
+        st.session_state.eleicoes_eleitor = []
+        st.rerun()
+
+def exibir_troca_eleicao(eleicoes_eleitor, chave):
+    """Volta à escolha de eleição (só para eleitores aptos a mais de uma)."""
+    if len(eleicoes_eleitor) > 1 and st.button("🗂️ Votar em outra eleição", key=chave):
+        st.session_state.eleicao = None
+        st.session_state.pop('voto_confirmado', None)
+        st.session_state.pop('candidatos_votados', None)
+        st.rerun()
+
+def exibir_importacao_cedulas():
+    """Seção da área administrativa que importa cédulas em papel de um CSV."""
+    st.subheader("📨 Importar Cédulas em Papel")
+    st.info(
+        "CSV com as colunas **Email** e **Escolhas** (candidatos separados por "
+        f"\"{SEPARADOR_ESCOLHAS_IMPORTACAO}\", pelo nome ou pelo rótulo da cédula). "
+        "As cédulas válidas são gravadas de uma vez e substituem um voto anterior do mesmo eleitor."
+    )
+    eleicao = eleicao_atual()
+    arquivo = st.file_uploader("Upload cédulas.csv", type=['csv'], key=f"importar_cedulas_{eleicao}")
+    if arquivo is None:
+        return
+    
+    try:
+        relatorio, cedulas = validar_importacao_cedulas(arquivo.getvalue())
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+    rejeitadas = len(relatorio) - len(cedulas)
+    st.write(f"**{len(cedulas)}** cédula(s) válida(s), **{rejeitadas}** rejeitada(s).")
+    
+    if st.button(f"📨 Importar {len(cedulas)} Cédula(s)", disabled=not cedulas, key=f"importar_{eleicao}"):
+        try:
+            with st.spinner("Importando cédulas..."):
+                relatorio, importadas, enviado = importar_cedulas(arquivo.getvalue())
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+        st.success(
+            f"✅ {importadas} cédula(s) importada(s)."
+            + (" Backup enviado ao Dropbox." if enviado else "")
+        )
+    
+    st.dataframe(relatorio.head(200), hide_index=True)
+    st.download_button(
+        label="📥 Baixar relatório da importação",
+        data=relatorio.to_csv(index=False).encode('utf-8'),
+        file_name='relatorio_importacao_cedulas.csv',
+        mime='text/csv',
+        key=f"download_importacao_{eleicao}"
+    )
+
+def exibir_ajuste_roster():
+    """Seção da área administrativa que aplica um CSV de ajustes ao roster de eleitores."""
+    st.subheader("👥 Ajustar Roster de Eleitores")
+    st.info(
+        "CSV com as colunas **Acao** (incluir, alterar ou remover), **Email**, **Nome** e **id_sbc** "
+        "(Nome e id_sbc podem ficar vazios ao remover). Os ajustes valem na hora para o login, "
+        "sem reiniciar a votação: votos já registrados, inclusive de eleitores removidos, são mantidos."
+    )
+    eleicao = eleicao_atual()
+    arquivo = st.file_uploader("Upload ajustes_eleitores.csv", type=['csv'], key=f"ajustar_roster_{eleicao}")
+    if arquivo is None:
+        return
+    
+    resultado = validar_ajustes_eleitores(arquivo.getvalue())
+    exibir_resultado_validacao('ajustes', resultado, chave=f"_{eleicao}")
+    
+    if st.button("👥 Aplicar Ajustes", disabled=not resultado[0], key=f"aplicar_ajustes_{eleicao}"):
+        try:
+            resumo = aplicar_ajustes_roster(arquivo.getvalue())
+        except FileNotFoundError:
+            st.error("❌ Esta eleição não tem roster de eleitores.")
+            return
+        st.success(
+            f"✅ Roster ajustado: {resumo['incluidos']} incluído(s), {resumo['alterados']} alterado(s), "
+            f"{resumo['removidos']} removido(s)."
+            + (f" {resumo['ignorados']} remoção(ões) ignorada(s) (e-mail fora do roster)." if resumo['ignorados'] else "")
+        )
+
+def exibir_nova_eleicao():
+    """Seção da área administrativa que cria uma eleição adicional."""
+    st.subheader("🗂️ Nova Eleição Simultânea")
+    st.info(
+        "Cria outra eleição (ex.: conselho fiscal) com banco, eleitores, candidatos e "
+        "configuração próprios, sem alterar as eleições existentes. Eleitores presentes "
+        "em mais de um roster escolhem a eleição após o login."
+    )
+    titulo = st.text_input("Título da nova eleição:", key="nova_eleicao_titulo")
+    max_selections = st.number_input(
+        "Número Máximo de Votos:", min_value=1, max_value=10, value=MAX_SELECTIONS, key="nova_eleicao_max"
+    )
+    uploaded_eleitores = st.file_uploader("Upload eleitores.csv", type=['csv'], key="nova_eleicao_eleitores")
+    uploaded_candidatos = st.file_uploader("Upload candidatos.csv", type=['csv'], key="nova_eleicao_candidatos")
+    
+    validos = False
+    if uploaded_eleitores is not None and uploaded_candidatos is not None:
+        with st.spinner("Validando CSVs..."):
+            resultado_eleitores = validar_roster_eleitores(uploaded_eleitores.getvalue())
+            resultado_candidatos = validar_roster_candidatos(uploaded_candidatos.getvalue())
+        exibir_resultado_validacao('eleitores', resultado_eleitores, chave='_nova_eleicao')
+        exibir_resultado_validacao('candidatos', resultado_candidatos, chave='_nova_eleicao')
+        validos = resultado_eleitores[0] and resultado_candidatos[0]
+    
+    if st.button("➕ Criar Eleição", disabled=not (validos and titulo.strip())):
+        try:
+            eleicao = criar_eleicao(
+                titulo.strip(), int(max_selections),
+                uploaded_eleitores.getvalue(), uploaded_candidatos.getvalue()
+            )
+        except Exception as e:
+            st.error(f"Erro ao criar eleição: {e}")
+        else:
+            st.session_state.eleicao = eleicao
+            st.rerun()
+
+def exibir_painel_sql():
+    """Seção de rastreamento de SQL da área administrativa."""
+    import pandas as pd
+
+    st.subheader("🔎 Rastreamento de SQL")
+    rastreador = _rastreador_sql()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        ativo = st.toggle(
+            "Rastrear consultas",
+            value=rastreador['ativo'],
+            help="Registra cada instrução SQL executada (tem custo; desligue após a análise)",
+            key="toggle_rastreamento_sql"
+        )
+    with col2:
+        orcamento = st.number_input(
+            "Orçamento de consultas por rerun:",
+            min_value=1,
+            max_value=1000,
+            value=rastreador['orcamento'],
+            key="input_orcamento_sql"
+        )
+    if ativo != rastreador['ativo'] or orcamento != rastreador['orcamento']:
+        ativar_rastreamento_sql(ativo, orcamento)
+    
+    if rastreador['total_reruns'] == 0 and not rastreador['estatisticas']:
+        st.info("Nenhuma consulta rastreada ainda.")
+        return
+    
+    col1, col2 = st.columns(2)
+    col1.metric("Reruns rastreados", rastreador['total_reruns'])
+    col2.metric("Acima do orçamento", rastreador['reruns_acima'])
+    
+    df_sql = pd.DataFrame(relatorio_sql())
+    st.markdown("**Consultas por tempo total**")
+    st.dataframe(df_sql.head(20), hide_index=True, width='stretch')
+    
+    # As sessões acrescentam reruns em outras threads
+    with rastreador['lock']:
+        reruns = list(rastreador['reruns'])
+    reruns_acima = [rerun for rerun in reruns if rerun['Acima do orçamento']]
+    if reruns_acima:
+        st.markdown("**Reruns recentes acima do orçamento**")
+        st.dataframe(reruns_acima[-20:], hide_index=True, width='stretch')
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Baixar relatório de SQL",
+            data=df_sql.to_csv(index=False).encode('utf-8'),
+            file_name='relatorio_sql.csv',
+            mime='text/csv',
+            key="download_relatorio_sql"
+        )
+    with col2:
+        if st.button("🧹 Limpar rastreamento", key="btn_limpar_sql"):
+            limpar_rastreamento_sql()
+            st.rerun()
+
+def exibir_painel_perfil():
+    """Seção de captura de perfil (cProfile) da área administrativa."""
+    st.subheader("🧪 Perfil de Execução")
+    perfilador = _perfilador()
+    
+    if perfilador['ativo']:
+        if perfilador['ate'] is not None:
+            restante = max(0, int(perfilador['ate'] - time.time()))
+            st.info(f"⏺️ Capturando todos os reruns por mais {restante} s.")
+        else:
+            st.info(f"⏺️ Capturando os próximos {perfilador['reruns_restantes']} rerun(s).")
+        if st.button("⏹️ Parar captura", key="btn_parar_perfil"):
+            parar_captura_perfil()
+            st.rerun()
+    else:
+        modo = st.radio(
+            "Capturar:",
+            ["Próximos N reruns", "Janela de tempo"],
+            horizontal=True,
+            key="radio_modo_perfil"
+        )
+        if modo == "Próximos N reruns":
+            quantidade = st.number_input("Reruns:", min_value=1, max_value=1000, value=20, key="input_reruns_perfil")
+        else:
+            quantidade = st.number_input("Minutos:", min_value=1, max_value=60, value=5, key="input_minutos_perfil")
+        if st.button("▶️ Iniciar captura", key="btn_iniciar_perfil"):
+            if modo == "Próximos N reruns":
+                iniciar_captura_perfil(reruns=quantidade)
+            else:
+                iniciar_captura_perfil(minutos=quantidade)
+            st.rerun()
+    
+    if perfilador['stats'] is None:
+        st.caption("Nenhum perfil capturado.")
+        return
+    
+    st.write(f"**Reruns perfilados:** {perfilador['reruns_perfilados']}")
+    st.dataframe(funcoes_mais_custosas(), hide_index=True, width='stretch')
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Baixar perfil (.pstats)",
+            data=exportar_perfil(),
+            file_name='perfil_ceie.pstats',
+            mime='application/octet-stream',
+            key="download_perfil"
+        )
+    with col2:
+        if st.button("🧹 Limpar perfil", key="btn_limpar_perfil"):
+            limpar_perfil()
+            st.rerun()
+
+def exibir_painel_desempenho():
+    """Seção "Desempenho" da área administrativa: percentis por tela e fase."""
+    st.subheader("⏱️ Desempenho")
+    st.caption(
+        "Duração das fases dos reruns desde o início do processo "
+        f"(últimas {TAMANHO_BUFFER_TEMPOS} amostras por tela/fase)."
+    )
+    
+    limite = resumo_limite_login()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Logins barrados (e-mail)", limite['email'])
+    col2.metric("Logins barrados (sessão)", limite['sessao'])
+    col3.metric("Baldes de login em memória", limite['baldes'])
+    
+    estado = _estado_processo()
+    if estado['duracao_aquecimento'] is not None:
+        st.write(f"**Aquecimento inicial:** {estado['duracao_aquecimento']:.2f} s")
+        if estado['erro_aquecimento']:
+            st.warning(f"Aquecimento com erro: {estado['erro_aquecimento']}")
+    
+    linhas = resumo_tempos()
+    if not linhas:
+        st.info("Ainda não há medições.")
+        return
+    
+    telas = sorted({linha['Tela'] for linha in linhas})
+    tela = st.selectbox("Tela:", ["Todas"] + telas, key="desempenho_tela")
+    if tela != "Todas":
+        linhas = [linha for linha in linhas if linha['Tela'] == tela]
+    st.dataframe(linhas, hide_index=True, width='stretch')
+    
+    if st.button("🧹 Limpar medições", key="btn_limpar_tempos"):
+        limpar_tempos()
+        st.rerun()
+
 def main():
-    init_db()
+    # Na primeira execução do processo, espera o aquecimento dos caches
+    aguardar_aquecimento()
+    iniciar_exportador_metricas()
     
-    # Verifica e restaura banco do Google Drive se necessário
-    verificar_e_restaurar_db()
+    # Cria tabelas e restaura do Dropbox uma única vez por processo
+    # (já feito pelo aquecimento, exceto se ele falhou ou excedeu o tempo)
+    inicializar_armazenamento()
     
     # Extrai cores do logo para aplicar estilo (sem exibir o logo ainda)
     logo_path = encontrar_logo()
     if logo_path:
-        cores = extrair_cores_principais(logo_path)
+        cores = carregar_paleta_logo(logo_path)
         aplicar_estilo_ceie(cores)
         # Identifica a cor azul do logo para usar no título
         cor_azul_logo = identificar_cor_azul(cores)
@@ -1039,9 +4255,9 @@ def main():
     if 'admin_logado' not in st.session_state:
         st.session_state.admin_logado = False
 
-    status_votacao = get_voting_status()
-
-    if status_votacao == 'FECHADO' and not st.session_state.usuario_validado:
+    # Antes do login, a tela de encerramento só aparece se nenhuma eleição estiver aberta
+    if not st.session_state.usuario_validado and todas_encerradas():
+        definir_tela('encerrada')
         st.warning("A votação está encerrada.")
         return
 
@@ -1059,24 +4275,47 @@ def main():
             submitted = st.form_submit_button("Acessar", type="primary")
             
             if submitted:
-                valido, nome, is_admin = validar_usuario(email_input, senha_input)
-                if valido:
-                    st.session_state.usuario_validado = email_input
-                    st.session_state.nome_usuario = nome
-                    st.session_state.admin_logado = is_admin
-                    st.rerun()
+                espera = reservar_tentativa_login(email_input)
+                if espera:
+                    st.error(f"Muitas tentativas de login. Tente novamente em {math.ceil(espera)} s.")
                 else:
-                    if email_input and email_input.strip().lower() == EMAIL_ADMIN.lower():
-                        st.error("Senha incorreta para administrador.")
+                    valido, nome, is_admin = validar_usuario(email_input, senha_input)
+                    if valido:
+                        # A chave das cédulas no banco é o e-mail normalizado (ver registrar_votos)
+                        st.session_state.usuario_validado = normalizar_email(email_input)
+                        st.session_state.nome_usuario = nome
+                        st.session_state.admin_logado = is_admin
+                        # Eleitor apto a uma só eleição vai direto para a cédula dela
+                        eleicoes = [] if is_admin else eleicoes_do_eleitor(email_input, senha_input)
+                        st.session_state.eleicoes_eleitor = eleicoes
+                        st.session_state.eleicao = eleicoes[0] if len(eleicoes) == 1 else None
+                        st.rerun()
                     else:
-                        st.error("E-mail não encontrado ou senha (id_sbc) incorreta.")
+                        if email_input and email_input.strip().lower() == EMAIL_ADMIN.lower():
+                            st.error("Senha incorreta para administrador.")
+                        else:
+                            st.error("E-mail não encontrado ou senha (id_sbc) incorreta.")
 
     # Tela de Votação (apenas para eleitores, não para admin)
     else:
         # Se for admin, mostra área administrativa na área principal
         if st.session_state.admin_logado:
+            definir_tela('admin')
             st.title("🔐 Área Administrativa")
             st.success("👤 Logado como **Administrador**")
+            
+            # Cada eleição tem banco, roster, candidatos e configuração próprios
+            eleicoes = listar_eleicoes()
+            if len(eleicoes) > 1:
+                situacao = status_das_eleicoes(eleicoes)
+                atual = eleicao_atual()
+                st.session_state.eleicao = st.selectbox(
+                    "🗂️ Eleição",
+                    eleicoes,
+                    index=eleicoes.index(atual) if atual in eleicoes else 0,
+                    format_func=lambda eleicao: f"{situacao[eleicao][0]} ({situacao[eleicao][1]})",
+                )
+            inicializar_armazenamento()
             st.markdown("---")
             
             # Controle de Status
@@ -1101,69 +4340,58 @@ def main():
                     st.session_state.admin_logado = False
                     st.session_state.usuario_validado = None
                     st.session_state.nome_usuario = None
+                    st.session_state.eleicao = None
                     st.rerun()
             
             st.markdown("---")
             
             # Auditoria e Download
-            st.subheader("📊 Auditoria em Tempo Real")
-            df_votos = get_resultados_df()
-            total_votos = len(df_votos)
-            st.write(f"**Total de votantes:** {total_votos}")
-            
-            if total_votos > 0:
-                # Processamento para contagem (explode multiselect)
-                todas_escolhas = []
-                for voto in df_votos['escolhas']:
-                    todas_escolhas.extend(voto.split(", "))
-                
-                contagem = pd.Series(todas_escolhas).value_counts()
-                
-                st.markdown("### 📈 Resultados por Candidato")
-                st.bar_chart(contagem)
-                
-                # Lista de candidatos ordenada por votos (decrescente)
-                st.markdown("### 📊 Ranking de Candidatos")
-                
-                # Cria DataFrame com ranking
-                df_ranking = pd.DataFrame({
-                    'Candidato': contagem.index,
-                    'Votos': contagem.values
-                })
-                df_ranking = df_ranking.sort_values('Votos', ascending=False)
-                df_ranking.reset_index(drop=True, inplace=True)
+            if status_atual == 'FECHADO':
+                st.subheader("📊 Resultado Final")
+                exibir_resultados_congelados()
+            else:
+                st.subheader("📊 Auditoria em Tempo Real")
+                intervalo_painel = st.number_input(
+                    "🔄 Atualizar resultados a cada (segundos, 0 = só ao interagir)",
+                    min_value=0,
+                    max_value=600,
+                    value=INTERVALO_PAINEL_PADRAO,
+                    step=1,
+                    key='intervalo_painel',
+                )
+                # Só este trecho é reexecutado a cada intervalo, não a página inteira
+                st.fragment(run_every=intervalo_painel or None)(exibir_resultados_ao_vivo)()
                 
-                # Exibe a lista formatada
-                for posicao, (_, row) in enumerate(df_ranking.iterrows(), start=1):
-                    st.markdown(f"{posicao}º **{row['Candidato']}** - **{row['Votos']}** voto(s)")
+                # Contagem incremental (barata); os arquivos só são gerados sob demanda
+                if atualizar_apuracao()[1] > 0:
+                    exibir_downloads(gerar_downloads_auditoria, 'ao_vivo')
+                    exibir_exportacao_colunar()
                 
-                # Download dos dados
-                col_dl1, col_dl2 = st.columns(2)
-                with col_dl1:
-                    df_votos_formatado = gerar_csv_votos_formatado(df_votos)
-                    st.download_button(
-                        label="📥 Baixar CSV de Votos",
-                        data=df_votos_formatado.to_csv(index=False).encode('utf-8'),
-                        file_name='auditoria_votos_ceie.csv',
-                        mime='text/csv',
-                    )
+                st.markdown("---")
                 
-                with col_dl2:
-                    with open(DB_FILE, "rb") as fp:
-                        st.download_button(
-                            label="💾 Baixar Backup Banco (SQLite)",
-                            data=fp,
-                            file_name="backup_votos.db",
-                            mime="application/octet-stream",
-                        )
-            else:
-                st.info("Ainda não há votos registrados.")
+                exibir_importacao_cedulas()
+            
+            st.markdown("---")
+            
+            exibir_painel_desempenho()
+            
+            st.markdown("---")
+            
+            exibir_painel_sql()
+            
+            st.markdown("---")
+            
+            exibir_painel_perfil()
+            
+            st.markdown("---")
+            
+            exibir_ajuste_roster()
             
             st.markdown("---")
             
             # Seção Nova Votação
             st.subheader("🔄 Nova Votação")
-            st.info("⚠️ **Atenção:** Ao iniciar uma nova votação, será feito backup automático dos dados atuais (CSV de votos e banco de dados) com data/hora. Todos os votos atuais serão deletados.")
+            st.info("⚠️ **Atenção:** Ao iniciar uma nova votação, será feito backup automático dos dados atuais (CSV de votos e banco de dados) com data/hora. Todos os votos atuais da eleição selecionada serão deletados.")
             
             # Configurações da votação
             st.markdown("#### ⚙️ Configurações da Votação")
@@ -1174,7 +4402,7 @@ def main():
                 "Título da Votação:",
                 value=titulo_atual,
                 help="Título que será exibido na tela de login e no navegador",
-                key="input_titulo_votacao"
+                key=f"input_titulo_votacao_{eleicao_atual()}"
             )
             
             novo_max_selections = st.number_input(
@@ -1183,7 +4411,7 @@ def main():
                 max_value=10,
                 value=max_selections_atual,
                 help="Número máximo de candidatos que cada eleitor pode selecionar",
-                key="input_max_selections"
+                key=f"input_max_selections_{eleicao_atual()}"
             )
             
             st.markdown("---")
@@ -1195,8 +4423,8 @@ def main():
                 horizontal=True
             )
             
-            novo_eleitores_df = None
-            novo_candidatos_df = None
+            novo_eleitores_csv = None
+            novo_candidatos_csv = None
             
             if opcao_upload == "📤 Upload de arquivos":
                 st.markdown("#### Upload de Arquivos CSV")
@@ -1212,18 +4440,10 @@ def main():
                 )
                 
                 if uploaded_eleitores is not None:
-                    try:
-                        novo_eleitores_df = pd.read_csv(uploaded_eleitores)
-                        st.success(f"✅ CSV de eleitores carregado: {len(novo_eleitores_df)} eleitores")
-                    except Exception as e:
-                        st.error(f"Erro ao ler CSV de eleitores: {e}")
+                    novo_eleitores_csv = uploaded_eleitores.getvalue()
                 
                 if uploaded_candidatos is not None:
-                    try:
-                        novo_candidatos_df = pd.read_csv(uploaded_candidatos)
-                        st.success(f"✅ CSV de candidatos carregado: {len(novo_candidatos_df)} candidatos")
-                    except Exception as e:
-                        st.error(f"Erro ao ler CSV de candidatos: {e}")
+                    novo_candidatos_csv = uploaded_candidatos.getvalue()
             
             else:  # Colar conteúdo
                 st.markdown("#### Colar Conteúdo dos CSVs")
@@ -1239,36 +4459,38 @@ def main():
                 )
                 
                 if texto_eleitores.strip():
-                    try:
-                        novo_eleitores_df = pd.read_csv(StringIO(texto_eleitores))
-                        st.success(f"✅ CSV de eleitores carregado: {len(novo_eleitores_df)} eleitores")
-                    except Exception as e:
-                        st.error(f"Erro ao processar CSV de eleitores: {e}")
+                    novo_eleitores_csv = texto_eleitores.encode('utf-8')
                 
                 if texto_candidatos.strip():
-                    try:
-                        novo_candidatos_df = pd.read_csv(StringIO(texto_candidatos))
-                        st.success(f"✅ CSV de candidatos carregado: {len(novo_candidatos_df)} candidatos")
-                    except Exception as e:
-                        st.error(f"Erro ao processar CSV de candidatos: {e}")
+                    novo_candidatos_csv = texto_candidatos.encode('utf-8')
+            
+            # Valida os CSVs assim que são fornecidos (resultado em cache por conteúdo)
+            eleitores_validos = False
+            candidatos_validos = False
+            if novo_eleitores_csv is not None:
+                with st.spinner("Validando CSV de eleitores..."), medir_fase('validar_csv_eleitores'):
+                    resultado_eleitores = validar_roster_eleitores(novo_eleitores_csv)
+                exibir_resultado_validacao('eleitores', resultado_eleitores)
+                eleitores_validos = resultado_eleitores[0]
+            if novo_candidatos_csv is not None:
+                with st.spinner("Validando CSV de candidatos..."), medir_fase('validar_csv_candidatos'):
+                    resultado_candidatos = validar_roster_candidatos(novo_candidatos_csv)
+                exibir_resultado_validacao('candidatos', resultado_candidatos)
+                candidatos_validos = resultado_candidatos[0]
             
             # Verifica se ambos os CSVs foram fornecidos para habilitar/desabilitar botão
-            csvs_fornecidos = (novo_eleitores_df is not None and novo_candidatos_df is not None)
+            csvs_fornecidos = (novo_eleitores_csv is not None and novo_candidatos_csv is not None)
+            csvs_validos = eleitores_validos and candidatos_validos
             
-            # Botão para iniciar nova votação (desabilitado se não houver CSVs)
+            # Botão para iniciar nova votação (desabilitado se não houver CSVs válidos)
             if st.button(
                 "🔄 Iniciar Nova Votação", 
                 type="primary",
-                disabled=not csvs_fornecidos
+                disabled=not (csvs_fornecidos and csvs_validos)
             ):
-                # Valida os CSVs
-                valido_eleitores, erro_eleitores = validar_csv_eleitores(novo_eleitores_df)
-                valido_candidatos, erro_candidatos = validar_csv_candidatos(novo_candidatos_df)
-                
-                if not valido_eleitores:
-                    st.error(f"Erro na validação de eleitores: {erro_eleitores}")
-                elif not valido_candidatos:
-                    st.error(f"Erro na validação de candidatos: {erro_candidatos}")
+                # Nunca reseta a votação com um roster inválido
+                if not csvs_validos:
+                    st.error("Corrija os erros dos CSVs antes de iniciar uma nova votação.")
                 else:
                     # Salva configurações antes de resetar
                     if novo_titulo and novo_titulo.strip():
@@ -1279,9 +4501,8 @@ def main():
                     if resetar_votacao():
                         # Salva novos CSVs
                         try:
-                            # Salva como arquivos locais
-                            novo_eleitores_df.to_csv(ARQUIVO_ELEITORES, index=False, encoding='utf-8')
-                            novo_candidatos_df.to_csv(ARQUIVO_CANDIDATOS, index=False, encoding='utf-8')
+                            # Salva os rosters da eleição (conteúdo já validado)
+                            salvar_rosters(novo_eleitores_csv, novo_candidatos_csv)
                             
                             # Limpa estados de sessão relacionados a votos
                             keys_to_delete = [key for key in st.session_state.keys() if 'checkbox' in key or 'voto' in key]
@@ -1307,25 +4528,44 @@ def main():
             if not csvs_fornecidos:
                 st.warning("⚠️ Por favor, forneça ambos os CSVs (eleitores e candidatos) antes de iniciar uma nova votação.")
             
+            st.markdown("---")
+            
+            exibir_nova_eleicao()
+            
             return
         
+        # Eleitor apto a mais de uma eleição escolhe em qual votar
+        eleicoes_eleitor = st.session_state.get('eleicoes_eleitor') or [ELEICAO_PRINCIPAL]
+        if st.session_state.get('eleicao') not in eleicoes_eleitor:
+            if len(eleicoes_eleitor) > 1:
+                definir_tela('eleicoes')
+                exibir_escolha_eleicao(eleicoes_eleitor)
+                return
+            st.session_state.eleicao = eleicoes_eleitor[0]
+        inicializar_armazenamento()
+        eleicao = eleicao_atual()
+        status_votacao = get_voting_status()
+        
+        definir_tela('cedula')
         st.write(f"Olá, **{st.session_state.nome_usuario}**!")
+        if len(eleicoes_eleitor) > 1:
+            st.subheader(f"🗳️ {get_titulo_votacao()}")
         
         if status_votacao == 'FECHADO':
             st.info("A votação foi encerrada. Obrigado pela participação.")
-            voto_atual = carregar_voto_existente(st.session_state.usuario_validado)
+            # Cédulas vêm do resultado congelado (sem consulta ao banco)
+            voto_atual = obter_resultados_congelados()['cedulas'].get(st.session_state.usuario_validado)
             if voto_atual:
                 st.success(f"Seus votos computados: {', '.join(voto_atual)}")
+            exibir_troca_eleicao(eleicoes_eleitor, "btn_trocar_eleicao_encerrada")
             return
 
-        try:
-            df_candidatos = ler_csv_candidatos()
-            # Cria lista formatada "Nome - Instituição" e ordena alfabeticamente
-            opcoes = df_candidatos.apply(lambda x: f"{x['Nome']} ({x['Instituicao']} - {x['Regiao']})", axis=1).tolist()
-            opcoes.sort()  # Ordena alfabeticamente
-        except FileNotFoundError:
+        # Lista formatada "Nome (Instituição - Região)" em ordem alfabética (em cache)
+        fonte_candidatos = _fonte_candidatos()
+        if fonte_candidatos is None:
             st.error("Arquivo de candidatos não encontrado.")
             return
+        opcoes = carregar_opcoes_candidatos(fonte_candidatos)
 
         # Verifica se o voto foi confirmado
         if 'voto_confirmado' in st.session_state and st.session_state.voto_confirmado:
@@ -1345,6 +4585,7 @@ def main():
                 st.markdown(f"{i}. {candidato}")
             
             st.markdown("---")
+            exibir_troca_eleicao(eleicoes_eleitor, "btn_trocar_eleicao_confirmacao")
             st.info("🔒 Por segurança, você será desconectado.")
             
             # Faz logout quando o usuário clicar no botão
@@ -1354,7 +4595,7 @@ def main():
                     # Salva o email antes de limpar
                     email_antigo = st.session_state.usuario_validado
                     # Limpa os checkboxes
-                    checkbox_key = f"checkboxes_{email_antigo}"
+                    checkbox_key = f"checkboxes_{eleicao}_{email_antigo}"
                     if checkbox_key in st.session_state:
                         del st.session_state[checkbox_key]
                     # Limpa flags de confirmação
@@ -1365,6 +4606,7 @@ def main():
                     # Faz logout
                     st.session_state.usuario_validado = None
                     st.session_state.nome_usuario = None
+                    st.session_state.eleicao = None
                     st.rerun()
         else:
             # Tela de votação normal
@@ -1372,7 +4614,7 @@ def main():
             escolhas_anteriores = carregar_voto_existente(st.session_state.usuario_validado)
             
             # Inicializa estado dos checkboxes se não existir
-            checkbox_key = f"checkboxes_{st.session_state.usuario_validado}"
+            checkbox_key = f"checkboxes_{eleicao}_{st.session_state.usuario_validado}"
             if checkbox_key not in st.session_state:
                 st.session_state[checkbox_key] = {
                     opcao: opcao in escolhas_anteriores 
@@ -1393,7 +4635,7 @@ def main():
                 checkbox_value = st.checkbox(
                     opcao,
                     value=default_value,
-                    key=f"checkbox_{opcao}_{st.session_state.usuario_validado}"
+                    key=f"checkbox_{eleicao}_{opcao}_{st.session_state.usuario_validado}"
                 )
                 checkbox_states[opcao] = checkbox_value
                 if checkbox_value:
@@ -1434,8 +4676,9 @@ def main():
                         f"mas o máximo permitido é {max_selections}. "
                         "Por favor, desmarque algumas opções e tente novamente."
                     )
+                elif not registrar_voto(st.session_state.usuario_validado, escolhas):
+                    st.error("A votação foi encerrada antes da confirmação. Seu voto não foi registrado.")
                 else:
-                    registrar_voto(st.session_state.usuario_validado, escolhas)
                     # Marca voto como confirmado e salva candidatos
                     st.session_state.voto_confirmado = True
                     st.session_state.candidatos_votados = escolhas
@@ -1446,4 +4689,4 @@ def main():
                 st.info("ℹ️ Você já votou anteriormente. Ao confirmar novamente, seu voto antigo será substituído.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    executar_rerun()
\ No newline at end of file
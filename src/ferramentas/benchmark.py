@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks dos caminhos quentes de dados do app (src/app.py).
+
+Cada benchmark roda sobre dados sintéticos gerados em um diretório temporário
+(roster, candidatos, votos.db) e é cronometrado como no timeit: o número de
+chamadas por medição é ajustado para durar pelo menos 0,2 s e a medição é
+repetida algumas vezes. Os resultados são acrescentados a um histórico em
+JSON Lines (um registro por benchmark/tamanho, com o commit do git), para
+comparar o desempenho do src/app.py entre commits.
+
+Benchmarks:
+  - validar_usuario: login sobre rosters de 1k/50k/500k eleitores, com e sem
+    a construção do índice (primeiro login após mudar o roster);
+  - gerar_csv_votos_formatado: 1k/30k/300k cédulas;
+  - atualizar_apuracao: contagem completa do painel do admin, 1k/30k/300k cédulas;
+  - extrair_cores_principais: logos em logo/;
+  - carregar_voto_existente e registrar_voto: banco com 1k/30k votos.
+
+Uso (a partir da raiz do repositório):
+    python -m src.ferramentas.benchmark                # roda tudo e grava no histórico
+    python -m src.ferramentas.benchmark --rapido       # só o menor tamanho de cada benchmark
+    python -m src.ferramentas.benchmark --filtro csv   # só benchmarks cujo nome contém "csv"
+    python -m src.ferramentas.benchmark --comparar     # compara com a última execução de outro commit
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[2]
+ARQUIVO_HISTORICO = RAIZ / '.benchmarks' / 'historico.jsonl'
+NUM_CANDIDATOS = 20
+MAX_SELECOES = 3
+LIMIAR_REGRESSAO = 0.10  # Fração de piora na mediana tratada como regressão
+MEDICAO_LONGA_S = 2.0  # Acima disso por chamada, reduz as repetições
+
+BENCHMARKS = []
+
+def benchmark(nome, tamanhos):
+    """
+    Registra um benchmark.
+
+    A função decorada recebe (app, tamanho, rng), prepara os dados fora da
+    medição e devolve a função sem argumentos que será cronometrada.
+    """
+    def registrar(preparar):
+        BENCHMARKS.append((nome, tamanhos, preparar))
+        return preparar
+    return registrar
+
+# --- Geradores de dados sintéticos ---
+def gerar_eleitores(caminho, quantidade):
+    """
+    Gera um roster de eleitores no formato do eleitores.csv.
+
+    Returns:
+        list: Tuplas (email, id_sbc)
+    """
+    eleitores = [(f"eleitor{i}@exemplo.org", str(100000 + i)) for i in range(quantidade)]
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write("Email,Nome,id_sbc\n")
+        for i, (email, id_sbc) in enumerate(eleitores):
+            f.write(f"{email},Eleitor {i},{id_sbc}\n")
+    return eleitores
+
+def gerar_candidatos(caminho, quantidade=NUM_CANDIDATOS):
+    """
+    Gera o candidatos.csv.
+
+    Returns:
+        list: Opções da cédula no formato "Nome (Instituição - Região)"
+    """
+    candidatos = [(f"Candidato {i:03d}", f"Universidade {i % 7}", f"Região {i % 5}") for i in range(quantidade)]
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write("Nome,Instituicao,Regiao\n")
+        for nome, instituicao, regiao in candidatos:
+            f.write(f"{nome},{instituicao},{regiao}\n")
+    return [f"{nome} ({instituicao} - {regiao})" for nome, instituicao, regiao in candidatos]
+
+def gerar_cedulas(quantidade, opcoes, rng):
+    """
+    Gera cédulas como as gravadas por registrar_voto.
+
+    Returns:
+        list: Tuplas (user_id, escolhas, timestamp)
+    """
+    inicio = datetime(2025, 1, 1, 8, 0, 0)
+    return [
+        (
+            f"eleitor{i}@exemplo.org",
+            ", ".join(sorted(rng.sample(opcoes, rng.randint(1, MAX_SELECOES)))),
+            (inicio + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        for i in range(quantidade)
+    ]
+
+def _dataframe_votos(cedulas):
+    import pandas as pd
+
+    return pd.DataFrame(cedulas, columns=['user_id', 'escolhas', 'timestamp'])
+
+def _popular_banco(app, cedulas):
+    """Cria o votos.db do app com as cédulas informadas (seq e criado_em como em registrar_voto)."""
+    app.init_db()
+    conn = sqlite3.connect(app.DB_FILE)
+    conn.executemany(
+        "INSERT INTO votos (user_id, escolhas, timestamp, seq, criado_em, atualizado_em) "
+        "VALUES (?, ?, ?, ?, CAST(strftime('%s', ?) AS INTEGER), CAST(strftime('%s', ?) AS INTEGER))",
+        [(user_id, escolhas, timestamp, seq, timestamp, timestamp)
+         for seq, (user_id, escolhas, timestamp) in enumerate(cedulas, 1)]
+    )
+    conn.commit()
+    conn.close()
+
+# --- Benchmarks ---
+@benchmark('validar_usuario_indice', (1_000, 50_000, 500_000))
+def _bench_indice_eleitores(app, tamanho, rng):
+    """Primeiro login após o roster mudar: lê o CSV e monta o índice."""
+    eleitores = gerar_eleitores(app.ARQUIVO_ELEITORES, tamanho)
+    app.init_db()  # O login também lê os ajustes do roster no votos.db
+    email, id_sbc = rng.choice(eleitores)
+
+    def executar():
+        app.carregar_indice_eleitores.clear()
+        app.validar_usuario(email, id_sbc)
+    return executar
+
+@benchmark('validar_usuario', (1_000, 50_000, 500_000))
+def _bench_validar_usuario(app, tamanho, rng):
+    """Login com o índice já montado (caso comum)."""
+    eleitores = gerar_eleitores(app.ARQUIVO_ELEITORES, tamanho)
+    app.init_db()  # O login também lê os ajustes do roster no votos.db
+    tentativas = [rng.choice(eleitores) for _ in range(1000)]
+    app.validar_usuario(*tentativas[0])
+    posicao = iter(range(sys.maxsize))
+
+    def executar():
+        email, id_sbc = tentativas[next(posicao) % len(tentativas)]
+        app.validar_usuario(email, id_sbc)
+    return executar
+
+@benchmark('gerar_csv_votos_formatado', (1_000, 30_000, 300_000))
+def _bench_gerar_csv(app, tamanho, rng):
+    opcoes = gerar_candidatos(app.ARQUIVO_CANDIDATOS)
+    df_votos = _dataframe_votos(gerar_cedulas(tamanho, opcoes, rng))
+    return lambda: app.gerar_csv_votos_formatado(df_votos)
+
+@benchmark('atualizar_apuracao', (1_000, 30_000, 300_000))
+def _bench_atualizar_apuracao(app, tamanho, rng):
+    """Primeira contagem do painel no processo (ou após reset): lê todas as cédulas do banco."""
+    opcoes = gerar_candidatos(app.ARQUIVO_CANDIDATOS)
+    _popular_banco(app, gerar_cedulas(tamanho, opcoes, rng))
+
+    def executar():
+        app._apuracao.clear()
+        app.atualizar_apuracao()
+    return executar
+
+@benchmark('extrair_cores_principais', ('ceie-logo.png', 'ceie-logo-com-nome.png'))
+def _bench_cores_logo(app, tamanho, rng):
+    caminho = RAIZ / 'logo' / tamanho
+    return lambda: app.extrair_cores_principais(caminho)
+
+@benchmark('carregar_voto_existente', (1_000, 30_000))
+def _bench_carregar_voto(app, tamanho, rng):
+    opcoes = gerar_candidatos(app.ARQUIVO_CANDIDATOS)
+    cedulas = gerar_cedulas(tamanho, opcoes, rng)
+    _popular_banco(app, cedulas)
+    eleitores = [rng.choice(cedulas)[0] for _ in range(1000)]
+    posicao = iter(range(sys.maxsize))
+    return lambda: app.carregar_voto_existente(eleitores[next(posicao) % len(eleitores)])
+
+@benchmark('registrar_voto', (1_000, 30_000))
+def _bench_registrar_voto(app, tamanho, rng):
+    """Metade das chamadas altera um voto existente, metade cria um novo."""
+    opcoes = gerar_candidatos(app.ARQUIVO_CANDIDATOS)
+    cedulas = gerar_cedulas(tamanho, opcoes, rng)
+    _popular_banco(app, cedulas)
+    escolhas = [rng.sample(opcoes, rng.randint(1, MAX_SELECOES)) for _ in range(1000)]
+    posicao = iter(range(sys.maxsize))
+
+    def executar():
+        i = next(posicao)
+        user_id = cedulas[i % len(cedulas)][0] if i % 2 else f"novo{i}@exemplo.org"
+        app.registrar_voto(user_id, escolhas[i % len(escolhas)])
+    return executar
+
+# --- Execução e histórico ---
+def cronometrar(executar, repeticoes):
+    """
+    Cronometra uma função no estilo do timeit (autorange + repeat).
+
+    Returns:
+        dict: Tempos por chamada em segundos e número de chamadas por medição
+    """
+    temporizador = timeit.Timer(executar)
+    chamadas, total = temporizador.autorange()
+    if total >= MEDICAO_LONGA_S:
+        # Casos grandes (ex.: 300k cédulas) levariam minutos com todas as repetições
+        repeticoes = min(repeticoes, 3)
+    tempos = [total / chamadas for total in temporizador.repeat(repeat=repeticoes, number=chamadas)]
+    return {
+        'chamadas': chamadas,
+        'repeticoes': repeticoes,
+        'mediana_s': statistics.median(tempos),
+        'min_s': min(tempos),
+        'max_s': max(tempos),
+    }
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ['git', *args], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def identificar_versao():
+    """Commit atual e se o src/app.py tem alterações não commitadas."""
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD') or 'desconhecido',
+        'app_modificado': bool(_git('status', '--porcelain', '--', 'src/app.py')),
+    }
+
+def executar_benchmarks(filtro=None, rapido=False, repeticoes=5, semente=0):
+    """
+    Roda os benchmarks selecionados, cada tamanho em um diretório novo.
+
+    Returns:
+        list: Um registro por (benchmark, tamanho)
+    """
+    from streamlit import logger
+
+    # Fora do `streamlit run` o Streamlit avisa a cada cache e st.*; só ruído aqui
+    logger.set_log_level('error')
+    from src import app
+
+    versao = identificar_versao()
+    base = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        **versao,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+    }
+    diretorio_original = os.getcwd()
+    resultados = []
+    for nome, tamanhos, preparar in BENCHMARKS:
+        if filtro and filtro not in nome:
+            continue
+        for tamanho in tamanhos[:1] if rapido else tamanhos:
+            with tempfile.TemporaryDirectory(prefix='ceie_bench_') as diretorio:
+                # O app usa caminhos relativos (votos.db, CSVs)
+                os.chdir(diretorio)
+                try:
+                    executar = preparar(app, tamanho, random.Random(semente))
+                    medicao = cronometrar(executar, repeticoes)
+                finally:
+                    os.chdir(diretorio_original)
+            registro = {**base, 'benchmark': nome, 'tamanho': tamanho, **medicao}
+            resultados.append(registro)
+            print(f"{nome:<28}{str(tamanho):>24}  {_formatar_tempo(medicao['mediana_s'])}")
+    return resultados
+
+def gravar_historico(resultados, caminho):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'a', encoding='utf-8') as f:
+        for registro in resultados:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+def ler_historico(caminho):
+    if not caminho.exists():
+        return []
+    with open(caminho, encoding='utf-8') as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+def comparar(resultados, historico, commit_base=None, limiar=LIMIAR_REGRESSAO):
+    """
+    Compara cada resultado com a medição mais recente do commit base.
+
+    Sem commit_base, usa a execução mais recente de um commit diferente do atual.
+
+    Returns:
+        list: Tuplas (benchmark, tamanho, mediana_base, mediana_atual, variação, regrediu)
+    """
+    if not resultados:
+        return []
+    commit_atual = resultados[0]['commit']
+    anteriores = [r for r in historico if r['commit'] != commit_atual]
+    if commit_base:
+        anteriores = [r for r in historico if r['commit'].startswith(commit_base)]
+    elif anteriores:
+        ultima_execucao = anteriores[-1]['data']
+        commit_base = anteriores[-1]['commit']
+        anteriores = [r for r in anteriores if r['commit'] == commit_base and r['data'] == ultima_execucao]
+
+    base = {(r['benchmark'], str(r['tamanho'])): r['mediana_s'] for r in anteriores}
+    comparacao = []
+    for registro in resultados:
+        chave = (registro['benchmark'], str(registro['tamanho']))
+        if chave not in base:
+            continue
+        variacao = registro['mediana_s'] / base[chave] - 1
+        comparacao.append((*chave, base[chave], registro['mediana_s'], variacao, variacao > limiar))
+    return comparacao
+
+def _formatar_tempo(segundos):
+    if segundos >= 1:
+        return f"{segundos:8.2f} s "
+    if segundos >= 1e-3:
+        return f"{segundos * 1e3:8.2f} ms"
+    return f"{segundos * 1e6:8.2f} µs"
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks dos caminhos quentes do app.")
+    parser.add_argument('--filtro', help="Roda só benchmarks cujo nome contém este texto")
+    parser.add_argument('--rapido', action='store_true', help="Só o menor tamanho de cada benchmark")
+    parser.add_argument('--repeticoes', type=int, default=5, help="Medições por benchmark")
+    parser.add_argument('--historico', type=Path, default=ARQUIVO_HISTORICO, help="Arquivo JSON Lines do histórico")
+    parser.add_argument('--nao-gravar', action='store_true', help="Não acrescenta o resultado ao histórico")
+    parser.add_argument('--comparar', nargs='?', const='', metavar='COMMIT',
+                        help="Compara com um commit (padrão: última execução de outro commit)")
+    parser.add_argument('--limiar', type=float, default=LIMIAR_REGRESSAO,
+                        help="Piora relativa da mediana considerada regressão (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    resultados = executar_benchmarks(args.filtro, args.rapido, args.repeticoes)
+    historico = ler_historico(args.historico)
+    if not args.nao_gravar:
+        gravar_historico(resultados, args.historico)
+        print(f"\nResultados acrescentados a {args.historico}")
+
+    if args.comparar is None:
+        return
+    comparacao = comparar(resultados, historico, args.comparar or None, args.limiar)
+    if not comparacao:
+        print("\nNada para comparar no histórico.")
+        return
+    print()
+    print(f"{'Benchmark':<28}{'Tamanho':>24}{'Base':>12}{'Atual':>12}{'Variação':>10}")
+    for nome, tamanho, mediana_base, mediana_atual, variacao, regrediu in comparacao:
+        marca = "  <- regressão" if regrediu else ""
+        print(
+            f"{nome:<28}{tamanho:>24}{_formatar_tempo(mediana_base):>12}"
+            f"{_formatar_tempo(mediana_atual):>12}{variacao:>+10.1%}{marca}"
+        )
+    if any(item[-1] for item in comparacao):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Teste de estresse da camada de armazenamento (votos.db).
+
+Vários processos, cada um com várias threads, usam as funções reais do
+src/app.py sobre o mesmo votos.db ao mesmo tempo:
+  - threads gravadoras chamam registrar_voto e, logo depois,
+    carregar_voto_existente para conferir a própria gravação;
+  - uma thread por processo monta o painel com get_resultados_df;
+  - uma thread por processo gera snapshots com upload_db_to_dropbox, usando
+    um cliente falso que abre cada cópia enviada e roda PRAGMA integrity_check.
+
+Cada eleitor pertence a uma única thread gravadora, então o último voto
+confirmado de cada um é conhecido; ao final o banco é conferido contra ele.
+O relatório traz gravações/s sustentadas, latências, uma estimativa do tempo
+de espera por lock (latência acima da mediana medida sem concorrência) e as
+falhas "database is locked".
+
+Uso (a partir da raiz do repositório):
+    python -m src.ferramentas.estresse_banco --processos 4 --threads 8 --duracao 20
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+NUM_CANDIDATOS = 20
+MAX_SELECOES = 3
+AMOSTRAS_REFERENCIA = 200  # Gravações sem concorrência para medir a latência de referência
+
+def _carregar_app():
+    """Importa o app sem o ruído de avisos do Streamlit fora do `streamlit run`."""
+    from streamlit import logger
+
+    logger.set_log_level('error')
+    from src import app
+    return app
+
+class ClienteDropboxFalso:
+    """Recebe os snapshots de upload_db_to_dropbox e confere se são bancos íntegros."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.corrompidos = []
+
+    def files_upload(self, dados, caminho, mode=None):
+        with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
+            f.write(dados)
+        try:
+            conn = sqlite3.connect(f.name)
+            resultado = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            conn.execute("SELECT COUNT(*) FROM votos").fetchone()
+            conn.close()
+        except sqlite3.DatabaseError as e:
+            resultado = str(e)
+        finally:
+            os.unlink(f.name)
+        with self._lock:
+            self.enviados += 1
+            if resultado != 'ok':
+                self.corrompidos.append(resultado)
+
+def gerar_opcoes(quantidade=NUM_CANDIDATOS):
+    return [f"Candidato {i:03d} (Universidade {i % 7} - Região {i % 5})" for i in range(quantidade)]
+
+class Coleta:
+    """Latências, falhas e confirmações de um processo (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.falhas = Counter()
+        self.confirmados = {}
+        self.ultima_tentativa_falhou = set()
+        self.leituras_divergentes = []
+
+    def registrar(self, operacao, duracao):
+        with self._lock:
+            self.latencias.setdefault(operacao, []).append(duracao)
+
+    def falha(self, operacao, erro):
+        with self._lock:
+            # sqlite_errorname traz o código estendido (ex.: SQLITE_BUSY_SNAPSHOT)
+            self.falhas[f"{operacao}: {erro} ({getattr(erro, 'sqlite_errorname', '?')})"] += 1
+
+def _gravador(app, eleitores, opcoes, fim, coleta, semente):
+    rng = random.Random(semente)
+    while time.monotonic() < fim:
+        eleitor = rng.choice(eleitores)
+        escolhas = sorted(rng.sample(opcoes, rng.randint(1, MAX_SELECOES)))
+        inicio = time.perf_counter()
+        try:
+            app.registrar_voto(eleitor, escolhas)
+        except sqlite3.OperationalError as e:
+            coleta.falha('registrar_voto', e)
+            coleta.ultima_tentativa_falhou.add(eleitor)
+            continue
+        coleta.registrar('registrar_voto', time.perf_counter() - inicio)
+        # Só esta thread grava este eleitor, então não há corrida com outras threads
+        coleta.confirmados[eleitor] = escolhas
+        coleta.ultima_tentativa_falhou.discard(eleitor)
+
+        inicio = time.perf_counter()
+        try:
+            lido = app.carregar_voto_existente(eleitor)
+        except sqlite3.OperationalError as e:
+            coleta.falha('carregar_voto_existente', e)
+            continue
+        coleta.registrar('carregar_voto_existente', time.perf_counter() - inicio)
+        if lido != escolhas:
+            coleta.leituras_divergentes.append(eleitor)
+
+def _em_laco(operacao, funcao, fim, intervalo, coleta):
+    while time.monotonic() < fim:
+        inicio = time.perf_counter()
+        try:
+            funcao()
+        except sqlite3.OperationalError as e:
+            coleta.falha(operacao, e)
+        else:
+            coleta.registrar(operacao, time.perf_counter() - inicio)
+        time.sleep(intervalo)
+
+def executar_processo(diretorio, eleitores_por_thread, duracao, intervalo_painel, intervalo_snapshot, semente):
+    """
+    Corpo de cada processo: threads gravadoras, painel e snapshots até o prazo.
+
+    Returns:
+        dict: Coleta do processo (serializável)
+    """
+    os.chdir(diretorio)
+    app = _carregar_app()
+    cliente = ClienteDropboxFalso()
+    # Também vale para o upload periódico disparado dentro de registrar_voto
+    app.init_dropbox_client = lambda: cliente
+
+    opcoes = gerar_opcoes()
+    coleta = Coleta()
+    fim = time.monotonic() + duracao
+    threads = [
+        threading.Thread(target=_gravador, args=(app, eleitores, opcoes, fim, coleta, f"{semente}-{i}"))
+        for i, eleitores in enumerate(eleitores_por_thread)
+    ]
+    threads.append(threading.Thread(
+        target=_em_laco, args=('get_resultados_df', app.get_resultados_df, fim, intervalo_painel, coleta)
+    ))
+    threads.append(threading.Thread(
+        target=_em_laco, args=('upload_db_to_dropbox', app.upload_db_to_dropbox, fim, intervalo_snapshot, coleta)
+    ))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'latencias': coleta.latencias,
+        'falhas': dict(coleta.falhas),
+        'confirmados': coleta.confirmados,
+        'ultima_tentativa_falhou': sorted(coleta.ultima_tentativa_falhou),
+        'leituras_divergentes': coleta.leituras_divergentes,
+        'snapshots': cliente.enviados,
+        'snapshots_corrompidos': cliente.corrompidos,
+    }
+
+def medir_referencia(app, opcoes):
+    """Mediana de registrar_voto sem concorrência, base da estimativa de espera por lock."""
+    rng = random.Random(0)
+    tempos = []
+    for i in range(AMOSTRAS_REFERENCIA):
+        inicio = time.perf_counter()
+        app.registrar_voto(f"referencia{i}@estresse.local", rng.sample(opcoes, MAX_SELECOES))
+        tempos.append(time.perf_counter() - inicio)
+    conn = sqlite3.connect(app.DB_FILE)
+    conn.execute("DELETE FROM votos WHERE user_id LIKE 'referencia%'")
+    conn.commit()
+    conn.close()
+    return statistics.median(tempos)
+
+def conferir_banco(caminho_db, confirmados):
+    """
+    Compara o banco com o último voto confirmado de cada eleitor.
+
+    Returns:
+        dict: Eleitores ausentes, divergentes e inesperados
+    """
+    conn = sqlite3.connect(caminho_db)
+    gravados = {user_id: escolhas.split(", ") for user_id, escolhas in conn.execute("SELECT user_id, escolhas FROM votos")}
+    conn.close()
+    return {
+        'ausentes': sorted(e for e in confirmados if e not in gravados),
+        'divergentes': sorted(e for e, escolhas in confirmados.items() if e in gravados and gravados[e] != escolhas),
+        'inesperados': sorted(e for e in gravados if e not in confirmados),
+    }
+
+def _percentis(valores):
+    ordenados = sorted(valores)
+    def p(q):
+        return ordenados[max(0, -(-q * len(ordenados) // 100) - 1)] * 1000
+    return {'n': len(ordenados), 'p50_ms': round(p(50), 2), 'p99_ms': round(p(99), 2), 'max_ms': round(ordenados[-1] * 1000, 2)}
+
+def executar(args):
+    eleitores = [f"eleitor{i}@estresse.local" for i in range(args.eleitores)]
+    fatias = args.processos * args.threads
+    # Cada eleitor pertence a uma única thread gravadora
+    por_thread = [eleitores[i::fatias] for i in range(fatias)]
+
+    with tempfile.TemporaryDirectory(prefix='ceie_estresse_') as diretorio:
+        diretorio_original = os.getcwd()
+        os.chdir(diretorio)
+        try:
+            app = _carregar_app()
+            app.init_db()
+            referencia = medir_referencia(app, gerar_opcoes())
+        finally:
+            os.chdir(diretorio_original)
+
+        contexto = multiprocessing.get_context('spawn')
+        with contexto.Pool(args.processos) as pool:
+            resultados = pool.starmap(executar_processo, [
+                (
+                    diretorio,
+                    por_thread[p * args.threads:(p + 1) * args.threads],
+                    args.duracao,
+                    args.intervalo_painel,
+                    args.intervalo_snapshot,
+                    args.semente + p,
+                )
+                for p in range(args.processos)
+            ])
+        # Cada processo gera carga por args.duracao segundos (sem contar o import do app)
+        duracao = args.duracao
+
+        latencias = {}
+        falhas = Counter()
+        confirmados = {}
+        ultima_falhou = set()
+        for resultado in resultados:
+            for operacao, valores in resultado['latencias'].items():
+                latencias.setdefault(operacao, []).extend(valores)
+            falhas.update(resultado['falhas'])
+            confirmados.update(resultado['confirmados'])
+            ultima_falhou.update(resultado['ultima_tentativa_falhou'])
+        conferencia = conferir_banco(Path(diretorio) / 'votos.db', confirmados)
+
+    gravacoes = latencias.get('registrar_voto', [])
+    return {
+        'processos': args.processos,
+        'threads_por_processo': args.threads,
+        'eleitores': args.eleitores,
+        'duracao_s': round(duracao, 2),
+        'gravacoes': len(gravacoes),
+        'gravacoes_por_s': round(len(gravacoes) / duracao, 1) if duracao else 0,
+        'referencia_registrar_voto_ms': round(referencia * 1000, 2),
+        'espera_lock_estimada_s': round(sum(max(0.0, t - referencia) for t in gravacoes), 2),
+        'operacoes': {operacao: _percentis(valores) for operacao, valores in sorted(latencias.items())},
+        'falhas': dict(falhas),
+        'database_is_locked': sum(n for falha, n in falhas.items() if 'database is locked' in falha),
+        'leituras_divergentes': sum(len(r['leituras_divergentes']) for r in resultados),
+        'snapshots': sum(r['snapshots'] for r in resultados),
+        'snapshots_corrompidos': sum(len(r['snapshots_corrompidos']) for r in resultados),
+        'eleitores_com_voto': len(confirmados),
+        'votos_ausentes': conferencia['ausentes'],
+        'votos_divergentes': conferencia['divergentes'],
+        'votos_inesperados': conferencia['inesperados'],
+        # Divergência após falha na última tentativa pode ser falha ambígua (erro após o commit)
+        'divergentes_apos_falha': sorted(set(conferencia['divergentes']) & ultima_falhou),
+    }
+
+def imprimir_relatorio(resultado):
+    print("=" * 64)
+    print("Estresse do armazenamento - votos.db")
+    print("=" * 64)
+    print(f"Processos: {resultado['processos']}  Threads/processo: {resultado['threads_por_processo']}  "
+          f"Eleitores: {resultado['eleitores']}  Duração: {resultado['duracao_s']} s")
+    print(f"Gravações: {resultado['gravacoes']}  ({resultado['gravacoes_por_s']} /s sustentadas)")
+    print(f"registrar_voto sem concorrência: {resultado['referencia_registrar_voto_ms']} ms")
+    print(f"Espera por lock estimada (total): {resultado['espera_lock_estimada_s']} s")
+    print()
+    print(f"{'Operação':<26}{'n':>8}{'p50 (ms)':>11}{'p99 (ms)':>11}{'máx (ms)':>11}")
+    for operacao, estatisticas in resultado['operacoes'].items():
+        print(f"{operacao:<26}{estatisticas['n']:>8}{estatisticas['p50_ms']:>11}"
+              f"{estatisticas['p99_ms']:>11}{estatisticas['max_ms']:>11}")
+    print()
+    print(f"Falhas 'database is locked': {resultado['database_is_locked']}")
+    for falha, quantidade in sorted(resultado['falhas'].items()):
+        print(f"  {quantidade:>6}  {falha}")
+    print(f"Leituras logo após gravar que não viram o voto: {resultado['leituras_divergentes']}")
+    print(f"Snapshots enviados: {resultado['snapshots']}  corrompidos: {resultado['snapshots_corrompidos']}")
+    print()
+    print(f"Eleitores com voto confirmado: {resultado['eleitores_com_voto']}")
+    print(f"Votos ausentes no banco: {len(resultado['votos_ausentes'])}")
+    print(f"Votos diferentes do último confirmado: {len(resultado['votos_divergentes'])} "
+          f"({len(resultado['divergentes_apos_falha'])} após falha na última tentativa)")
+    print(f"Votos inesperados: {len(resultado['votos_inesperados'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de estresse da camada de armazenamento (votos.db).")
+    parser.add_argument('--processos', type=int, default=4, help="Processos simultâneos")
+    parser.add_argument('--threads', type=int, default=8, help="Threads gravadoras por processo")
+    parser.add_argument('--eleitores', type=int, default=2000, help="Eleitores distintos")
+    parser.add_argument('--duracao', type=float, default=20, help="Segundos de carga")
+    parser.add_argument('--intervalo-painel', type=float, default=0.5, help="Segundos entre leituras do painel")
+    parser.add_argument('--intervalo-snapshot', type=float, default=2.0, help="Segundos entre snapshots")
+    parser.add_argument('--semente', type=int, default=0, help="Semente aleatória")
+    parser.add_argument('--saida', help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    resultado = executar(args)
+    imprimir_relatorio(resultado)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    falhou = (
+        resultado['votos_ausentes'] or resultado['votos_inesperados']
+        or set(resultado['votos_divergentes']) - set(resultado['divergentes_apos_falha'])
+        or resultado['leituras_divergentes'] or resultado['snapshots_corrompidos']
+    )
+    raise SystemExit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    main()
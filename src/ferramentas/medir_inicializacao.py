@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Mede o tempo de inicialização a frio do app de votação.
+
+Cada medição roda em um interpretador novo (como um app do Streamlit Cloud
+que acabou de acordar) e informa:
+  - tempo de import do streamlit e do módulo src/app.py;
+  - tempo da primeira renderização da tela de login (via AppTest);
+  - tempo da renderização seguinte (já com caches quentes);
+  - quais módulos pesados (pandas, numpy, PIL, dropbox) foram carregados.
+
+Uso (a partir da raiz do repositório):
+    python -m src.ferramentas.medir_inicializacao [--repeticoes 3] [--sem-logo]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[2]
+APP_PATH = RAIZ / 'src' / 'app.py'
+MODULOS_PESADOS = ('pandas', 'numpy', 'PIL', 'dropbox', 'pyarrow')
+
+def _preparar_diretorio(destino, com_logo):
+    """Cria um diretório de trabalho com roster de exemplo (sem Dropbox)."""
+    with open(destino / 'eleitores.csv', 'w', encoding='utf-8') as f:
+        f.write("Email,Nome,id_sbc\n")
+        for i in range(1000):
+            f.write(f"eleitor{i}@exemplo.org,Eleitor {i},{1000 + i}\n")
+    with open(destino / 'candidatos.csv', 'w', encoding='utf-8') as f:
+        f.write("Nome,Instituicao,Regiao\n")
+        for i in range(12):
+            f.write(f"Candidato {i},Universidade {i},Região {i % 5}\n")
+    if com_logo:
+        shutil.copytree(RAIZ / 'logo', destino / 'logo')
+
+def _modulos_carregados():
+    return [nome for nome in MODULOS_PESADOS if nome in sys.modules]
+
+def medir_import():
+    """Mede o import do streamlit e do app (sem executar main())."""
+    import runpy
+
+    inicio = time.perf_counter()
+    import streamlit  # noqa: F401
+    tempo_streamlit = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    runpy.run_path(str(APP_PATH), run_name='app_medicao')
+    tempo_app = time.perf_counter() - inicio
+
+    return {
+        'import_streamlit_s': tempo_streamlit,
+        'import_app_s': tempo_app,
+        'modulos_apos_import': _modulos_carregados(),
+    }
+
+def medir_renderizacao():
+    """Mede a primeira e a segunda renderização da tela de login."""
+    from streamlit.testing.v1 import AppTest
+
+    inicio = time.perf_counter()
+    at = AppTest.from_file(str(APP_PATH), default_timeout=120)
+    at.secrets['EMAIL_ADMIN'] = 'admin'
+    at.secrets['PASSWORD_ADMIN'] = 'admin'
+    at.run()
+    primeira = time.perf_counter() - inicio
+    if at.exception:
+        raise RuntimeError(f"Erro na renderização: {at.exception[0].value}")
+    modulos_login = _modulos_carregados()
+
+    inicio = time.perf_counter()
+    at.run()
+    segunda = time.perf_counter() - inicio
+
+    return {
+        'primeira_renderizacao_s': primeira,
+        'segunda_renderizacao_s': segunda,
+        'modulos_apos_login': modulos_login,
+    }
+
+def _executar_fase(fase, diretorio):
+    """Executa uma fase de medição em um interpretador novo e devolve o JSON produzido."""
+    resultado = subprocess.run(
+        [sys.executable, '-m', 'src.ferramentas.medir_inicializacao', '--fase', fase],
+        cwd=RAIZ,
+        env={**os.environ, 'CEIE_DIRETORIO_MEDICAO': str(diretorio)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+def _resumir(valores):
+    return f"mediana {statistics.median(valores) * 1000:8.1f} ms  (min {min(valores) * 1000:.1f}, max {max(valores) * 1000:.1f})"
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização a frio do app.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Número de processos novos por fase")
+    parser.add_argument('--sem-logo', action='store_true', help="Mede sem a pasta logo/ (sem paleta)")
+    parser.add_argument('--fase', choices=['import', 'render'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.fase:
+        # Processo filho: mede dentro do diretório de trabalho temporário
+        os.chdir(os.environ['CEIE_DIRETORIO_MEDICAO'])
+        medicao = medir_import() if args.fase == 'import' else medir_renderizacao()
+        print(json.dumps(medicao))
+        return
+
+    resultados = {'import': [], 'render': []}
+    for _ in range(args.repeticoes):
+        for fase in resultados:
+            with tempfile.TemporaryDirectory() as diretorio:
+                _preparar_diretorio(Path(diretorio), not args.sem_logo)
+                resultados[fase].append(_executar_fase(fase, diretorio))
+
+    print("=" * 60)
+    print("Tempo de inicialização a frio")
+    print("=" * 60)
+    imports = resultados['import']
+    renders = resultados['render']
+    print(f"import streamlit         {_resumir([r['import_streamlit_s'] for r in imports])}")
+    print(f"import src/app.py        {_resumir([r['import_app_s'] for r in imports])}")
+    print(f"1ª renderização (login)  {_resumir([r['primeira_renderizacao_s'] for r in renders])}")
+    print(f"2ª renderização (login)  {_resumir([r['segunda_renderizacao_s'] for r in renders])}")
+    print()
+    print(f"Módulos pesados após o import: {', '.join(imports[-1]['modulos_apos_import']) or 'nenhum'}")
+    print(f"Módulos pesados após o login:  {', '.join(renders[-1]['modulos_apos_login']) or 'nenhum'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Consolida o arquivo de backups de votações anteriores.
+
+Varre backups/ (gerados por fazer_backup_votacao) e, opcionalmente, uma
+cópia local da pasta de backups do Dropbox, processa cada arquivo em um
+pool de processos e grava um resumo consolidado: uma linha por votação
+(título, status, data, votantes, escolhas) e os votos por candidato.
+
+  - backup_votos_*.db: lido direto do SQLite (somente leitura); candidatos
+    sem voto e o número de eleitores aptos (roster com os ajustes) vêm das
+    tabelas do banco nas eleições adicionais (a principal guarda o roster fora dele);
+  - backup_votos_*.csv: usado só quando não há o .db correspondente
+    (linha TOTAL do CSV de auditoria).
+
+O resultado de cada arquivo fica em cache pelo SHA-256 do conteúdo, então
+uma nova execução só processa arquivos novos ou alterados; cópias idênticas
+(ex.: o mesmo backup local e no Dropbox) aparecem uma única vez.
+
+Uso (a partir da raiz do repositório):
+    python -m src.ferramentas.processar_backups
+    python -m src.ferramentas.processar_backups --espelho-dropbox ~/Dropbox/CEIE\\ Votacao\\ Backups --saida resumo_backups
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from src.ferramentas.recontagem import aplicar_ajustes_eleitores, candidatos_do_banco, eleitores_do_banco
+
+DIRETORIO_BACKUPS = Path('backups')
+ARQUIVO_CACHE = '.cache_resumo_backups.json'
+VERSAO_CACHE = 2  # Mudar quando o formato do resultado por arquivo mudar
+PADRAO_DATA = re.compile(r'(\d{8}_\d{6})')
+SEPARADOR = ", "  # Separador das escolhas na coluna votos.escolhas
+
+def sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _data_do_nome(caminho):
+    encontrado = PADRAO_DATA.search(Path(caminho).name)
+    if not encontrado:
+        return None
+    return datetime.strptime(encontrado.group(1), "%Y%m%d_%H%M%S").isoformat()
+
+def processar_banco(caminho):
+    """
+    Resume um backup .db: configuração da votação e votos por candidato.
+
+    Returns:
+        dict: Resumo da votação
+    """
+    conn = sqlite3.connect(f"{Path(caminho).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        config = dict(conn.execute("SELECT chave, valor FROM config").fetchall())
+        votos = Counter(dict.fromkeys(candidatos_do_banco(conn), 0))
+        eleitores = eleitores_do_banco(conn)
+        aptos = len(aplicar_ajustes_eleitores(conn, eleitores)) if eleitores else None
+        votantes = 0
+        primeiro = ultimo = None
+        for escolhas, timestamp in conn.execute("SELECT escolhas, timestamp FROM votos"):
+            votantes += 1
+            if escolhas:
+                votos.update(escolhas.split(SEPARADOR))
+            if timestamp:
+                primeiro = timestamp if primeiro is None else min(primeiro, timestamp)
+                ultimo = timestamp if ultimo is None else max(ultimo, timestamp)
+    finally:
+        conn.close()
+    return {
+        'tipo': 'db',
+        'titulo': config.get('titulo_votacao', ''),
+        'status': config.get('status', ''),
+        'max_selections': config.get('max_selections', ''),
+        'eleitores_aptos': aptos if aptos is not None else '',
+        'votantes': votantes,
+        'comparecimento': round(votantes / aptos * 100, 2) if aptos else '',
+        'primeiro_voto': primeiro,
+        'ultimo_voto': ultimo,
+        'votos': dict(votos),
+    }
+
+def processar_csv(caminho):
+    """
+    Resume um backup .csv de auditoria (colunas por nome de candidato e linha TOTAL).
+
+    Returns:
+        dict: Resumo da votação (sem título/status, que só existem no .db)
+    """
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        leitor = csv.DictReader(f)
+        candidatos = [c for c in (leitor.fieldnames or []) if c not in ('user_id', 'timestamp', 'Total_Votos_Eleitor')]
+        votantes = 0
+        total = {}
+        timestamps = []
+        for linha in leitor:
+            if linha.get('user_id') == 'TOTAL':
+                total = {c: int(float(linha[c] or 0)) for c in candidatos}
+            else:
+                votantes += 1
+                if linha.get('timestamp'):
+                    timestamps.append(linha['timestamp'])
+    return {
+        'tipo': 'csv',
+        'titulo': '',
+        'status': '',
+        'max_selections': '',
+        'eleitores_aptos': '',
+        'votantes': votantes,
+        'comparecimento': '',
+        'primeiro_voto': min(timestamps) if timestamps else None,
+        'ultimo_voto': max(timestamps) if timestamps else None,
+        'votos': total,
+    }
+
+def processar_arquivo(caminho):
+    """Executado no pool: resume um arquivo de backup (erros viram parte do resultado)."""
+    try:
+        resumo = processar_banco(caminho) if caminho.endswith('.db') else processar_csv(caminho)
+    except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+        resumo = {'tipo': Path(caminho).suffix[1:], 'erro': str(e)}
+    return resumo
+
+def listar_arquivos(diretorios):
+    """
+    Backups .db e .csv dos diretórios; o .csv é ignorado se houver o .db do mesmo backup.
+
+    Returns:
+        list: Caminhos (str) em ordem
+    """
+    arquivos = []
+    for diretorio in diretorios:
+        bancos = sorted(Path(diretorio).glob('backup_votos_*.db'))
+        arquivos += bancos
+        com_banco = {banco.stem for banco in bancos}
+        arquivos += [c for c in sorted(Path(diretorio).glob('backup_votos_*.csv')) if c.stem not in com_banco]
+    return [str(caminho) for caminho in arquivos]
+
+def ler_cache(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {'versao': VERSAO_CACHE, 'arquivos': {}, 'resultados': {}}
+    if cache.get('versao') != VERSAO_CACHE:
+        return {'versao': VERSAO_CACHE, 'arquivos': {}, 'resultados': {}}
+    return cache
+
+def gravar_cache(cache, caminho):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def hashes_dos_arquivos(arquivos, cache):
+    """
+    SHA-256 de cada arquivo, reaproveitando o cache quando tamanho e mtime não mudaram.
+
+    Returns:
+        dict: Caminho -> SHA-256
+    """
+    hashes = {}
+    for caminho in arquivos:
+        stat = os.stat(caminho)
+        assinatura = [stat.st_size, stat.st_mtime_ns]
+        anterior = cache['arquivos'].get(caminho)
+        if anterior and anterior['assinatura'] == assinatura:
+            hashes[caminho] = anterior['sha256']
+        else:
+            hashes[caminho] = sha256_arquivo(caminho)
+            cache['arquivos'][caminho] = {'assinatura': assinatura, 'sha256': hashes[caminho]}
+    return hashes
+
+def consolidar(arquivos, hashes, resultados):
+    """
+    Junta os resultados por conteúdo (cópias idênticas contam uma vez).
+
+    Returns:
+        tuple: (linhas por votação, linhas por votação × candidato)
+    """
+    votacoes, candidatos = [], []
+    vistos = set()
+    for caminho in arquivos:
+        sha256 = hashes[caminho]
+        if sha256 in vistos:
+            continue
+        vistos.add(sha256)
+        resumo = resultados[sha256]
+        data = _data_do_nome(caminho)
+        votacoes.append({
+            'data_backup': data,
+            'arquivo': caminho,
+            'sha256': sha256,
+            **{chave: valor for chave, valor in resumo.items() if chave != 'votos'},
+            'escolhas': sum(resumo.get('votos', {}).values()),
+        })
+        for candidato, n in sorted(resumo.get('votos', {}).items(), key=lambda item: (-item[1], item[0])):
+            candidatos.append({
+                'data_backup': data,
+                'titulo': resumo.get('titulo', ''),
+                'sha256': sha256,
+                'candidato': candidato,
+                'votos': n,
+                'percentual_votantes': round(n / resumo['votantes'] * 100, 2) if resumo.get('votantes') else 0.0,
+            })
+    votacoes.sort(key=lambda v: v['data_backup'] or '')
+    candidatos.sort(key=lambda c: c['data_backup'] or '')  # Estável: mantém a ordem por votos
+    return votacoes, candidatos
+
+def _gravar_csv(caminho, linhas):
+    if not linhas:
+        Path(caminho).write_text('', encoding='utf-8')
+        return
+    colunas = list(dict.fromkeys(chave for linha in linhas for chave in linha))
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=colunas)
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolida os backups de votações anteriores.")
+    parser.add_argument('--backups', type=Path, default=DIRETORIO_BACKUPS, help="Pasta de backups local")
+    parser.add_argument('--espelho-dropbox', type=Path, action='append', default=[],
+                        help="Cópia local da pasta de backups do Dropbox (pode repetir)")
+    parser.add_argument('--processos', type=int, default=None, help="Processos do pool (padrão: nº de CPUs)")
+    parser.add_argument('--cache', type=Path, help=f"Arquivo de cache (padrão: <backups>/{ARQUIVO_CACHE})")
+    parser.add_argument('--saida', type=Path, default=Path('resumo_backups'),
+                        help="Prefixo dos arquivos gerados (.json, _votacoes.csv, _candidatos.csv)")
+    args = parser.parse_args()
+
+    diretorios = [d for d in [args.backups, *args.espelho_dropbox] if d.is_dir()]
+    if not diretorios:
+        raise SystemExit("Nenhuma pasta de backups encontrada.")
+    caminho_cache = args.cache or args.backups / ARQUIVO_CACHE
+
+    arquivos = listar_arquivos(diretorios)
+    cache = ler_cache(caminho_cache)
+    hashes = hashes_dos_arquivos(arquivos, cache)
+
+    # Um arquivo por conteúdo novo; o restante vem do cache
+    pendentes = {}
+    for caminho in arquivos:
+        if hashes[caminho] not in cache['resultados']:
+            pendentes.setdefault(hashes[caminho], caminho)
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=args.processos) as executor:
+            for sha256, resumo in zip(pendentes, executor.map(processar_arquivo, pendentes.values())):
+                cache['resultados'][sha256] = resumo
+    gravar_cache(cache, caminho_cache)
+
+    votacoes, candidatos = consolidar(arquivos, hashes, cache['resultados'])
+    with open(args.saida.with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump({'votacoes': votacoes, 'candidatos': candidatos}, f, ensure_ascii=False, indent=2)
+    _gravar_csv(f"{args.saida}_votacoes.csv", votacoes)
+    _gravar_csv(f"{args.saida}_candidatos.csv", candidatos)
+
+    print(f"Arquivos encontrados: {len(arquivos)}  processados agora: {len(pendentes)}  "
+          f"do cache: {len(arquivos) - sum(1 for c in arquivos if hashes[c] in pendentes)}")
+    print(f"Votações distintas: {len(votacoes)}")
+    print()
+    print(f"{'Data do backup':<21}{'Aptos':>10}{'Votantes':>10}{'Escolhas':>10}  Título")
+    for votacao in votacoes:
+        if 'erro' in votacao:
+            print(f"{votacao['data_backup'] or '-':<21}{'erro':>10}{'':>20}  {votacao['arquivo']}: {votacao['erro']}")
+            continue
+        print(f"{votacao['data_backup'] or '-':<21}{votacao['eleitores_aptos'] or '-':>10}"
+              f"{votacao['votantes']:>10}{votacao['escolhas']:>10}  "
+              f"{votacao['titulo'] or '(sem título)'}")
+    print()
+    print(f"Resumo gravado em {args.saida.with_suffix('.json')}, {args.saida}_votacoes.csv e {args.saida}_candidatos.csv")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Recontagem independente dos votos, para auditoria.
+
+Não importa o src/app.py: lê as cédulas direto de um votos.db (ou de um
+backup .db) em lotes, converte cada escolha em um código inteiro de
+candidato e soma com np.bincount. Também confere se:
+  - nenhuma cédula passa do max_selections gravado na tabela config;
+  - toda escolha é um candidato da eleição;
+  - nenhuma cédula repete o mesmo candidato;
+  - nenhum eleitor tem mais de uma cédula (user_ids que só diferem na
+    grafia do e-mail, como maiúsculas ou espaços, são o mesmo eleitor);
+  - todo eleitor que votou está no roster de eleitores (quando há roster).
+
+Candidatos e eleitores vêm do CSV informado (--candidatos, --eleitores) ou,
+sem ele, das tabelas candidatos/eleitores do próprio banco (eleições
+adicionais) e, se vazias, de candidatos.csv/eleitores.csv na pasta atual
+(eleição principal). Os ajustes do roster gravados no banco
+(ajustes_eleitores) são aplicados sobre os eleitores, qualquer que seja a fonte.
+
+O resumo (JSON) traz o SHA-256 do banco e dos CSVs usados e é
+assinado com HMAC-SHA256 quando uma chave é informada (--chave ou variável
+CEIE_CHAVE_RECONTAGEM); sem chave, leva apenas o SHA-256 do próprio resumo.
+Os totais podem ser comparados com o resultado congelado gravado no banco
+ao encerrar a votação e com a linha TOTAL do CSV de auditoria.
+
+Uso (a partir da raiz do repositório):
+    python -m src.ferramentas.recontagem votos.db --candidatos candidatos.csv
+    python -m src.ferramentas.recontagem eleicoes/conselho-fiscal.db
+    python -m src.ferramentas.recontagem backups/backup_votos_20250101_120000.db \\
+        --candidatos candidatos.csv --comparar-csv auditoria_votos_ceie.csv --saida recontagem.json
+"""
+
+import argparse
+import csv
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import sys
+import time
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+
+TAMANHO_LOTE = 200_000  # Cédulas lidas por vez
+MAX_EXEMPLOS = 20  # Cédulas problemáticas listadas por tipo de erro
+SEPARADOR = ", "  # Separador das escolhas na coluna votos.escolhas
+CANDIDATOS_PADRAO = 'candidatos.csv'  # Roster da eleição principal, fora do banco
+ELEITORES_PADRAO = 'eleitores.csv'
+
+def _sha256_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def ler_candidatos(caminho):
+    """
+    Lê o CSV de candidatos (Nome,Instituicao,Regiao) e monta os rótulos da cédula.
+
+    Returns:
+        list: Rótulos "Nome (Instituição - Região)"; a posição é o código do candidato
+    """
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        leitor = csv.DictReader(f)
+        faltando = {'Nome', 'Instituicao', 'Regiao'} - set(leitor.fieldnames or [])
+        if faltando:
+            raise ValueError(f"Colunas ausentes no CSV de candidatos: {', '.join(sorted(faltando))}")
+        return [
+            f"{linha['Nome']} ({linha['Instituicao']} - {linha['Regiao']})"
+            for linha in leitor
+            if any((valor or '').strip() for valor in linha.values())
+        ]
+
+def ler_eleitores(caminho):
+    """
+    Lê o CSV de eleitores (Email,Nome,id_sbc).
+
+    Returns:
+        set: E-mails normalizados (minúsculos, sem espaços nas pontas)
+    """
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        leitor = csv.DictReader(f)
+        if 'Email' not in (leitor.fieldnames or []):
+            raise ValueError("Coluna ausente no CSV de eleitores: Email")
+        return {linha['Email'].strip().lower() for linha in leitor if (linha['Email'] or '').strip()}
+
+def _abrir_somente_leitura(caminho_db):
+    return sqlite3.connect(f"{Path(caminho_db).resolve().as_uri()}?mode=ro", uri=True)
+
+def _linhas_tabela(conn, tabela, colunas):
+    """Linhas da tabela de roster do banco; vazia na eleição principal e em bancos antigos, sem a tabela."""
+    try:
+        return conn.execute(f"SELECT {', '.join(colunas)} FROM {tabela} ORDER BY rowid").fetchall()
+    except sqlite3.OperationalError:
+        return []
+
+def candidatos_do_banco(conn):
+    """Rótulos da cédula a partir da tabela candidatos do banco ([] se vazia)."""
+    return [
+        f"{nome} ({instituicao} - {regiao})"
+        for nome, instituicao, regiao in _linhas_tabela(conn, 'candidatos', ('Nome', 'Instituicao', 'Regiao'))
+    ]
+
+def eleitores_do_banco(conn):
+    """E-mails do roster na tabela eleitores do banco (set vazio se não houver)."""
+    return {email.strip().lower() for (email,) in _linhas_tabela(conn, 'eleitores', ('Email',)) if email}
+
+def aplicar_ajustes_eleitores(conn, eleitores):
+    """
+    Aplica ao roster os ajustes gravados pelo app (inclusões, alterações e
+    remoções), na ordem em que foram feitos.
+
+    Returns:
+        set: E-mails do roster com os ajustes
+    """
+    eleitores = set(eleitores)
+    try:
+        ajustes = conn.execute("SELECT email, removido FROM ajustes_eleitores ORDER BY seq").fetchall()
+    except sqlite3.OperationalError:
+        # Banco de uma versão do app anterior aos ajustes do roster
+        return eleitores
+    for email, removido in ajustes:
+        if removido:
+            eleitores.discard(email)
+        else:
+            eleitores.add(email)
+    return eleitores
+
+def carregar_candidatos(caminho_db, caminho_csv=None):
+    """
+    Candidatos da eleição: o CSV informado ou, sem ele, a tabela candidatos
+    do banco e, se vazia, CANDIDATOS_PADRAO.
+
+    Returns:
+        tuple: (rótulos, fonte), fonte = caminho do CSV ou None se vieram do banco
+    """
+    if caminho_csv is None:
+        conn = _abrir_somente_leitura(caminho_db)
+        try:
+            candidatos = candidatos_do_banco(conn)
+        finally:
+            conn.close()
+        if candidatos:
+            return candidatos, None
+        caminho_csv = CANDIDATOS_PADRAO
+    return ler_candidatos(caminho_csv), caminho_csv
+
+def carregar_eleitores(caminho_db, caminho_csv=None):
+    """
+    Roster de eleitores com os ajustes do banco: o CSV informado ou, sem ele,
+    a tabela eleitores do banco e, se vazia, ELEITORES_PADRAO (se existir).
+
+    Returns:
+        tuple: (e-mails ou None se não houver roster, fonte), fonte = caminho do CSV ou None
+    """
+    conn = _abrir_somente_leitura(caminho_db)
+    try:
+        eleitores = set() if caminho_csv is not None else eleitores_do_banco(conn)
+        if not eleitores:
+            if caminho_csv is None and not os.path.exists(ELEITORES_PADRAO):
+                return None, None
+            caminho_csv = caminho_csv or ELEITORES_PADRAO
+            eleitores = ler_eleitores(caminho_csv)
+        return aplicar_ajustes_eleitores(conn, eleitores), caminho_csv
+    finally:
+        conn.close()
+
+def ler_max_selections(conn):
+    linha = conn.execute("SELECT valor FROM config WHERE chave='max_selections'").fetchone()
+    return int(linha[0]) if linha and linha[0] else None
+
+def recontar(caminho_db, candidatos, max_selecoes=None, tamanho_lote=TAMANHO_LOTE, eleitores=None):
+    """
+    Reconta as cédulas de um banco.
+
+    Args:
+        caminho_db: votos.db ou backup .db
+        candidatos: Rótulos válidos (a posição é o código)
+        max_selecoes: Limite por cédula; None usa o max_selections da tabela config
+        tamanho_lote: Cédulas lidas por vez
+        eleitores: E-mails do roster; None não confere quem votou
+
+    Returns:
+        dict: Totais por candidato e resultado das verificações
+    """
+    codigos = {rotulo: i for i, rotulo in enumerate(candidatos)}
+    num_candidatos = len(candidatos)
+    totais = np.zeros(num_candidatos, dtype=np.int64)
+    cedulas = escolhas_validas = vazias = 0
+    excedentes, invalidas, repetidas = [], [], []
+    num_excedentes = num_invalidas = num_repetidas = 0
+    fora_do_roster, num_fora_do_roster = [], 0
+    # E-mail normalizado -> quantas cédulas; o app grava uma por eleitor
+    cedulas_por_eleitor = {}
+
+    conn = _abrir_somente_leitura(caminho_db)
+    try:
+        if max_selecoes is None:
+            max_selecoes = ler_max_selections(conn)
+        cursor = conn.execute("SELECT user_id, escolhas FROM votos ORDER BY rowid")
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            eleitores_lote = [user_id for user_id, _ in lote]
+            normalizados = [user_id.strip().lower() for user_id in eleitores_lote]
+            for eleitor in normalizados:
+                cedulas_por_eleitor[eleitor] = cedulas_por_eleitor.get(eleitor, 0) + 1
+            partes = [escolhas.split(SEPARADOR) if escolhas else [] for _, escolhas in lote]
+            tamanhos = np.fromiter(map(len, partes), dtype=np.int64, count=len(partes))
+            total_escolhas = int(tamanhos.sum())
+            codigos_lote = np.fromiter(
+                (codigos.get(escolha, -1) for escolha in chain.from_iterable(partes)),
+                dtype=np.int64, count=total_escolhas,
+            )
+            cedula_de = np.repeat(np.arange(len(lote)), tamanhos)
+
+            cedulas += len(lote)
+            vazias += int((tamanhos == 0).sum())
+
+            if max_selecoes is not None:
+                acima = np.flatnonzero(tamanhos > max_selecoes)
+                num_excedentes += len(acima)
+                excedentes += [eleitores_lote[i] for i in acima[:MAX_EXEMPLOS - len(excedentes)]]
+
+            validas = codigos_lote >= 0
+            com_invalida = np.unique(cedula_de[~validas])
+            num_invalidas += len(com_invalida)
+            invalidas += [eleitores_lote[i] for i in com_invalida[:MAX_EXEMPLOS - len(invalidas)]]
+
+            # Mesmo candidato duas vezes na cédula: pares (cédula, código) repetidos
+            pares = cedula_de[validas] * num_candidatos + codigos_lote[validas]
+            unicos, ocorrencias = np.unique(pares, return_counts=True)
+            com_repeticao = np.unique(unicos[ocorrencias > 1] // max(num_candidatos, 1))
+            num_repetidas += len(com_repeticao)
+            repetidas += [eleitores_lote[i] for i in com_repeticao[:MAX_EXEMPLOS - len(repetidas)]]
+
+            if eleitores is not None:
+                fora = [original for original, eleitor in zip(eleitores_lote, normalizados) if eleitor not in eleitores]
+                num_fora_do_roster += len(fora)
+                fora_do_roster += fora[:MAX_EXEMPLOS - len(fora_do_roster)]
+
+            totais += np.bincount(codigos_lote[validas], minlength=num_candidatos)
+            escolhas_validas += int(validas.sum())
+    finally:
+        conn.close()
+
+    eleitores_repetidos = [eleitor for eleitor, n in cedulas_por_eleitor.items() if n > 1]
+    verificacoes = {
+        'acima_do_limite': {'quantidade': num_excedentes, 'exemplos': excedentes},
+        'candidato_invalido': {'quantidade': num_invalidas, 'exemplos': invalidas},
+        'candidato_repetido': {'quantidade': num_repetidas, 'exemplos': repetidas},
+        'eleitor_repetido': {'quantidade': len(eleitores_repetidos), 'exemplos': eleitores_repetidos[:MAX_EXEMPLOS]},
+    }
+    if eleitores is not None:
+        verificacoes['eleitor_fora_do_roster'] = {'quantidade': num_fora_do_roster, 'exemplos': fora_do_roster}
+    return {
+        'cedulas': cedulas,
+        'cedulas_vazias': vazias,
+        'escolhas_validas': escolhas_validas,
+        'max_selections': max_selecoes,
+        'totais': {rotulo: int(n) for rotulo, n in zip(candidatos, totais)},
+        'verificacoes': verificacoes,
+    }
+
+def ler_resultado_congelado(caminho_db):
+    """Contagem do resultado final gravado pelo app ao encerrar a votação (ou None)."""
+    conn = _abrir_somente_leitura(caminho_db)
+    try:
+        linha = conn.execute("SELECT dados FROM resultado_final WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        # Banco de uma versão do app anterior ao resultado congelado
+        return None
+    finally:
+        conn.close()
+    return json.loads(linha[0])['contagem'] if linha else None
+
+def ler_total_csv_auditoria(caminho_csv):
+    """
+    Lê a linha TOTAL do CSV de auditoria (colunas por nome do candidato).
+
+    Returns:
+        dict: Nome do candidato -> total
+    """
+    with open(caminho_csv, newline='', encoding='utf-8-sig') as f:
+        for linha in csv.DictReader(f):
+            if linha.get('user_id') == 'TOTAL':
+                return {
+                    coluna: int(float(valor))
+                    for coluna, valor in linha.items()
+                    if coluna not in ('user_id', 'timestamp', 'Total_Votos_Eleitor') and valor not in (None, '')
+                }
+    raise ValueError("Linha TOTAL não encontrada no CSV de auditoria.")
+
+def _nome_candidato(rotulo):
+    return rotulo.split('(')[0].strip() if '(' in rotulo else rotulo.strip()
+
+def comparar_totais(totais, referencia, por_nome=False):
+    """
+    Diferenças entre a recontagem e outra apuração.
+
+    Args:
+        totais: Rótulo -> votos (recontagem)
+        referencia: Rótulo (ou nome, se por_nome) -> votos
+        por_nome: Compara pelo nome do candidato, como nas colunas do CSV de auditoria
+
+    Returns:
+        dict: Chave -> {'recontagem': n, 'referencia': m} apenas onde diferem
+    """
+    if por_nome:
+        agrupados = {}
+        for rotulo, n in totais.items():
+            nome = _nome_candidato(rotulo)
+            agrupados[nome] = agrupados.get(nome, 0) + n
+        totais = agrupados
+    return {
+        chave: {'recontagem': totais.get(chave, 0), 'referencia': referencia.get(chave, 0)}
+        for chave in sorted(set(totais) | set(referencia))
+        if totais.get(chave, 0) != referencia.get(chave, 0)
+    }
+
+def assinar(resumo, chave=None):
+    """
+    Acrescenta ao resumo o SHA-256 do seu conteúdo canônico e, com chave, um HMAC-SHA256.
+
+    Returns:
+        dict: Resumo com 'resumo_sha256' (e 'assinatura_hmac_sha256')
+    """
+    canonico = json.dumps(resumo, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    assinado = dict(resumo, resumo_sha256=hashlib.sha256(canonico).hexdigest())
+    if chave:
+        assinado['assinatura_hmac_sha256'] = hmac.new(chave.encode('utf-8'), canonico, hashlib.sha256).hexdigest()
+    return assinado
+
+def imprimir_resumo(resumo):
+    print("=" * 64)
+    print("Recontagem independente - votação CEIE")
+    print("=" * 64)
+    print(f"Banco: {resumo['banco']}  (SHA-256 {resumo['banco_sha256'][:16]}...)")
+    print(f"Candidatos: {resumo['candidatos']}  Eleitores: {resumo['eleitores'] or 'sem roster (não conferidos)'}")
+    print(f"Cédulas: {resumo['cedulas']}  Escolhas válidas: {resumo['escolhas_validas']}  "
+          f"Vazias: {resumo['cedulas_vazias']}  max_selections: {resumo['max_selections']}")
+    print(f"Tempo de recontagem: {resumo['duracao_s']} s")
+    print()
+    for rotulo, n in sorted(resumo['totais'].items(), key=lambda item: (-item[1], item[0])):
+        print(f"{n:>10}  {rotulo}")
+    print()
+    for nome, verificacao in resumo['verificacoes'].items():
+        unidade = "eleitor(es)" if nome == 'eleitor_repetido' else "cédula(s)"
+        situacao = "OK" if verificacao['quantidade'] == 0 else f"{verificacao['quantidade']} {unidade}"
+        print(f"{nome:<24}{situacao}")
+        for eleitor in verificacao['exemplos']:
+            print(f"{'':<24}{eleitor}")
+    for nome, diferencas in resumo.get('comparacoes', {}).items():
+        print(f"Comparação com {nome}: {'confere' if not diferencas else f'{len(diferencas)} divergência(s)'}")
+        for chave, valores in diferencas.items():
+            print(f"{'':<24}{chave}: recontagem {valores['recontagem']}, referência {valores['referencia']}")
+    print()
+    print(f"SHA-256 do resumo: {resumo['resumo_sha256']}")
+    if 'assinatura_hmac_sha256' in resumo:
+        print(f"Assinatura HMAC-SHA256: {resumo['assinatura_hmac_sha256']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recontagem independente dos votos (auditoria).")
+    parser.add_argument('banco', help="votos.db ou backup .db")
+    parser.add_argument('--candidatos', help=f"CSV de candidatos (padrão: tabela do banco ou {CANDIDATOS_PADRAO})")
+    parser.add_argument('--eleitores', help=f"CSV de eleitores (padrão: tabela do banco ou {ELEITORES_PADRAO}, se houver)")
+    parser.add_argument('--max-selecoes', type=int, help="Limite por cédula (padrão: max_selections do banco)")
+    parser.add_argument('--comparar-csv', help="CSV de auditoria cuja linha TOTAL será comparada")
+    parser.add_argument('--chave', default=os.environ.get('CEIE_CHAVE_RECONTAGEM'),
+                        help="Chave do HMAC do resumo (padrão: $CEIE_CHAVE_RECONTAGEM)")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Cédulas lidas por vez")
+    parser.add_argument('--saida', help="Grava o resumo assinado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.banco):
+        sys.exit(f"Banco '{args.banco}' não encontrado.")
+    for nome, caminho in (('candidatos', args.candidatos), ('eleitores', args.eleitores)):
+        if caminho is not None and not os.path.exists(caminho):
+            sys.exit(f"CSV de {nome} '{caminho}' não encontrado.")
+
+    try:
+        candidatos, arquivo_candidatos = carregar_candidatos(args.banco, args.candidatos)
+    except FileNotFoundError:
+        sys.exit(f"O banco não tem candidatos e '{CANDIDATOS_PADRAO}' não foi encontrado; informe --candidatos.")
+    eleitores, arquivo_eleitores = carregar_eleitores(args.banco, args.eleitores)
+    inicio = time.perf_counter()
+    resultado = recontar(args.banco, candidatos, args.max_selecoes, args.lote, eleitores)
+    duracao = time.perf_counter() - inicio
+
+    comparacoes = {}
+    congelado = ler_resultado_congelado(args.banco)
+    if congelado is not None:
+        comparacoes['resultado congelado do app'] = comparar_totais(resultado['totais'], congelado)
+    if args.comparar_csv:
+        comparacoes['linha TOTAL do CSV de auditoria'] = comparar_totais(
+            resultado['totais'], ler_total_csv_auditoria(args.comparar_csv), por_nome=True
+        )
+
+    resumo = assinar({
+        'gerado_em': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'banco': os.path.basename(args.banco),
+        'banco_sha256': _sha256_arquivo(args.banco),
+        # Sem CSV, os rosters vieram do banco, já coberto por banco_sha256
+        'candidatos': arquivo_candidatos or 'banco',
+        'candidatos_sha256': _sha256_arquivo(arquivo_candidatos) if arquivo_candidatos else None,
+        'eleitores': (arquivo_eleitores or 'banco') if eleitores is not None else None,
+        'eleitores_sha256': _sha256_arquivo(arquivo_eleitores) if arquivo_eleitores else None,
+        'duracao_s': round(duracao, 3),
+        **resultado,
+        'comparacoes': comparacoes,
+    }, args.chave)
+
+    imprimir_resumo(resumo)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+
+    problemas = any(v['quantidade'] for v in resumo['verificacoes'].values()) or any(comparacoes.values())
+    raise SystemExit(1 if problemas else 0)
+
+if __name__ == "__main__":
+    main()
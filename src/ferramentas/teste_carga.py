@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Teste de carga ponta a ponta do app de votação.
+
+Executa o main() real (src/app.py) em sessões headless do Streamlit
+(streamlit.testing.v1.AppTest), simulando eleitores concorrentes que fazem
+login -> seleção de até MAX_SELECTIONS candidatos -> confirmação, enquanto
+administradores atualizam o painel. Roda offline: o roster e os candidatos
+são gerados em um diretório temporário e o Dropbox fica desligado (sem token).
+
+Ao final informa a vazão, latências p50/p99 por etapa e confere no banco se
+algum voto confirmado foi perdido, alterado ou apareceu sem ter sido enviado.
+Termina com código 1 se houver voto nessas condições ou erro em alguma sessão.
+
+Uso (a partir da raiz do repositório):
+    python -m src.ferramentas.teste_carga --eleitores 200 --concorrencia 20 --admins 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[2]
+APP_PATH = RAIZ / 'src' / 'app.py'
+EMAIL_ADMIN = 'admin@carga.local'
+SENHA_ADMIN = 'carga'
+
+def gerar_roster(diretorio, num_eleitores, num_candidatos):
+    """
+    Gera eleitores.csv e candidatos.csv sintéticos.
+
+    Returns:
+        list: Tuplas (email, id_sbc) dos eleitores
+    """
+    eleitores = [(f"eleitor{i}@carga.local", str(100000 + i)) for i in range(num_eleitores)]
+    with open(diretorio / 'eleitores.csv', 'w', encoding='utf-8') as f:
+        f.write("Email,Nome,id_sbc\n")
+        for i, (email, id_sbc) in enumerate(eleitores):
+            f.write(f"{email},Eleitor {i},{id_sbc}\n")
+    with open(diretorio / 'candidatos.csv', 'w', encoding='utf-8') as f:
+        f.write("Nome,Instituicao,Regiao\n")
+        for i in range(num_candidatos):
+            f.write(f"Candidato {i:03d},Universidade {i % 7},Região {i % 5}\n")
+    return eleitores
+
+class Medidor:
+    """Guarda as latências de cada etapa de uma sessão."""
+
+    def __init__(self):
+        self.latencias = {}
+        self.erros = []
+
+    def medir(self, etapa, funcao):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        self.latencias.setdefault(etapa, []).append(time.perf_counter() - inicio)
+        return resultado
+
+    def erro(self, mensagem):
+        self.erros.append(mensagem)
+
+    def juntar(self, latencias, erros):
+        for etapa, valores in latencias.items():
+            self.latencias.setdefault(etapa, []).extend(valores)
+        self.erros.extend(erros)
+
+def _nova_sessao(max_selecoes):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=120)
+    at.secrets['EMAIL_ADMIN'] = EMAIL_ADMIN
+    at.secrets['PASSWORD_ADMIN'] = SENHA_ADMIN
+    at.secrets['MAX_SELECTIONS'] = max_selecoes
+    at.secrets['METRICAS'] = {'ARQUIVO': ''}
+    # Todas as sessões do AppTest têm o mesmo id: sem isso o limite de login por sessão barraria a carga
+    at.secrets['LIMITE_LOGIN'] = {'RAJADA': 1_000_000}
+    return at
+
+def _inicializar_processo(diretorio, max_selecoes):
+    """
+    Prepara um processo trabalhador.
+
+    AppTest não suporta várias sessões simultâneas no mesmo processo, então
+    cada cliente simulado roda em um processo próprio, todos apontando para o
+    mesmo diretório (e portanto para o mesmo votos.db). A primeira sessão paga
+    o aquecimento do processo fora da medição.
+    """
+    os.chdir(diretorio)
+    _nova_sessao(max_selecoes).run()
+
+def _login(at, email, senha):
+    at.text_input[0].input(email)
+    at.text_input[1].input(senha)
+    return at.button[0].click().run()
+
+def simular_eleitor(email, id_sbc, indices, max_selecoes):
+    """
+    Percorre o fluxo completo de um eleitor.
+
+    Args:
+        email: E-mail do eleitor
+        id_sbc: Senha (ID SBC) do eleitor
+        indices: Posições dos candidatos a marcar na cédula
+        max_selecoes: MAX_SELECTIONS da votação
+
+    Returns:
+        tuple: (candidatos confirmados ou None, latências por etapa, erros)
+    """
+    medidor = Medidor()
+    try:
+        at = _nova_sessao(max_selecoes)
+        medidor.medir('abrir', at.run)
+        medidor.medir('login', lambda: _login(at, email, id_sbc))
+        if at.exception or not at.checkbox:
+            medidor.erro(f"{email}: login falhou")
+            return None, medidor.latencias, medidor.erros
+
+        for indice in indices:
+            medidor.medir('selecionar', lambda: at.checkbox[indice].check().run())
+        escolhidos = sorted(at.checkbox[i].label for i in indices)
+
+        confirmar = [botao for botao in at.button if 'Confirmar' in botao.label]
+        if not confirmar:
+            medidor.erro(f"{email}: botão de confirmação ausente")
+            return None, medidor.latencias, medidor.erros
+        medidor.medir('confirmar', lambda: confirmar[0].click().run())
+        if at.exception:
+            medidor.erro(f"{email}: confirmação falhou: {at.exception[0].value}")
+            return None, medidor.latencias, medidor.erros
+        if not any('Voto registrado' in s.value for s in at.success):
+            medidor.erro(f"{email}: confirmação sem sucesso")
+            return None, medidor.latencias, medidor.erros
+        return escolhidos, medidor.latencias, medidor.erros
+    except Exception as e:
+        medidor.erro(f"{email}: {e}")
+        return None, medidor.latencias, medidor.erros
+
+def simular_admin(diretorio, parar, intervalo, max_selecoes, fila):
+    """Mantém uma sessão de admin atualizando o painel até o fim do teste."""
+    medidor = Medidor()
+    try:
+        _inicializar_processo(diretorio, max_selecoes)
+        at = _nova_sessao(max_selecoes)
+        at.run()
+        medidor.medir('login_admin', lambda: _login(at, EMAIL_ADMIN, SENHA_ADMIN))
+        while not parar.is_set():
+            medidor.medir('painel_admin', at.run)
+            if at.exception:
+                medidor.erro(f"admin: {at.exception[0].value}")
+                break
+            parar.wait(intervalo)
+    except Exception as e:
+        medidor.erro(f"admin: {e}")
+    fila.put((medidor.latencias, medidor.erros))
+
+def conferir_votos(caminho_db, esperados):
+    """
+    Compara os votos confirmados com o conteúdo final do banco.
+
+    Returns:
+        dict: Listas de e-mails perdidos, divergentes e inesperados
+    """
+    conn = sqlite3.connect(caminho_db)
+    gravados = {
+        user_id: sorted(escolhas.split(", "))
+        for user_id, escolhas in conn.execute("SELECT user_id, escolhas FROM votos")
+    }
+    conn.close()
+    return {
+        'perdidos': sorted(email for email in esperados if email not in gravados),
+        'divergentes': sorted(
+            email for email, escolhas in esperados.items()
+            if email in gravados and gravados[email] != escolhas
+        ),
+        'inesperados': sorted(email for email in gravados if email not in esperados),
+    }
+
+def _percentis(valores):
+    ordenados = sorted(valores)
+    def p(q):
+        return ordenados[max(0, -(-q * len(ordenados) // 100) - 1)] * 1000
+    return {
+        'n': len(ordenados),
+        'p50_ms': round(p(50), 1),
+        'p99_ms': round(p(99), 1),
+        'media_ms': round(statistics.fmean(ordenados) * 1000, 1),
+    }
+
+def executar(args):
+    contexto = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='ceie_carga_') as diretorio:
+        diretorio = Path(diretorio)
+        eleitores = gerar_roster(diretorio, args.eleitores, args.candidatos)
+        cedulas = {
+            email: sorted(random.sample(range(args.candidatos), random.randint(1, args.max_selecoes)))
+            for email, _ in eleitores
+        }
+        medidor = Medidor()
+
+        parar = contexto.Event()
+        fila_admins = contexto.Queue()
+        admins = [
+            contexto.Process(
+                target=simular_admin,
+                args=(str(diretorio), parar, args.intervalo_admin, args.max_selecoes, fila_admins)
+            )
+            for _ in range(args.admins)
+        ]
+        for processo in admins:
+            processo.start()
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=args.concorrencia,
+                mp_context=contexto,
+                initializer=_inicializar_processo,
+                initargs=(str(diretorio), args.max_selecoes),
+            ) as executor:
+                # Garante que todos os trabalhadores estão aquecidos antes de medir
+                list(executor.map(time.sleep, [0.1] * args.concorrencia))
+                inicio = time.perf_counter()
+                futuros = {
+                    email: executor.submit(simular_eleitor, email, id_sbc, cedulas[email], args.max_selecoes)
+                    for email, id_sbc in eleitores
+                }
+                esperados = {}
+                for email, futuro in futuros.items():
+                    escolhidos, latencias, erros = futuro.result()
+                    esperados[email] = escolhidos
+                    medidor.juntar(latencias, erros)
+                duracao = time.perf_counter() - inicio
+        finally:
+            # Os admins precisam sair antes de o diretório temporário ser apagado
+            parar.set()
+            for _ in admins:
+                medidor.juntar(*fila_admins.get())
+            for processo in admins:
+                processo.join()
+
+        confirmados = {email: escolhas for email, escolhas in esperados.items() if escolhas}
+        conferencia = conferir_votos(diretorio / 'votos.db', confirmados)
+
+    return {
+        'eleitores': args.eleitores,
+        'concorrencia': args.concorrencia,
+        'admins': args.admins,
+        'duracao_s': round(duracao, 2),
+        'votos_confirmados': len(confirmados),
+        'vazao_votos_por_s': round(len(confirmados) / duracao, 2) if duracao else 0,
+        'etapas': {etapa: _percentis(valores) for etapa, valores in sorted(medidor.latencias.items())},
+        'votos_perdidos': conferencia['perdidos'],
+        'votos_divergentes': conferencia['divergentes'],
+        'votos_inesperados': conferencia['inesperados'],
+        'erros': medidor.erros,
+    }
+
+def imprimir_relatorio(resultado):
+    print("=" * 60)
+    print("Teste de carga - votação CEIE")
+    print("=" * 60)
+    print(f"Eleitores: {resultado['eleitores']}  Concorrência: {resultado['concorrencia']}  Admins: {resultado['admins']}")
+    print(f"Duração: {resultado['duracao_s']} s  Votos confirmados: {resultado['votos_confirmados']}")
+    print(f"Vazão: {resultado['vazao_votos_por_s']} votos/s")
+    print()
+    print(f"{'Etapa':<15}{'n':>7}{'p50 (ms)':>12}{'p99 (ms)':>12}{'média (ms)':>12}")
+    for etapa, estatisticas in resultado['etapas'].items():
+        print(
+            f"{etapa:<15}{estatisticas['n']:>7}{estatisticas['p50_ms']:>12}"
+            f"{estatisticas['p99_ms']:>12}{estatisticas['media_ms']:>12}"
+        )
+    print()
+    print(f"Votos perdidos: {len(resultado['votos_perdidos'])}")
+    print(f"Votos divergentes: {len(resultado['votos_divergentes'])}")
+    print(f"Votos inesperados (duplicados/sem envio): {len(resultado['votos_inesperados'])}")
+    if resultado['erros']:
+        print(f"Erros nas sessões: {len(resultado['erros'])} (ex.: {resultado['erros'][0]})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga ponta a ponta do app de votação.")
+    parser.add_argument('--eleitores', type=int, default=100, help="Eleitores simulados")
+    parser.add_argument('--concorrencia', type=int, default=10, help="Eleitores votando ao mesmo tempo")
+    parser.add_argument('--admins', type=int, default=1, help="Sessões de admin atualizando o painel")
+    parser.add_argument('--intervalo-admin', type=float, default=1.0, help="Segundos entre atualizações do admin")
+    parser.add_argument('--candidatos', type=int, default=12, help="Candidatos na cédula")
+    parser.add_argument('--max-selecoes', type=int, default=3, help="MAX_SELECTIONS da votação")
+    parser.add_argument('--semente', type=int, default=None, help="Semente aleatória (reprodutibilidade)")
+    parser.add_argument('--saida', help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    resultado = executar(args)
+    imprimir_relatorio(resultado)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    falhou = (
+        resultado['votos_perdidos'] or resultado['votos_divergentes'] or resultado['votos_inesperados']
+        or resultado['erros']
+    )
+    raise SystemExit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    # Os trabalhadores precisam importar as funções pelo nome real do módulo:
+    # dentro deles o AppTest ocupa o __main__ com o script do app.
+    from src.ferramentas.teste_carga import main as _main
+    _main()
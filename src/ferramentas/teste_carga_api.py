@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API de ingestão de votos (src/api_votos.py).
+
+Sobe a API em um processo separado, sobre um diretório temporário com roster
+e candidatos sintéticos, e dispara clientes HTTP asyncio concorrentes com
+conexões keep-alive. Cada cliente é dono de um grupo de eleitores e, para
+cada um, faz login e envia a cédula (às vezes mais de uma vez, trocando o
+voto); de tempos em tempos também consulta os candidatos e a apuração.
+
+Ao final informa requisições/s, latências p50/p99 por rota e respostas
+inesperadas, e confere no banco se a última cédula aceita de cada eleitor
+é a que ficou gravada.
+
+Uso (a partir da raiz do repositório):
+    python -m src.ferramentas.teste_carga_api --conexoes 64 --eleitores 5000
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.ferramentas.teste_carga import gerar_roster
+
+RAIZ = Path(__file__).resolve().parents[2]
+EMAIL_ADMIN = 'admin@carga.local'
+SENHA_ADMIN = 'carga'
+TEMPO_MAXIMO_SUBIDA = 120  # Segundos esperando a API ficar pronta
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _percentis(valores):
+    valores = sorted(valores)
+
+    def p(q):
+        return valores[min(len(valores) - 1, int(q * len(valores)))] * 1000
+    return {'n': len(valores), 'p50_ms': round(p(0.50), 2), 'p99_ms': round(p(0.99), 2)}
+
+class ClienteHttp:
+    """Cliente HTTP/1.1 mínimo com uma conexão keep-alive."""
+
+    def __init__(self, porta):
+        self.porta = porta
+        self.reader = self.writer = None
+
+    async def requisitar(self, metodo, caminho, corpo=None, cabecalhos=''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.porta)
+        dados = json.dumps(corpo).encode('utf-8') if corpo is not None else b''
+        self.writer.write(
+            f"{metodo} {caminho} HTTP/1.1\r\nHost: 127.0.0.1\r\n{cabecalhos}"
+            f"Content-Type: application/json\r\nContent-Length: {len(dados)}\r\n\r\n".encode('latin-1') + dados
+        )
+        await self.writer.drain()
+        cabecalho = await self.reader.readuntil(b'\r\n\r\n')
+        linhas = cabecalho.decode('latin-1').split('\r\n')
+        status = int(linhas[0].split(' ', 2)[1])
+        tamanho = 0
+        for linha in linhas[1:]:
+            nome, _, valor = linha.partition(':')
+            if nome.strip().lower() == 'content-length':
+                tamanho = int(valor)
+        resposta = json.loads(await self.reader.readexactly(tamanho)) if tamanho else None
+        return status, resposta
+
+    def fechar(self):
+        if self.writer is not None:
+            self.writer.close()
+
+class Coleta:
+    """Latências por rota, respostas inesperadas e a última cédula aceita de cada eleitor."""
+
+    def __init__(self):
+        self.latencias = {}
+        self.inesperadas = {}
+        self.aceitos = {}
+
+    async def medir(self, cliente, rota, esperado, metodo, caminho, corpo=None, cabecalhos=''):
+        inicio = time.perf_counter()
+        try:
+            status, resposta = await cliente.requisitar(metodo, caminho, corpo, cabecalhos)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            status, resposta = 0, {'erro': repr(e)}
+            cliente.fechar()
+            cliente.writer = None
+        self.latencias.setdefault(rota, []).append(time.perf_counter() - inicio)
+        if status != esperado:
+            chave = f"{rota} -> {status}: {(resposta or {}).get('erro', '')}"[:160]
+            self.inesperadas[chave] = self.inesperadas.get(chave, 0) + 1
+        return status, resposta
+
+async def simular_cliente(porta, eleitores, opcoes, max_selecoes, args, coleta, semente):
+    """Uma conexão keep-alive percorrendo os próprios eleitores."""
+    rng = random.Random(semente)
+    cliente = ClienteHttp(porta)
+    basic = base64.b64encode(f"{EMAIL_ADMIN}:{SENHA_ADMIN}".encode()).decode()
+    try:
+        for email, id_sbc in eleitores:
+            await coleta.medir(cliente, 'POST /login', 200, 'POST', '/login', {'email': email, 'senha': id_sbc})
+            for _ in range(1 + (rng.random() < args.trocas)):
+                escolhas = rng.sample(opcoes, rng.randint(1, max_selecoes))
+                status, _ = await coleta.medir(
+                    cliente, 'POST /votos', 201, 'POST', '/votos',
+                    {'email': email, 'senha': id_sbc, 'escolhas': escolhas}
+                )
+                if status == 201:
+                    coleta.aceitos[email] = sorted(escolhas)
+            if rng.random() < args.leituras:
+                await coleta.medir(cliente, 'GET /candidatos', 200, 'GET', '/candidatos')
+                await coleta.medir(
+                    cliente, 'GET /apuracao', 200, 'GET', '/apuracao',
+                    cabecalhos=f"Authorization: Basic {basic}\r\n"
+                )
+    finally:
+        cliente.fechar()
+
+async def gerar_carga(porta, eleitores, args):
+    coleta = Coleta()
+    cliente = ClienteHttp(porta)
+    _, cedula = await cliente.requisitar('GET', '/candidatos')
+    cliente.fechar()
+    grupos = [eleitores[i::args.conexoes] for i in range(args.conexoes)]
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        simular_cliente(porta, grupo, cedula['candidatos'], cedula['max_selecoes'], args, coleta, f"{args.semente}-{i}")
+        for i, grupo in enumerate(grupos)
+    ))
+    return coleta, time.perf_counter() - inicio
+
+def _esperar_api(processo, porta):
+    limite = time.monotonic() + TEMPO_MAXIMO_SUBIDA
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise SystemExit(f"A API terminou ao subir (código {processo.returncode}).")
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=1) as s:
+                s.sendall(b"GET /saude HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+                if s.recv(64).startswith(b"HTTP/1.1 200"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("A API não ficou pronta a tempo.")
+
+def conferir_votos(caminho_db, aceitos):
+    """Compara a última cédula aceita de cada eleitor com a gravada no banco."""
+    conn = sqlite3.connect(caminho_db)
+    gravados = {user_id: sorted(escolhas.split(", ")) for user_id, escolhas in conn.execute(
+        "SELECT user_id, escolhas FROM votos"
+    )}
+    conn.close()
+    return {
+        'votos_gravados': len(gravados),
+        'ausentes': sorted(set(aceitos) - set(gravados))[:20],
+        'inesperados': sorted(set(gravados) - set(aceitos))[:20],
+        'divergentes': sorted(e for e in set(aceitos) & set(gravados) if aceitos[e] != gravados[e])[:20],
+    }
+
+def executar(args):
+    with tempfile.TemporaryDirectory(prefix='ceie-carga-api-') as pasta:
+        diretorio = Path(pasta)
+        eleitores = gerar_roster(diretorio, args.eleitores, args.candidatos)
+        (diretorio / '.streamlit').mkdir()
+        # A apuração é lida com as credenciais do admin muitas vezes: o limite de
+        # tentativas de login continua ativo, mas sem barrar a carga
+        (diretorio / '.streamlit' / 'secrets.toml').write_text(
+            f'EMAIL_ADMIN = "{EMAIL_ADMIN}"\nPASSWORD_ADMIN = "{SENHA_ADMIN}"\nMAX_SELECTIONS = {args.max_selecoes}\n'
+            '[LIMITE_LOGIN]\nRAJADA = 1000000\n',
+            encoding='utf-8'
+        )
+        porta = _porta_livre()
+        ambiente = {**os.environ, 'PYTHONPATH': str(RAIZ)}
+        processo = subprocess.Popen(
+            [sys.executable, '-m', 'src.api_votos', '--porta', str(porta), '--threads', str(args.threads)],
+            cwd=diretorio, env=ambiente, stdout=subprocess.DEVNULL,
+        )
+        try:
+            _esperar_api(processo, porta)
+            coleta, duracao = asyncio.run(gerar_carga(porta, eleitores, args))
+        finally:
+            processo.terminate()
+            processo.wait()
+        conferencia = conferir_votos(diretorio / 'votos.db', coleta.aceitos)
+
+    total = sum(len(valores) for valores in coleta.latencias.values())
+    return {
+        'parametros': vars(args),
+        'duracao_s': round(duracao, 2),
+        'requisicoes': total,
+        'requisicoes_por_s': round(total / duracao, 1),
+        'rotas': {rota: _percentis(valores) for rota, valores in sorted(coleta.latencias.items())},
+        'inesperadas': coleta.inesperadas,
+        **conferencia,
+    }
+
+def imprimir_relatorio(resultado):
+    print(f"Requisições: {resultado['requisicoes']} em {resultado['duracao_s']} s "
+          f"({resultado['requisicoes_por_s']} req/s)")
+    print()
+    print(f"{'Rota':<18}{'n':>9}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for rota, estatisticas in resultado['rotas'].items():
+        print(f"{rota:<18}{estatisticas['n']:>9}{estatisticas['p50_ms']:>12}{estatisticas['p99_ms']:>12}")
+    print()
+    if resultado['inesperadas']:
+        print("Respostas inesperadas:")
+        for chave, n in sorted(resultado['inesperadas'].items(), key=lambda item: -item[1]):
+            print(f"  {n:>6}  {chave}")
+    print(f"Votos gravados: {resultado['votos_gravados']}  ausentes: {len(resultado['ausentes'])}  "
+          f"inesperados: {len(resultado['inesperados'])}  divergentes: {len(resultado['divergentes'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API de ingestão de votos.")
+    parser.add_argument('--conexoes', type=int, default=64, help="Clientes simultâneos (uma conexão keep-alive cada)")
+    parser.add_argument('--eleitores', type=int, default=5000, help="Eleitores no roster (cada um vota ao menos uma vez)")
+    parser.add_argument('--candidatos', type=int, default=30, help="Candidatos na cédula")
+    parser.add_argument('--max-selecoes', type=int, default=3, help="MAX_SELECTIONS da votação")
+    parser.add_argument('--threads', type=int, default=8, help="Threads da API para as chamadas ao banco")
+    parser.add_argument('--trocas', type=float, default=0.2, help="Fração de eleitores que troca o voto")
+    parser.add_argument('--leituras', type=float, default=0.1,
+                        help="Fração de eleitores após os quais o cliente lê candidatos e apuração")
+    parser.add_argument('--semente', type=int, default=0, help="Semente aleatória")
+    parser.add_argument('--saida', help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    resultado = executar(args)
+    imprimir_relatorio(resultado)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    falhou = (
+        resultado['inesperadas'] or resultado['ausentes']
+        or resultado['inesperados'] or resultado['divergentes']
+    )
+    raise SystemExit(1 if falhou else 0)
+
+if __name__ == "__main__":
+    main()